@@ -55,6 +55,7 @@ setup(
         'transpyler.l10n': [
             '*.po',
             '*.mo',
+            '*.bundle',
             '*.pot',
         ],
     },
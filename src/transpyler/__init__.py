@@ -1,7 +1,7 @@
 __version__ = '0.5.0'
 __author__ = 'Fábio Macêdo Mendes'
 
-from .errors import BadSyntaxError
+from .errors import BadSyntaxError, Diagnostic
 from .lexer import Lexer
 from .transpyler import Transpyler, get_transpyler
 from .runners import run, start_console, start_notebook, start_qturtle
@@ -8,48 +8,124 @@ import click
 # Utilities
 #
 @click.command()
-def potfile():
+@click.option('--full', is_flag=True, default=False,
+              help='Extract all objects and recreate the potfile.')
+@click.option('--cache', 'cache_path', default=None,
+              type=click.Path(dir_okay=False),
+              help='Path of the incremental extraction cache. Defaults to '
+                   '~/.cache/transpyler/extract-cache.json.')
+def potfile(full, cache_path):
     """
     Updates Transpyler lib main potfile.
 
+    Only objects that changed since the last run are extracted again and the
+    changes are merged into the potfile and the existing PO files. The
+    extraction cache is kept in the user's cache directory rather than in
+    the package.
+
     You probably have little use for this command unless you are a Transpyler
     developer.
     """
-    from transpyler import lib
+    import polib
     from transpyler.translate import L10N_PATH
-    from transpyler.utils import extract_namespace
-    from transpyler.translate import extract_translations
-    from transpyler.translate import create_pot_file
-    from transpyler.turtle.namespace import TurtleNamespace
+    from transpyler.translate import create_pot_file, merge_translations, \
+        translations_from_po
+    from transpyler.translate.extract import EXTRACT_CACHE_PATH, \
+        extract_translations_incremental, load_extract_cache, \
+        save_extract_cache
 
     path = os.path.join(L10N_PATH, 'transpyler.pot')
+    cache_path = cache_path or EXTRACT_CACHE_PATH
     click.echo('Updating transpyler.pot file at:\n    %s' % path)
 
-    namespace = extract_namespace(lib)
-    namespace.update(TurtleNamespace())
-    translations = extract_translations(namespace)
-    create_pot_file(translations, path)
+    namespace = lib_namespace()
+    cache = {} if full else load_extract_cache(cache_path)
+    translations, changed = extract_translations_incremental(namespace, cache)
+    save_extract_cache(cache, cache_path)
+    click.echo('Extracted %s of %s objects.' % (len(changed), len(cache)))
 
-    click.echo('\nCreated potfile with %s translations!' % len(translations))
-    click.echo('Please review the translation files for specific languages.')
-    for path in os.listdir(L10N_PATH):
+    if full or not os.path.exists(path):
+        create_pot_file(translations, path)
+        click.echo('\nCreated potfile with %s translations!'
+                   % len(translations))
+    else:
+        pot = polib.pofile(path)
+        old = translations_from_po(pot)
+        n_changes = merge_translations(pot, old, translations,
+                                       keep_obsolete=False)
+        if n_changes:
+            pot.save(path)
+        click.echo('\nUpdated %s translations in potfile.' % n_changes)
+
+    click.echo('Merging changes in the translation files for specific '
+               'languages.')
+    for path in sorted(os.listdir(L10N_PATH)):
         path = os.path.basename(path)
         if re.match(r'^[a-z][a-z](_[A-Z][A-Z])?\.po$', path):
-            click.echo('    * ' + path)
+            po_path = os.path.join(L10N_PATH, path)
+            po = polib.pofile(po_path)
+            n_changes = merge_translations(po, translations_from_po(po),
+                                           translations)
+            if n_changes:
+                po.save(po_path)
+            click.echo('    * %s (%s changes)' % (path, n_changes))
+    click.echo('Please review the translation files for specific languages.')
+
+
+@click.command()
+@click.argument('langs', nargs=-1)
+def bundle(langs):
+    """
+    Compile PO files to translation bundles.
+
+    Bundles are loaded by the runtime instead of the .mo files. If no language
+    is given, compile all PO files in the Transpyler lib.
+    """
+    from transpyler.translate import L10N_PATH, compile_bundle
+
+    if not langs:
+        langs = [path[:-3] for path in sorted(os.listdir(L10N_PATH))
+                 if re.match(r'^[a-z][a-z](_[A-Z][A-Z])?\.po$', path)]
+    namespace = lib_namespace()
+    for lang in langs:
+        path = compile_bundle(lang, namespace=namespace)
+        click.echo('Created bundle at:\n    %s' % path)
 
 
 @click.command()
 @click.argument('lang')
 @click.option('--auto/--no-auto', default=True,
               help='Do not prompt for translation.')
-def autotranslate(lang, auto):
+@click.option('--workers', '-w', default=4,
+              help='Number of concurrent requests to the translator.')
+@click.option('--batch-size', '-b', default=50,
+              help='Number of entries translated before saving the PO file.')
+@click.option('--cache/--no-cache', default=True,
+              help='Use the persistent translation cache.')
+def autotranslate(lang, auto, workers, batch_size, cache):
     """
     Fill translations in a PO file using google translate.
     """
-    from transpyler.translate.google_translate import google_translate
+    from transpyler.translate.google_translate import google_translate, \
+        CACHE_PATH
 
     lang = lang.replace('-', '_')
-    google_translate(lang, prompt=not auto, verbose=True)
+    google_translate(lang, prompt=not auto, verbose=True, workers=workers,
+                     batch_size=batch_size,
+                     cache_path=CACHE_PATH if cache else None)
+
+
+def lib_namespace():
+    """
+    Return the namespace with all translatable objects in the Transpyler lib.
+    """
+    from transpyler import lib
+    from transpyler.utils import extract_namespace
+    from transpyler.turtle.namespace import TurtleNamespace
+
+    namespace = extract_namespace(lib)
+    namespace.update(TurtleNamespace())
+    return namespace
 
 
 #
@@ -61,6 +137,7 @@ def cli():
 
 
 cli.add_command(potfile)
+cli.add_command(bundle)
 cli.add_command(autotranslate)
 
 if __name__ == '__main__':
@@ -0,0 +1,65 @@
+import unicodedata
+from bisect import bisect_left
+
+
+class CompletionIndex:
+    """
+    Accent-insensitive prefix search over a collection of names.
+
+    Names are stored in an array sorted by their unaccented versions, hence
+    each query is a binary search followed by a slice of the result.
+
+    Example:
+        >>> index = CompletionIndex(['faça', 'fatorial', 'para'])
+        >>> index.complete('fac')
+        ['faça']
+    """
+
+    def __init__(self, names):
+        folded = {}
+        for name in set(names):
+            folded.setdefault(fold(name), []).append(name)
+
+        entries = []
+        for key, group in folded.items():
+            # Unaccented aliases are hidden if the accented name exists
+            if len(group) > 1 and key in group:
+                group.remove(key)
+            entries.extend((key, name) for name in group)
+        entries.sort()
+
+        self._keys = [key for key, _ in entries]
+        self._names = [name for _, name in entries]
+
+    def __len__(self):
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def complete(self, prefix, limit=None):
+        """
+        Return a sorted list of names that start with the given prefix.
+
+        Accents are ignored both in the prefix and in the indexed names.
+        """
+
+        key = fold(prefix)
+        start = bisect_left(self._keys, key)
+        end = bisect_left(self._keys, key + '\U0010ffff', start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self._names[start:end]
+
+
+def fold(name):
+    """
+    Normalize name for accent-insensitive comparisons.
+
+    Characters are decomposed and combining marks are removed. Unlike a
+    transliteration, names in non-Latin scripts are not mapped to Latin
+    letters.
+    """
+
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
@@ -27,7 +27,7 @@ class TranspylerConsole(code.InteractiveConsole):
 
     def runsource(self, source, filename="<input>", symbol="single"):
         try:
-            source = self.transpyler.transpile(source)
+            source = self.transpyler.transpile(source, filename)
             if source.endswith('\n'):
                 source = source[:-1]
             code = self.compile(source, filename, symbol)
@@ -52,23 +52,20 @@ class TranspylerConsole(code.InteractiveConsole):
 
     def showsyntaxerror(self, filename=None):
         type, value, tb = sys.exc_info()
+        if isinstance(value, SyntaxError):
+            value = self.transpyler.remap_syntax_error(value)
         sys.last_type = type
         sys.last_value = value
         sys.last_traceback = tb
 
         if filename and type is SyntaxError:
-            # Work hard to stuff the correct filename in the exception
-            try:
-                msg, (dummy_filename, lineno, offset, dummy_line) = value.args
-            except ValueError:
-                # Not the format we expect; leave it alone
-                pass
-            else:
-                # Stuff in the right filename and line
-                print(self.buffer, lineno)
-                line = dummy_line
-                value = SyntaxError(msg, (filename, lineno, offset, line))
-                sys.last_value = value
+            # Stuff in the right filename. Positions are taken from the
+            # remapped attributes since value.args still refer to the
+            # transpiled code
+            print(self.buffer, value.lineno)
+            value = SyntaxError(value.msg, (filename, value.lineno,
+                                            value.offset, value.text))
+            sys.last_value = value
         if sys.excepthook is sys.__excepthook__:
             lines = traceback.format_exception_only(type, value)
             self.write(''.join(lines))
@@ -77,12 +74,52 @@ class TranspylerConsole(code.InteractiveConsole):
             # over self.write
             sys.excepthook(type, value, tb)
 
+    def showtraceback(self):
+        type, value, tb = sys.exc_info()
+        sys.last_type = type
+        sys.last_value = value
+        sys.last_traceback = tb
+        if sys.excepthook is sys.__excepthook__:
+            # Skip the frame of runcode() and show positions in the original
+            # source
+            lines = self.transpyler.format_exception(type, value, tb.tb_next)
+            self.write(''.join(lines))
+        else:
+            sys.excepthook(type, value, tb)
+
+    def complete(self, text, state):
+        """
+        Readline completer for global names in the transpyled language.
+        """
+
+        if state == 0:
+            # Names of the transpyler namespace come from the completion
+            # index, which hides the unaccented aliases. Other locals were
+            # defined by the user.
+            matches = self.transpyler.introspection.complete(text)
+            seen = set(matches)
+            seen.update(self.transpyler.namespace)
+            matches.extend(name for name in self.locals
+                           if name.startswith(text) and name not in seen)
+            self._matches = matches
+        try:
+            return self._matches[state]
+        except IndexError:
+            return None
+
     def interact(self, banner=None, exitmsg=None):
         """
         Starts the console mainloop.
         """
 
         self.transpyler.init()
+        try:
+            import readline
+        except ImportError:
+            pass
+        else:
+            readline.set_completer(self.complete)
+            readline.parse_and_bind('tab: complete')
         super().interact(banner, exitmsg)
 
 
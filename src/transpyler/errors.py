@@ -17,12 +17,87 @@ class BadSyntaxError(SyntaxError):
 
     def __init__(self, msg, lineno=None, pos=None, from_token=None):
         if from_token:
-            lineno = from_token.start.lineno
-            pos = from_token.start.pos
-        args = msg, lineno, pos
-        super().__init__(args)
+            # Use the position in the original source, since the token may
+            # have been displaced by previous transformations
+            lineno, pos = from_token.origin or from_token.start
+        super().__init__(msg, lineno, pos)
 
     def __str__(self):
         if self.lineno:
             return 'at line %s, %s: %s' % (self.lineno, self.pos, self.msg)
         return self.msg
+
+
+class Diagnostic:
+    """
+    A problem found in the source code.
+
+    Diagnostics are collected by :meth:`transpyler.Transpyler.diagnose`,
+    which reports all problems in a single pass instead of raising on the
+    first one.
+
+    Attributes:
+        msg: error message.
+        lineno, col: start position in the source (lines start at 1 and
+            columns at 0).
+        end_lineno, end_col: end position, if known.
+        kind: one of 'invalid-sequence', 'tokenize' or 'syntax'.
+    """
+
+    def __init__(self, msg, lineno, col, end_lineno=None, end_col=None,
+                 kind='syntax'):
+        self.msg = msg
+        self.lineno = lineno
+        self.col = col
+        self.end_lineno = end_lineno
+        self.end_col = end_col
+        self.kind = kind
+
+    def __repr__(self):
+        return 'Diagnostic(%r, %r, %r, kind=%r)' % (
+            self.msg, self.lineno, self.col, self.kind)
+
+    def __eq__(self, other):
+        if isinstance(other, Diagnostic):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.msg, self.lineno, self.col, self.end_lineno,
+                     self.end_col, self.kind))
+
+    @classmethod
+    def from_syntax_error(cls, ex, kind='syntax'):
+        """
+        Create diagnostic from a SyntaxError instance.
+        """
+
+        if isinstance(ex, BadSyntaxError):
+            return cls(ex.msg, ex.lineno, ex.pos, kind=kind)
+        col = None if ex.offset is None else ex.offset - 1
+        end_lineno = getattr(ex, 'end_lineno', None)
+        end_col = getattr(ex, 'end_offset', None)
+        if end_col is not None:
+            end_col -= 1
+        return cls(ex.msg, ex.lineno, col, end_lineno, end_col, kind=kind)
+
+    def to_dict(self):
+        """
+        Return a JSON-friendly dictionary with the diagnostic data.
+        """
+
+        return {
+            'msg': self.msg,
+            'lineno': self.lineno,
+            'col': self.col,
+            'end_lineno': self.end_lineno,
+            'end_col': self.end_col,
+            'kind': self.kind,
+        }
+
+    def to_error(self):
+        """
+        Convert diagnostic to a BadSyntaxError.
+        """
+
+        return BadSyntaxError(self.msg, self.lineno, self.col)
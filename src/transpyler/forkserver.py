@@ -0,0 +1,189 @@
+"""
+A fork-server that executes transpyled code in isolated child processes.
+
+The parent process fully initializes the transpyler runtime (namespace,
+curses, turtle functions, translation catalogs, lexer tables) and then forks
+a child for each job. Children share the initialized runtime with the parent
+in copy-on-write mode, hence jobs are cheap to start and cannot leak state to
+each other.
+
+Communication uses a local (unix) socket. Each message is a JSON object in a
+single line. The client sends a request::
+
+    {"source": "print(42)", "mode": "exec"}
+
+and the server streams back any number of output messages followed by a
+final message with either a result or an error::
+
+    {"stdout": "42\\n"}
+    {"result": null}
+
+    {"error": "Traceback (most recent call last): ...", "type": "NameError"}
+"""
+
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import traceback
+from contextlib import redirect_stdout
+
+
+class ForkServerError(Exception):
+    """
+    Error raised in the client when a job fails in the server.
+    """
+
+    def __init__(self, msg, type=None):
+        super().__init__(msg)
+        self.type = type
+
+
+class ForkServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    A server that forks a fully initialized transpyler runtime for each job.
+
+    Args:
+        address (str):
+            Path of the unix socket the server binds to.
+        transpyler:
+            The transpyler instance. It is initialized before the server
+            starts accepting connections.
+        ns (dict):
+            Extra functions passed to :meth:`Transpyler.init`.
+    """
+
+    def __init__(self, address, transpyler, ns=None):
+        self.transpyler = transpyler
+        self.functions = type(transpyler).core_functions()
+        self.warmup(ns)
+        super().__init__(address, JobHandler)
+
+    def warmup(self, ns=None):
+        """
+        Initialize all lazy parts of the runtime in the parent process.
+        """
+
+        transpyler = self.transpyler
+        self.functions['init'](ns)
+        transpyler.translate('')
+        self.functions['transpile']('pass')
+
+        # The translated namespace (with the turtle functions) and the name
+        # indexes are the most expensive parts to build
+        transpyler.namespace
+        transpyler.introspection.index
+        transpyler.introspection.completion_index
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+    def run_job(self, source, mode='exec'):
+        """
+        Executes source code and return the repr() of the result.
+
+        This method is called in the child process.
+        """
+
+        if mode not in ('exec', 'eval'):
+            raise ValueError('invalid mode: %r' % mode)
+        result = self.functions[mode](source, {})
+        return None if result is None else repr(result)
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """
+    Handles a single job in the child process.
+    """
+
+    def handle(self):
+        request = json.loads(self.rfile.readline().decode('utf8'))
+        stdout = MessageWriter(self.wfile, 'stdout')
+
+        try:
+            with redirect_stdout(stdout):
+                result = self.server.run_job(request['source'],
+                                             request.get('mode', 'exec'))
+        except SystemExit as ex:
+            self.send({'result': None, 'exit': ex.code})
+        except Exception as ex:
+            self.send({
+                'error': traceback.format_exc(),
+                'type': type(ex).__name__,
+            })
+        else:
+            self.send({'result': result})
+
+    def send(self, msg):
+        send_message(self.wfile, msg)
+
+
+class MessageWriter(io.TextIOBase):
+    """
+    A file-like object that streams each write() as a message.
+    """
+
+    def __init__(self, file, kind):
+        super().__init__()
+        self._file = file
+        self._kind = kind
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if data:
+            send_message(self._file, {self._kind: data})
+        return len(data)
+
+
+def send_message(file, msg):
+    """
+    Writes a JSON message in a single line of the given binary file.
+    """
+
+    file.write(json.dumps(msg).encode('utf8') + b'\n')
+    file.flush()
+
+
+def submit(address, source, mode='exec', stdout=None, timeout=None):
+    """
+    Submit source code to a fork-server and return the repr() of the result.
+
+    Output is streamed to the given stdout file (defaults to sys.stdout).
+    Raises a ForkServerError if the job fails.
+    """
+
+    stdout = sys.stdout if stdout is None else stdout
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        with sock.makefile('rwb') as file:
+            send_message(file, {'source': source, 'mode': mode})
+            for line in file:
+                msg = json.loads(line.decode('utf8'))
+                if 'stdout' in msg:
+                    stdout.write(msg['stdout'])
+                elif 'error' in msg:
+                    raise ForkServerError(msg['error'], msg.get('type'))
+                else:
+                    return msg['result']
+    raise ForkServerError('connection closed before job has finished')
+
+
+def start_forkserver(transpyler, address, ns=None):
+    """
+    Starts a fork-server for the given transpyler and serve jobs forever.
+    """
+
+    server = ForkServer(address, transpyler, ns)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
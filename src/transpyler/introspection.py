@@ -1,79 +1,91 @@
 import builtins as _builtins
+from collections import OrderedDict
 from types import ModuleType
 
 from lazyutils import lazy
 
+from .completion import CompletionIndex
+
+# Categories of names
+KEYWORD = 'keyword'
+CONSTANT = 'constant'
+EXCEPTION = 'exception'
+TYPE = 'type'
+FUNCTION = 'function'
+SUBMODULE = 'submodule'
+CATEGORIES = (CONSTANT, EXCEPTION, TYPE, FUNCTION, SUBMODULE)
+
 
 class Introspection:
     """
     Introspection facilities for a transpyled Transpyler.
+
+    Names are categorized in a single pass over the namespace and stored in
+    an index that maps each name to its category. All lists of names are
+    derived from this index and are cached until :meth:`invalidate` is called.
     """
 
+    # Lazy attributes that depend on the transpyler namespace. They are
+    # cleared by invalidate()
+    _namespace_attrs = (
+        'namespace', 'index', '_names', 'all_names', 'constants',
+        'exceptions', 'types', 'functions', 'submodules', 'builtins',
+        'all_constants', 'all_exceptions', 'all_types', 'all_functions',
+        'all_submodules', 'all_builtins', 'completion_index',
+    )
+
     #
     # Original python names and constants
     #
     py_constants = ['True', 'False', 'None']
+    py_submodules = []
+    py_keywords = []
 
     @lazy
-    def py_exceptions(self):
-        return [
-            name for (name, value) in vars(_builtins).items()
-            if isinstance(value, type) and issubclass(value, Exception)
-        ]
-
-    @lazy
-    def py_types(self):
-        return [
-            name for (name, value) in vars(_builtins).items()
-            if isinstance(value, type) and not issubclass(value, Exception)
-        ]
-
-    @lazy
-    def py_functions(self):
-        return [
-            name for (name, value) in vars(_builtins).items()
-            if name not in self.py_types and name not in self.py_exceptions
-        ]
-
-    @lazy
-    def py_builtins(self):
-        return self.py_types + self.py_functions
+    def py_index(self):
+        index = {}
+        for name, value in vars(_builtins).items():
+            category = categorize(value)
+            if category not in (EXCEPTION, TYPE):
+                category = FUNCTION
+            index[name] = category
+        return index
 
-    py_submodules = []
-    py_keywords = []
+    py_exceptions = lazy(lambda self: self._py_names(EXCEPTION))
+    py_types = lazy(lambda self: self._py_names(TYPE))
+    py_functions = lazy(lambda self: self._py_names(FUNCTION))
+    py_builtins = lazy(lambda self: self.py_types + self.py_functions)
 
     #
     # Names derived from the transpyler
     #
     namespace = lazy(lambda self: self.transpyler.namespace)
     all_names = lazy(lambda self: list(self.namespace))
-    constants = lazy(
-        lambda self:
-        [name for (name, value) in self.namespace.items()
-         if isinstance(value, (int, float, bool))]
-    )
-    exceptions = lazy(
-        lambda self:
-        [name for (name, value) in self.namespace.items()
-         if isinstance(value, type) and issubclass(value, Exception)]
-    )
-    types = lazy(
-        lambda self:
-        [name for (name, value) in self.namespace.items()
-         if isinstance(value, type) and not issubclass(value, Exception)]
-    )
-    functions = lazy(
-        lambda self:
-        [name for (name, value) in self.namespace.items()
-         if not isinstance(value, type) and callable(value)]
-    )
-    submodules = lazy(
-        lambda self:
-        [name for (name, value) in self.namespace.items()
-         if isinstance(value, ModuleType)]
-    )
+
+    @lazy
+    def index(self):
+        index = {}
+        for name, value in self.namespace.items():
+            category = categorize(value)
+            if category is not None:
+                index[name] = category
+        return index
+
+    @lazy
+    def _names(self):
+        names = {category: [] for category in CATEGORIES}
+        for name, category in self.index.items():
+            names[category].append(name)
+        return names
+
+    constants = lazy(lambda self: self._names[CONSTANT])
+    exceptions = lazy(lambda self: self._names[EXCEPTION])
+    types = lazy(lambda self: self._names[TYPE])
+    functions = lazy(lambda self: self._names[FUNCTION])
+    submodules = lazy(lambda self: self._names[SUBMODULE])
     builtins = lazy(lambda self: self.functions + self.types)
     keywords = lazy(lambda self: self._extract_keywords())
+    keyword_set = lazy(lambda self: frozenset(self.all_keywords))
 
     #
     # Combined lists
@@ -100,22 +112,99 @@ class Introspection:
         lambda self: unique(self.keywords + self.py_keywords)
     )
 
+    @lazy
+    def completion_index(self):
+        names = [name for name in self.index if not name.startswith('_')]
+        names.extend(self.all_keywords)
+        names.extend(self.py_constants)
+        names.extend(name for name in self.py_builtins
+                     if not name.startswith('_'))
+        names.extend(self.py_exceptions)
+        return CompletionIndex(names)
+
     def __init__(self, transpyler):
         self.transpyler = transpyler
 
+    def __contains__(self, name):
+        return self.category(name) is not None
+
+    def category(self, name):
+        """
+        Return the category of the given name or None if name is unknown.
+
+        Keywords take precedence over names in the transpyler namespace, which
+        takes precedence over Python builtins. Constants defined in Python
+        (True, False, None) are also recognized.
+        """
+
+        if name in self.keyword_set:
+            return KEYWORD
+        try:
+            return self.index[name]
+        except KeyError:
+            pass
+        if name in self.py_constants:
+            return CONSTANT
+        return self.py_index.get(name)
+
+    def complete(self, prefix, limit=None):
+        """
+        Return a sorted list of keywords and builtin names that start with the
+        given prefix.
+
+        Comparison ignores accents, hence 'faca' completes to 'faça'.
+        """
+        return self.completion_index.complete(prefix, limit)
+
+    def is_keyword(self, name):
+        """
+        Return True if name is a keyword of the transpyled language.
+        """
+        return name in self.keyword_set
+
+    def invalidate(self):
+        """
+        Clear all cached data derived from the transpyler namespace.
+
+        It must be called whenever the namespace changes.
+        """
+
+        for attr in self._namespace_attrs:
+            self.__dict__.pop(attr, None)
+
+    def _py_names(self, category):
+        return [name for (name, cat) in self.py_index.items()
+                if cat == category]
+
     def _extract_keywords(self):
         keywords = set()
-        for item in self.transpyler.translations:
-            if isinstance(item, str):
-                keywords.add(item)
-            else:
-                keywords.update(item)
+        lexer = self.transpyler.lexer
+        keywords.update(lexer.single_translations)
+        for item in lexer.sequence_translations:
+            keywords.update(item)
         return sorted(keywords)
 
 
+def categorize(value):
+    """
+    Return the category of a value in the namespace or None if it does not
+    belong to any category.
+    """
+
+    if isinstance(value, type):
+        return EXCEPTION if issubclass(value, Exception) else TYPE
+    elif isinstance(value, (int, float, bool)):
+        return CONSTANT
+    elif isinstance(value, ModuleType):
+        return SUBMODULE
+    elif callable(value):
+        return FUNCTION
+    return None
+
+
 def unique(lst):
-    out = []
-    for x in lst:
-        if x not in out:
-            out.append(x)
-    return out
+    """
+    Return a list with the unique elements of lst preserving order.
+    """
+
+    return list(OrderedDict.fromkeys(lst))
@@ -1,4 +1,5 @@
 import importlib
+import re
 from ast import PyCF_ONLY_AST
 
 from IPython.core.compilerop import CachingCompiler
@@ -10,6 +11,12 @@ from traitlets import Type
 from .shell import TranspylerShell
 from transpyler.utils import with_transpyler_attr
 
+NAME_PREFIX_RE = re.compile(r'(?<![.\w])\w+$')
+
+# Name of the source map of the cell that is being executed. It is renamed to
+# the filename IPython gives to the cell when the cell is compiled.
+CELL_FILENAME = '<cell>'
+
 
 class TranspylerKernel(IPythonKernel):
     """
@@ -33,12 +40,54 @@ class TranspylerKernel(IPythonKernel):
         self.transpyler.init()
 
     def do_execute(self, code, *args, **kwargs):
-        code = self.transpyler.transpile(code)
+        code = self.transpyler.transpile(code, CELL_FILENAME)
         return super().do_execute(code, *args, **kwargs)
 
     def do_is_complete(self, code):
         return super().do_is_complete(self.transpyler.transpile(code))
 
+    def do_complete(self, code, cursor_pos):
+        # Complete global names using the transpyler completion index and the
+        # names defined by the user. Fallback to IPython for everything else
+        # (attributes, paths, etc)
+        cursor_pos = len(code) if cursor_pos is None else cursor_pos
+        match = NAME_PREFIX_RE.search(code[:cursor_pos])
+        if match:
+            matches = self.complete_name(match.group())
+            if matches:
+                return {
+                    'matches': matches,
+                    'cursor_start': match.start(),
+                    'cursor_end': cursor_pos,
+                    'metadata': {},
+                    'status': 'ok',
+                }
+        return super().do_complete(code, cursor_pos)
+
+    def complete_name(self, prefix):
+        """
+        Return a list of global names that start with the given prefix.
+
+        Keywords and builtins of the transpyled language come first, followed
+        by the names defined by the user. Names of the transpyler namespace
+        are only completed from the index, which hides their unaccented
+        aliases. Private names and the names IPython hides from the user are
+        only included if the prefix starts with an underscore.
+        """
+
+        matches = self.transpyler.introspection.complete(prefix)
+        seen = set(matches)
+        seen.update(self.transpyler.namespace)
+        if not prefix.startswith('_'):
+            seen.update(self.shell.user_ns_hidden)
+            seen.update(name for name in self.shell.user_ns
+                        if name.startswith('_'))
+        matches.extend(sorted(
+            name for name in self.shell.user_ns
+            if name.startswith(prefix) and name not in seen
+        ))
+        return matches
+
 
 def start_kernel(transpyler):
     """
@@ -57,7 +106,15 @@ def start_kernel(transpyler):
 def monkey_patch(transpyler):
     def ast_parse(self, source, filename='<unknown>', symbol='exec'):
         flags = self.flags | PyCF_ONLY_AST
-        return transpyler.compile(source, filename, symbol, flags, 1)
+        try:
+            return transpyler.compile(source, filename, symbol, flags, 1)
+        finally:
+            # Cells are transpiled before IPython gives them a filename.
+            # Tracebacks are remapped using the source map of the original
+            # cell rather than the one of the transpiled code.
+            source_map = transpyler.source_maps.pop(CELL_FILENAME, None)
+            if source_map is not None:
+                transpyler.source_maps[filename] = source_map
 
     CachingCompiler.ast_parse = ast_parse
     py3compat.compile = transpyler.compile
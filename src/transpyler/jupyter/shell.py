@@ -1,3 +1,5 @@
+import sys
+
 from ipykernel.zmqshell import ZMQInteractiveShell
 from lazyutils import lazy
 
@@ -30,3 +32,37 @@ class TranspylerShell(ZMQInteractiveShell):
 
     def ev(self, cmd):
         return super().ev(self.transpyler.transpile(cmd))
+
+    def showtraceback(self, exc_tuple=None, filename=None, tb_offset=None,
+                      exception_only=False, **kwargs):
+        # Tracebacks that go through transpiled cells are shown with the
+        # line numbers and lines of the original source
+        try:
+            etype, value, tb = self._get_exc_info(exc_tuple)
+        except ValueError:
+            etype = tb = None
+        if exception_only or tb is None or issubclass(etype, SyntaxError) \
+                or not self._is_transpiled(tb):
+            return super().showtraceback(exc_tuple, filename, tb_offset,
+                                         exception_only, **kwargs)
+
+        if tb_offset is None:
+            tb_offset = self.InteractiveTB.tb_offset
+        for _ in range(tb_offset):
+            tb = tb.tb_next or tb
+        lines = self.transpyler.format_exception(etype, value, tb)
+        self._showtraceback(etype, value, [''.join(lines)])
+
+    def showsyntaxerror(self, *args, **kwargs):
+        value = sys.exc_info()[1]
+        if isinstance(value, SyntaxError):
+            self.transpyler.remap_syntax_error(value)
+        return super().showsyntaxerror(*args, **kwargs)
+
+    def _is_transpiled(self, tb):
+        source_maps = self.transpyler.source_maps
+        while tb is not None:
+            if tb.tb_frame.f_code.co_filename in source_maps:
+                return True
+            tb = tb.tb_next
+        return False
@@ -1,8 +1,10 @@
+import io
 import tokenize
 
 from lazyutils import lazy
 
-from transpyler.errors import BadSyntaxError
+from transpyler.errors import BadSyntaxError, Diagnostic
+from transpyler.sourcemap import SourceMap
 from transpyler.token import Token, displace_tokens, token_find
 from transpyler.utils import keep_spaces
 
@@ -47,9 +49,20 @@ class Lexer:
         Transpile source code to Python.
         """
 
+        return self.transpile_with_map(src)[0]
+
+    def transpile_with_map(self, src):
+        """
+        Transpile source code to Python and return a tuple of (python_source,
+        source_map).
+
+        The :class:`transpyler.sourcemap.SourceMap` maps positions in the
+        resulting Python code back to the original source.
+        """
+
         # Avoid problems with empty token streams
         if not src or src.isspace():
-            return src
+            return src, SourceMap(source=src)
 
         # Convert and process...
         else:
@@ -61,7 +74,20 @@ class Lexer:
             tokens = self.tokenize(src_formatted)
             transpiled_tokens = self.transpile_tokens(tokens)
             result = self.untokenize(transpiled_tokens)
-            return keep_spaces(result, src)
+            final = keep_spaces(result, src)
+
+            # keep_spaces() may change the heading whitespace
+            removed = result[:len(result) - len(result.lstrip())]
+            added = final[:len(final) - len(final.lstrip())]
+            line_offset = added.count('\n') - removed.count('\n')
+            added_col = len(added.rpartition('\n')[-1])
+            removed_col = len(removed.rpartition('\n')[-1])
+            col_offset = added_col - removed_col
+            source_map = SourceMap.from_tokens(
+                transpiled_tokens, source=src,
+                line_offset=line_offset, col_offset=col_offset,
+            )
+            return final, source_map
 
     def tokenize(self, src):
         """
@@ -71,26 +97,35 @@ class Lexer:
             src (str): a string of source code
         """
 
-        current_string = src
+        return list(map(Token, self.tokenize_info(src)))
+
+    def tokenize_info(self, src):
+        """
+        Like :meth:`tokenize`, but return a list of plain TokenInfo tuples.
 
-        def iterlines():
-            nonlocal current_string
+        This is much cheaper than creating Token objects and is useful for
+        clients that only inspect the token stream, such as syntax
+        highlighters.
+        """
 
-            if current_string:
-                line, sep, current_string = current_string.partition('\n')
-                return line + sep
-            else:
-                raise StopIteration
+        return self._tokenize_info(src)
 
-        iterator = iter(tokenize.generate_tokens(iterlines))
+    def _tokenize_info(self, src, errors=None):
+        # Tokenize source and save tokenization errors as diagnostics in the
+        # errors list. The tokenizer stops at the first error.
+        readline = io.StringIO(src).readline
         tokens = []
-        while True:
-            try:
-                tokens.append(next(iterator))
-            except (StopIteration, tokenize.TokenError):
-                break
-
-        tokens = list(map(Token, tokens))
+        try:
+            for token in tokenize.generate_tokens(readline):
+                tokens.append(token)
+        except tokenize.TokenError as ex:
+            if errors is not None:
+                msg, (lineno, col) = ex.args
+                errors.append(Diagnostic(msg, lineno, col, kind='tokenize'))
+        except SyntaxError as ex:
+            if errors is None:
+                raise
+            errors.append(Diagnostic.from_syntax_error(ex, 'tokenize'))
         return tokens
 
     def untokenize(self, tokens):
@@ -114,7 +149,7 @@ class Lexer:
             raise SyntaxError('unexpected EOF.')
         return tokens
 
-    def detect_error_sequences(self, tokens, error_dict):
+    def detect_error_sequences(self, tokens, error_dict, errors=None):
         """
         Raises a BadSyntaxError if list of make_transpyled_tokens contains any sub-sequence in
         the given invalid_tokens.
@@ -122,18 +157,42 @@ class Lexer:
         Args:
             tokens: List of make_transpyled_tokens
             error_dict: A dictionary of {sequence: error_message}
+            errors: If given, all errors are appended to this list as
+                :class:`transpyler.errors.Diagnostic` instances instead of
+                raising an exception on the first error.
         """
 
-        error_sequences = list(error_dict)
-        iterator = token_find(tokens, error_sequences)
-        while True:
-            try:
-                idx, match, start, end = next(iterator)
-                msg = error_dict(match)
-                match = ' '.join(match)
+        error_dict = {(k,) if isinstance(k, str) else tuple(k): v
+                      for k, v in error_dict.items()}
+        for idx, match, start, end in token_find(tokens, error_dict):
+            msg = error_dict[match]
+            if errors is None:
                 raise BadSyntaxError(msg, from_token=tokens[idx])
-            except StopIteration:
-                break
+            (lineno, col), (end_lineno, end_col) = start, end
+            errors.append(Diagnostic(msg, lineno, col, end_lineno, end_col,
+                                     kind='invalid-sequence'))
+
+    def diagnose(self, src):
+        """
+        Return a list of :class:`transpyler.errors.Diagnostic` with all
+        tokenization errors and invalid token sequences in the source.
+
+        Differently from :meth:`transpile`, it does not stop on the first
+        error.
+        """
+
+        errors = []
+        if not src.endswith('\n'):
+            src += '\n'
+        tokens = list(map(Token, self._tokenize_info(src, errors)))
+        for tk in tokens:
+            if tk.type == tokenize.ERRORTOKEN and not tk.string.isspace():
+                lineno, col = tk.start
+                msg = 'invalid token: %r' % tk.string
+                errors.append(Diagnostic(msg, lineno, col, kind='tokenize'))
+        self.detect_error_sequences(tokens, self.invalid_tokens, errors)
+        errors.sort(key=lambda x: (x.lineno or 0, x.col or 0))
+        return errors
 
     def replace_sequences(self, tokens, mapping):
         """
@@ -153,7 +212,9 @@ class Lexer:
         while True:
             try:
                 idx, match, start, end = next(iterator)
+                origin = tokens[idx].origin
                 tokens[idx] = Token(mapping[match], start=start)
+                tokens[idx].origin = origin
                 del tokens[idx + 1: idx + len(match)]
 
                 linediff, col = tokens[idx].end - end
@@ -181,6 +242,7 @@ class Lexer:
             new = mapping.get(tk.string, tk)
             if new is not tk:
                 new = Token(new, start=tk.start)
+                new.origin = tk.origin
                 tokens[i] = new
 
                 # Align make_transpyled_tokens
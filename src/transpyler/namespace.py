@@ -30,7 +30,8 @@ def namespace(transpyler):
 
     # Load turtle functions
     if transpyler.has_turtle_functions and transpyler.turtle_backend:
-        turtle_ns = turtle_functions(transpyler.turtle_backend)
+        kwargs = turtle_kwargs(transpyler)
+        turtle_ns = turtle_functions(transpyler.turtle_backend, **kwargs)
         ns.update(turtle_ns)
 
     # Load special functions
@@ -55,19 +56,46 @@ def global_functions(transpyler):
     return ns
 
 
-def turtle_functions(backend):
+def turtle_kwargs(transpyler):
+    """
+    Return the keyword arguments passed to :func:`turtle_functions` for the
+    given transpyler.
+
+    Headless turtles draw in the transpyler's turtle_group, which is created
+    if necessary, so the drawing can be rendered later.
+    """
+
+    if transpyler.turtle_backend != 'headless':
+        return {}
+    if transpyler.turtle_group is None:
+        from .turtle.headless import HeadlessStateGroup
+
+        transpyler.turtle_group = HeadlessStateGroup()
+    return {'group': transpyler.turtle_group}
+
+
+def turtle_functions(backend, **kwargs):
     """
     Return a dictionary with all turtle-related functions.
+
+    Keyword arguments are passed to the make_turtle_namespace() function of
+    the backend. The headless backend accepts the
+    :class:`transpyler.turtle.headless.HeadlessStateGroup` that receives the
+    turtles as the group argument, so the drawing can be rendered later.
     """
 
     if backend == 'tk':
         from .turtle.tk import make_turtle_namespace
 
-        ns = make_turtle_namespace()
+        ns = make_turtle_namespace(**kwargs)
     elif backend == 'qt':
         from .turtle.qt import make_turtle_namespace
 
-        ns = make_turtle_namespace()
+        ns = make_turtle_namespace(**kwargs)
+    elif backend == 'headless':
+        from .turtle.headless import make_turtle_namespace
+
+        ns = make_turtle_namespace(**kwargs)
     else:
         raise ValueError('invalid backend: %r' % backend)
 
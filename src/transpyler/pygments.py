@@ -1,21 +1,55 @@
+import hashlib
+import json
+import os
 import re
+import tokenize
+from keyword import iskeyword
+from tokenize import NAME, OP, ERRORTOKEN
 
 from pygments import unistring as uni
-from pygments.lexer import bygroups, default, words
+from pygments.lexer import Lexer, bygroups, default, words
 from pygments.lexers.python import Python3Lexer
-from pygments.token import Text, Operator, Keyword, Name, String, Number
+from pygments.token import Text, Operator, Keyword, Name, String, Number, \
+    Comment, Error, Punctuation
 from pygments.util import shebang_matches
 
+from .introspection import Introspection, KEYWORD, CONSTANT, EXCEPTION, \
+    TYPE, FUNCTION
+from .token import token_find
 
-def transpyler_lexer_factory(transpyler):
+# Maps (name, lang, vocabulary hash) to lexer classes
+LEXER_CACHE = {}
+
+
+def transpyler_lexer_factory(transpyler, cache_dir=None):
     """
     Return a Pygments lexer class for the given transpyler.
+
+    Lexer classes are cached per transpyler name, language and vocabulary and
+    their regular expressions are compiled at creation. If cache_dir is given,
+    the optimized regular expressions for keywords and builtin names are
+    also persisted to disk and reused in different processes.
     """
 
+    key = lexer_cache_key(transpyler)
+    try:
+        return LEXER_CACHE[key]
+    except KeyError:
+        pass
+
+    patterns = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, 'lexer-%s-%s-%s.json' % key)
+        patterns = load_word_patterns(path)
+    if patterns is None:
+        patterns = make_word_patterns(transpyler)
+        if cache_dir is not None:
+            save_word_patterns(path, patterns)
+
     def analyse_text(text):
         return shebang_matches(text, r'pythonw?3(\.\d)?')
 
-    return type(
+    cls = type(
         transpyler.pygments_class_name,
         (Python3Lexer,),
         dict(
@@ -26,35 +60,102 @@ def transpyler_lexer_factory(transpyler):
             mimetypes=transpyler.mimetypes,
             flags=re.MULTILINE | re.UNICODE,
             uni_name="[%s][%s]*" % (uni.xid_start, uni.xid_continue),
-            tokens=make_transpyled_tokens(transpyler),
+            tokens=make_transpyled_tokens(transpyler, patterns),
         )
     )
 
+    # Pygments compiles the token table on the first instantiation
+    cls()
+    LEXER_CACHE[key] = cls
+    return cls
+
+
+def lexer_cache_key(transpyler):
+    """
+    Return a (name, lang, hash) tuple that identifies the vocabulary of a
+    transpyler.
+
+    The hash is computed from the translations and the names in the
+    transpyler namespace.
+    """
+
+    translations = transpyler.translations or {}
+    data = sorted(repr(item) for item in translations.items())
+    data.extend(sorted(transpyler.introspection.index))
+    digest = hashlib.sha1('\n'.join(data).encode('utf8')).hexdigest()
+    return transpyler.name, transpyler.lang, digest[:16]
+
 
-def make_transpyled_tokens(transpyler):
+def make_word_patterns(transpyler):
+    """
+    Return a dictionary with optimized regular expressions that match the
+    keywords, constants, builtins and exceptions of the given transpyler.
+    """
+
+    introspection = transpyler.introspection
+    builtin_prefix = r'(?<!\.)'
+    patterns = {
+        'keywords': words(introspection.all_keywords, suffix=r'\b'),
+        'constants': words(introspection.all_constants, suffix=r'\b'),
+        'builtins': words(introspection.all_builtins,
+                          prefix=builtin_prefix, suffix=r'\b'),
+        'exceptions': words(introspection.all_exceptions,
+                            prefix=builtin_prefix, suffix=r'\b'),
+    }
+
+    # Empty patterns would match the empty string and loop forever
+    return {k: v.get() if v.words else None for k, v in patterns.items()}
+
+
+def load_word_patterns(path):
+    """
+    Load patterns saved with :func:`save_word_patterns`. Return None if the
+    file does not exist or is invalid.
+    """
+
+    try:
+        with open(path, encoding='utf8') as F:
+            return json.load(F)
+    except (OSError, ValueError):
+        return None
+
+
+def save_word_patterns(path, patterns):
+    """
+    Save patterns created by :func:`make_word_patterns` in the given path.
+    """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf8') as F:
+        json.dump(patterns, F)
+    os.replace(tmp_path, path)
+
+
+def make_transpyled_tokens(transpyler, patterns=None):
     """
     Return a list of pygments make_transpyled_tokens from a transpyler object.
+
+    Patterns for keywords and builtins are computed by
+    :func:`make_word_patterns` if not given.
     """
 
-    keywords = transpyler.introspection.all_keywords
-    constants = transpyler.introspection.all_constants
-    exceptions = transpyler.introspection.all_exceptions
-    builtins = transpyler.introspection.all_builtins
+    if patterns is None:
+        patterns = make_word_patterns(transpyler)
 
     uni_name = "[%s][%s]*" % (uni.xid_start, uni.xid_continue)
 
     tokens = Python3Lexer.tokens.copy()
 
-    tokens['keywords'] = [
-        (words(keywords, suffix=r'\b'), Keyword),
-        (words(constants, suffix=r'\b'), Keyword.Constant),
-    ]
-    tokens['builtins'] = [
-        (words(builtins, prefix=r'(?<!\.)', suffix=r'\b'), Name.Builtin),
+    tokens['keywords'] = without_empty([
+        (patterns['keywords'], Keyword),
+        (patterns['constants'], Keyword.Constant),
+    ])
+    tokens['builtins'] = without_empty([
+        (patterns['builtins'], Name.Builtin),
         (r'(?<!\.)(self|Ellipsis|NotImplemented)\b', Name.Builtin.Pseudo),
-        (words(exceptions, prefix=r'(?<!\.)', suffix=r'\b'),
-         Name.Exception),
-    ]
+        (patterns['exceptions'], Name.Exception),
+    ])
     tokens['numbers'] = [
         (r'(\d+\.\d*|\d*\.\d+)([eE][+-]?[0-9]+)?', Number.Float),
         (r'0[oO][0-7]+', Number.Oct),
@@ -104,3 +205,205 @@ def make_transpyled_tokens(transpyler):
         # newlines are an error (use "nl" state)
     ]
     return tokens
+
+
+def without_empty(rules):
+    """
+    Remove rules with empty patterns from a list of token rules.
+    """
+
+    return [rule for rule in rules if rule[0] is not None]
+
+
+#
+# Lexer based on the transpyler token stream
+#
+class TranspylerLexer(Lexer):
+    """
+    A Pygments lexer that classifies the tokens produced by the transpyler
+    lexer instead of matching keywords with regular expressions.
+
+    Multi-token keywords such as ``para cada`` are recognized by the same
+    sequence matcher used in transpilation. Each name is classified by a
+    single lookup in the introspection index.
+    """
+
+    name = 'Transpyler'
+    transpyler = None
+
+    def __init__(self, transpyler=None, **options):
+        if transpyler is not None:
+            self.transpyler = transpyler
+        if self.transpyler is None:
+            raise ValueError('transpyler was not defined')
+        super().__init__(**options)
+
+        lexer = self.transpyler.lexer
+        self._sequences = list(lexer.sequence_translations)
+        self._translations = dict(lexer.single_translations)
+        for seq, value in lexer.sequence_translations.items():
+            self._translations[seq] = value
+
+    def get_tokens_unprocessed(self, text):
+        tokens = self.transpyler.lexer.tokenize_info(text)
+        types = self.classify(tokens)
+
+        # Offsets of each line in text. The tokenizer only breaks lines at
+        # \n, so str.splitlines() cannot be used here: it also splits at form
+        # feeds, lone carriage returns, etc.
+        offsets = [0, 0]
+        for line in text.split('\n'):
+            offsets.append(offsets[-1] + len(line) + 1)
+
+        pos = 0
+        for tk, tt in zip(tokens, types):
+            if tt is None:
+                continue
+            start = offsets[tk.start[0]] + tk.start[1]
+            end = offsets[tk.end[0]] + tk.end[1]
+            if start > pos:
+                yield pos, Text, text[pos:start]
+            if end > start:
+                yield start, tt, text[start:end]
+            pos = max(pos, end)
+
+        # Tokenizer stops at unfinished strings and statements
+        if pos < len(text):
+            yield pos, Text, text[pos:]
+
+    def classify(self, tokens):
+        """
+        Return a list with the Pygments token type for each token.
+        """
+
+        types = [TOKEN_TYPES.get(tk.type, Text) for tk in tokens]
+        translations = self._translations
+
+        # Multi token keywords
+        for idx, match, _, _ in token_find(tokens, self._sequences):
+            for k in range(idx, idx + len(match)):
+                if tokens[k].type == NAME:
+                    types[k] = Keyword
+            mark_definition(tokens, types, idx + len(match),
+                            translations[match])
+
+        # Other tokens are classified by their token type
+        classifiers = self._classifiers
+        for idx, tk in enumerate(tokens):
+            classifier = classifiers.get(tk.type)
+            if classifier is not None:
+                classifier(self, tokens, types, idx)
+        return types
+
+    def _classify_op(self, tokens, types, idx):
+        if tokens[idx].string in PUNCTUATION:
+            types[idx] = Punctuation
+
+    def _classify_name(self, tokens, types, idx):
+        # Names already classified as parts of a sequence and attributes are
+        # kept as is
+        if types[idx] is not Name:
+            return
+        elif idx and tokens[idx - 1].string == '.':
+            return
+
+        name = tokens[idx].string
+        translations = self._translations
+        if name in translations or iskeyword(name):
+            target = translations.get(name, name)
+            types[idx] = Keyword.Constant \
+                if target in Introspection.py_constants else Keyword
+            mark_definition(tokens, types, idx + 1, target)
+        else:
+            category = self.transpyler.introspection.category(name)
+            types[idx] = CATEGORY_TYPES.get(category, Name)
+
+    def _classify_errortoken(self, tokens, types, idx):
+        if tokens[idx].string.isspace():
+            types[idx] = Text
+
+    _classifiers = {
+        OP: _classify_op,
+        NAME: _classify_name,
+        ERRORTOKEN: _classify_errortoken,
+    }
+
+
+def mark_definition(tokens, types, idx, keyword):
+    """
+    Mark the name after a 'def' or 'class' keyword.
+    """
+
+    if keyword in ('def', 'class') and idx < len(tokens):
+        if tokens[idx].type == NAME:
+            types[idx] = Name.Function if keyword == 'def' else Name.Class
+
+
+def transpyler_token_lexer_factory(transpyler):
+    """
+    Return a lexer class based on :class:`TranspylerLexer` for the given
+    transpyler.
+    """
+
+    return type(
+        transpyler.pygments_class_name,
+        (TranspylerLexer,),
+        dict(
+            transpyler=transpyler,
+            name=transpyler.name,
+            aliases=[transpyler.display_name],
+            filenames=transpyler.file_extensions,
+            mimetypes=transpyler.mimetypes,
+        )
+    )
+
+
+PUNCTUATION = set('()[]{},:;.')
+TOKEN_TYPES = {
+    tokenize.NAME: Name,
+    tokenize.NUMBER: Number,
+    tokenize.STRING: String,
+    tokenize.COMMENT: Comment.Single,
+    tokenize.OP: Operator,
+    tokenize.NEWLINE: Text,
+    tokenize.NL: Text,
+    tokenize.INDENT: Text,
+    tokenize.ERRORTOKEN: Error,
+    tokenize.DEDENT: None,
+    tokenize.ENDMARKER: None,
+}
+CATEGORY_TYPES = {
+    KEYWORD: Keyword,
+    CONSTANT: Keyword.Constant,
+    EXCEPTION: Name.Exception,
+    TYPE: Name.Builtin,
+    FUNCTION: Name.Builtin,
+}
+
+
+#
+# Benchmark
+#
+def benchmark(transpyler, source, repeat=5):
+    """
+    Compare the throughput of the regex lexer and the token lexer on the
+    given source.
+
+    Return a dictionary mapping each lexer name ('regex' or 'token') to the
+    best time of the given number of repetitions, in seconds.
+    """
+
+    import time
+
+    result = {}
+    for name, factory in [('regex', transpyler_lexer_factory),
+                          ('token', transpyler_token_lexer_factory)]:
+        lexer = factory(transpyler)()
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in lexer.get_tokens_unprocessed(source):
+                pass
+            times.append(time.perf_counter() - t0)
+        result[name] = min(times)
+    return result
@@ -0,0 +1,134 @@
+import sys
+from array import array
+from tokenize import NEWLINE, NL, INDENT, DEDENT, ENDMARKER
+
+# Tokens that do not correspond to a visible position in the output
+SKIP_TOKENS = {NEWLINE, NL, INDENT, DEDENT, ENDMARKER}
+
+
+class SourceMap:
+    """
+    Map positions in transpiled Python code back to the original source.
+
+    The map is a sequence of segments (out_lineno, out_col, src_lineno,
+    src_col) sorted by their output position. Each segment marks the start of
+    a token in the output and the position of the source token it came from.
+
+    Segments are delta encoded in integer arrays: line numbers are stored as
+    the difference from the previous segment and columns as the difference
+    from the previous segment in the same line.
+    """
+
+    def __init__(self, segments=(), source=None):
+        self.source = source
+        self._data = array('i')
+        self._last = (1, 0, 1, 0)
+        for segment in segments:
+            self.add(*segment)
+
+    def __len__(self):
+        return len(self._data) // 4
+
+    def __iter__(self):
+        data = self._data
+        out_lineno, out_col, src_lineno, src_col = 1, 0, 1, 0
+        for i in range(0, len(data), 4):
+            dline, dcol, dsrc_line, dsrc_col = data[i:i + 4]
+            out_col = dcol if dline else out_col + dcol
+            out_lineno += dline
+            src_col = dsrc_col if dsrc_line else src_col + dsrc_col
+            src_lineno += dsrc_line
+            yield out_lineno, out_col, src_lineno, src_col
+
+    def __repr__(self):
+        return '<SourceMap: %s segments>' % len(self)
+
+    @classmethod
+    def from_tokens(cls, tokens, source=None, line_offset=0, col_offset=0):
+        """
+        Create a source map from a list of transpiled tokens.
+
+        The output position of each token is its start and the source
+        position is its origin. The offsets displace the output positions of
+        all tokens; col_offset only applies to the first line with tokens.
+        """
+
+        smap = cls(source=source)
+        first_lineno = None
+        for tk in tokens:
+            if tk.type in SKIP_TOKENS or tk.origin is None:
+                continue
+            lineno, col = tk.start
+            if first_lineno is None:
+                first_lineno = lineno
+            if lineno == first_lineno:
+                col += col_offset
+            smap.add(lineno + line_offset, col, *tk.origin)
+        return smap
+
+    def add(self, out_lineno, out_col, src_lineno, src_col):
+        """
+        Append a new segment to the map.
+
+        Segments must be added in the order of their output positions.
+        """
+
+        last_line, last_col, last_src_line, last_src_col = self._last
+        dline = out_lineno - last_line
+        dsrc_line = src_lineno - last_src_line
+        self._data.extend([
+            dline,
+            out_col if dline else out_col - last_col,
+            dsrc_line,
+            src_col if dsrc_line else src_col - last_src_col,
+        ])
+        self._last = (out_lineno, out_col, src_lineno, src_col)
+
+    def source_position(self, lineno, col=0):
+        """
+        Return the (lineno, col) position in the source that corresponds to
+        the given position in the transpiled code.
+
+        Positions inside a token are displaced from the start of the source
+        token. Positions with no segment before them in the same line are
+        displaced from the last mapped line.
+        """
+
+        best = None
+        for segment in self:
+            if segment[:2] > (lineno, col):
+                break
+            best = segment
+        if best is None:
+            return lineno, col
+
+        out_lineno, out_col, src_lineno, src_col = best
+        if out_lineno != lineno:
+            return src_lineno + lineno - out_lineno, col
+        return src_lineno, src_col + col - out_col
+
+    def source_lineno(self, lineno):
+        """
+        Return the line number in the source that corresponds to the given
+        line of transpiled code.
+        """
+
+        return self.source_position(lineno, sys.maxsize)[0]
+
+    def source_line(self, lineno):
+        """
+        Return the line in the original source that corresponds to the given
+        line of transpiled code.
+
+        Return None if the source is unknown.
+        """
+
+        if self.source is None:
+            return None
+        # The tokenizer only breaks lines at \n. str.splitlines() would also
+        # split at form feeds, vertical tabs, etc.
+        src_lineno = self.source_lineno(lineno)
+        lines = self.source.split('\n')
+        if 1 <= src_lineno <= len(lines):
+            return lines[src_lineno - 1].rstrip('\r')
+        return None
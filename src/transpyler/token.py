@@ -68,6 +68,10 @@ class Token:
         self.end = end
         self.line = line
 
+        # Position of the token in the original source. It is not changed
+        # when the token is displaced and is used to build source maps.
+        self.origin = start
+
     def __eq__(self, other):  # noqa: C901
         if isinstance(other, Token):
             if self.string is None or other.string is None:
@@ -274,27 +278,32 @@ def token_find(tokens, matches, start=0):
     Iterate over list of tokens yielding (index, match, start, end) for
     each match in the token stream. The `matches` attribute must be a sequence
     of token sequences.
+
+    Sequences are indexed by their first token, hence the cost of scanning the
+    token stream does not grow with the number of sequences. Longer sequences
+    take precedence over shorter ones starting with the same token.
     """
 
-    matches = list(matches)
-    tk_matches = \
-        [tuple(Token(tk, abstract=True) for tk in seq) for seq in matches]
-    tk_matches = \
-        [tuple((tk.string, tk.type) for tk in seq) for seq in tk_matches]
-    tk_idx = start
+    candidates = {}
+    for match in matches:
+        seq = [Token(tk, abstract=True) for tk in match]
+        key = tuple((tk.string, tk.type) for tk in seq)
+        candidates.setdefault(key[0], []).append((key, match))
+    for lst in candidates.values():
+        lst.sort(key=lambda x: -len(x[0]))
 
+    tk_idx = start
     while tk_idx < len(tokens):
-        for match_idx, tkmatch in enumerate(tk_matches):
-            if tk_idx + len(tkmatch) > len(tokens):
+        token = tokens[tk_idx]
+        for key, match in candidates.get((token.string, token.type), ()):
+            end_idx = tk_idx + len(key)
+            if end_idx > len(tokens):
                 continue
 
-            if all(tokens[tk_idx + k] == tk for (k, tk) in enumerate(tkmatch)):
-                matchsize = len(tkmatch)
-
-                # Yield value and try to receive commands from sender
-                start = tokens[tk_idx].start
-                end = tokens[tk_idx + matchsize - 1].end
-                yield (tk_idx, matches[match_idx], start, end)
-                tk_idx += 1
+            if key == tuple((tk.string, tk.type)
+                            for tk in tokens[tk_idx:end_idx]):
+                # The consumer may modify the token list after receiving the
+                # value, so we continue scanning from the next position
+                yield (tk_idx, match, token.start, tokens[end_idx - 1].end)
+                break
         tk_idx += 1
-    return
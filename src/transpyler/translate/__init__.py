@@ -1,3 +1,5 @@
 from .gettext import gettext_for, create_pot_file, L10N_PATH, gettext, set_language
+from .gettext import translations_from_po, merge_translations
 from .extract import extract_translations, extract_translation
+from .bundle import make_bundle, load_bundle, compile_bundle, bundle_for
 from .translate import translate_namespace, apply_translations, translator_factory
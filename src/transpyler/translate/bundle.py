@@ -0,0 +1,205 @@
+"""
+Precompiled translation bundles.
+
+A bundle stores the final translation table computed from a PO file, so
+translate_namespace() can load it with a single read instead of parsing a .mo
+file and translating every entry in the namespace.
+"""
+
+import hashlib
+import marshal
+import os
+
+import polib
+
+from .gettext import L10N_PATH, gettext_for
+
+BUNDLE_VERSION = 2
+BUNDLE_EXTENSION = '.bundle'
+
+
+def make_bundle(po, namespace=None):
+    """
+    Create a translation bundle from a PO file or a path to a PO file.
+
+    The bundle is a dictionary with the following keys:
+
+    messages:
+        Maps each msgid to its translation. Like the .mo files compiled by
+        msgfmt, it only includes entries that are translated and are neither
+        fuzzy nor obsolete.
+    objects:
+        Maps each name in the given namespace to a tuple of (fingerprint,
+        translated_name, name, args, doc, synonyms). The fingerprint is
+        computed by :func:`transpyler.translate.extract.fingerprint` and
+        identifies the version of the object the record was computed for.
+        The translated name is the key in the translated namespace and the
+        other values are the (name, args, doc, synonyms) record applied to
+        the object. The table is empty if no namespace is given.
+    source_hash:
+        Hash of the contents of the PO file, if it was given as a path.
+
+    Records are computed with the same procedure used by
+    :func:`transpyler.translate.translate.translate_namespace_gettext`, so
+    translations with and without the bundle are the same.
+    """
+
+    source_hash = None
+    if isinstance(po, str):
+        source_hash = file_hash(po)
+        po = polib.pofile(po)
+
+    messages = message_catalog(po)
+    return {
+        'version': BUNDLE_VERSION,
+        'language': po.metadata.get('Language', ''),
+        'source_hash': source_hash,
+        'messages': messages,
+        'objects': object_records(namespace or {}, messages.get),
+    }
+
+
+def message_catalog(po):
+    """
+    Return a dictionary mapping msgids to their translations with the same
+    entries msgfmt includes in a .mo file.
+    """
+
+    return {
+        entry.msgid: entry.msgstr for entry in po
+        if entry.msgstr and not entry.obsolete and 'fuzzy' not in entry.flags
+    }
+
+
+def object_records(namespace, lookup):
+    """
+    Compute the bundle records for all objects in namespace using the given
+    message lookup function.
+
+    Objects with entries in the namespace TRANSLATIONS dictionary are
+    skipped, since their translations do not depend only on the object.
+    """
+
+    from .extract import fingerprint
+    from .translate import object_translation_data, translated_name, \
+        translation_key_name
+
+    def _(msg):
+        return lookup(msg) or msg
+
+    extra = {translation_key_name(k) for k in namespace.get('TRANSLATIONS', {})}
+    objects = {}
+    for name, obj in namespace.items():
+        if name.startswith('_') or name == 'TRANSLATIONS' or name in extra:
+            continue
+        data = object_translation_data(name, obj, _)
+        objects[name] = (fingerprint(obj), translated_name(name, _)) + \
+            translation_record(data)
+    return objects
+
+
+def bundle_gettext(bundle, lang):
+    """
+    Return a gettext function that looks up messages in the bundle.
+
+    Messages missing from the bundle are translated with the gettext
+    translations for the given language, which are only loaded if needed.
+    """
+
+    messages = bundle['messages']
+    fallback = []
+
+    def gettext(msg):
+        try:
+            return messages[msg]
+        except KeyError:
+            pass
+        if not fallback:
+            fallback.append(gettext_for(lang).gettext)
+        return fallback[0](msg)
+
+    return gettext
+
+
+def file_hash(path):
+    """
+    Return the SHA1 hash of the contents of the given file.
+    """
+
+    with open(path, 'rb') as F:
+        return hashlib.sha1(F.read()).hexdigest()
+
+
+def translation_record(data):
+    """
+    Convert a dictionary of {'name': ..., 'args': ..., 'doc': ...} raw
+    translation strings to a (name, args, doc, synonyms) tuple.
+    """
+
+    names = data.get('name', '').strip().splitlines()
+    name, *synonyms = names or ['']
+    args = data.get('args')
+    if args is not None:
+        args = tuple(x.strip() for x in args.split(',') if x.strip())
+    return name, args, data.get('doc'), tuple(synonyms)
+
+
+def save_bundle(bundle, path):
+    """
+    Save bundle created by :func:`make_bundle` in the given path.
+    """
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as F:
+        marshal.dump(bundle, F)
+    os.replace(tmp_path, path)
+
+
+def load_bundle(path):
+    """
+    Load a bundle saved by :func:`save_bundle`. Return None if the file does
+    not exist or has an incompatible format.
+    """
+
+    try:
+        with open(path, 'rb') as F:
+            bundle = marshal.loads(F.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(bundle, dict) or \
+            bundle.get('version') != BUNDLE_VERSION:
+        return None
+    return bundle
+
+
+def compile_bundle(lang, l10n_path=L10N_PATH, namespace=None):
+    """
+    Compile the PO file for the given language to a bundle saved in the same
+    directory. Return the path to the bundle file.
+
+    Records are precomputed for the objects in the given namespace.
+    """
+
+    lang = lang.replace('-', '_')
+    path = os.path.join(l10n_path, lang + BUNDLE_EXTENSION)
+    po_path = os.path.join(l10n_path, lang + '.po')
+    save_bundle(make_bundle(po_path, namespace), path)
+    return path
+
+
+def bundle_for(lang, l10n_path=L10N_PATH):
+    """
+    Return the translation bundle for the given language or None if the
+    bundle does not exist or was not compiled from the current contents of
+    the corresponding PO file.
+    """
+
+    lang = lang.replace('-', '_')
+    bundle = load_bundle(os.path.join(l10n_path, lang + BUNDLE_EXTENSION))
+    if bundle is None:
+        return None
+    try:
+        source_hash = file_hash(os.path.join(l10n_path, lang + '.po'))
+    except OSError:
+        return bundle
+    return bundle if bundle['source_hash'] == source_hash else None
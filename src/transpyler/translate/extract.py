@@ -1,9 +1,16 @@
+import hashlib
+import json
+import os
 import types
 from collections import OrderedDict
 from functools import singledispatch
 
 from ..utils import normalize_docstring
 
+EXTRACT_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'transpyler', 'extract-cache.json'
+)
+
 
 #
 # Extract translations: these functions generate a .pot file from a python
@@ -36,19 +43,151 @@ def extract_translations(namespace):
     for k, v in namespace.items():
         if k.startswith('_') or k == 'TRANSLATIONS':
             continue
-
-        translations = extract_translation(v)
-        if translations:
-            for name, st in translations.items():
-                name = name if name.startswith(':') else '.' + name
-                result[k + name] = st
-        else:
-            result[k] = k
+        result.update(extract_object_translations(k, v))
 
     result.update(extra_translations)
     return result
 
 
+def extract_object_translations(name, obj):
+    """
+    Return a dictionary with the translation strings for the object with the
+    given name in a namespace.
+    """
+
+    result = OrderedDict()
+    translations = extract_translation(obj)
+    if translations:
+        for path, st in translations.items():
+            path = path if path.startswith(':') else '.' + path
+            result[name + path] = st
+    else:
+        result[name] = name
+    return result
+
+
+def extract_translations_incremental(namespace, cache=None):
+    """
+    Like :func:`extract_translations`, but reuse the results for objects that
+    did not change since the last extraction.
+
+    The cache is a dictionary mapping names to lists of [fingerprint,
+    translations], as computed by :func:`fingerprint`. It is updated inplace.
+
+    Return a tuple (translations, changed) in which changed is the set of
+    names that were extracted again.
+    """
+
+    cache = {} if cache is None else cache
+    result = OrderedDict()
+    changed = set()
+    extra_translations = namespace.get('TRANSLATIONS', {})
+    names = set()
+
+    for k, v in namespace.items():
+        if k.startswith('_') or k == 'TRANSLATIONS':
+            continue
+        names.add(k)
+        fp = fingerprint(v)
+        try:
+            cached_fp, translations = cache[k]
+        except (KeyError, ValueError):
+            cached_fp = translations = None
+        if cached_fp != fp:
+            translations = extract_object_translations(k, v)
+            cache[k] = [fp, translations]
+            changed.add(k)
+        result.update(translations)
+
+    # Remove objects that were deleted from the namespace
+    for k in set(cache) - names:
+        del cache[k]
+        changed.add(k)
+
+    result.update(extra_translations)
+    return result, changed
+
+
+def load_extract_cache(path):
+    """
+    Load the cache used by :func:`extract_translations_incremental` from a
+    JSON file. Return an empty cache if file does not exist or is invalid.
+    """
+
+    try:
+        with open(path, encoding='utf8') as F:
+            cache = json.load(F, object_pairs_hook=OrderedDict)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_extract_cache(cache, path):
+    """
+    Save cache used by :func:`extract_translations_incremental` in the given
+    path, creating its directory if necessary.
+    """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf8') as F:
+        json.dump(cache, F, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+#
+# Fingerprints: a hash of everything that contributes to the translation
+# strings of an object
+#
+def fingerprint(obj):
+    """
+    Return a string that changes when the name, signature or docstrings of an
+    object or any of its public members change.
+    """
+
+    data = repr(fingerprint_data(obj)).encode('utf8')
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+@singledispatch
+def fingerprint_data(obj):
+    """
+    Return a structure with the data used by :func:`fingerprint`.
+    """
+
+    return (
+        type(obj).__name__,
+        getattr(obj, '__name__', None),
+        getattr(obj, '__doc__', None),
+        tuple(getattr(obj, '__synonyms__', ())),
+    )
+
+
+@fingerprint_data.register(types.FunctionType)
+def fingerprint_data_function(obj):
+    data = fingerprint_data.dispatch(object)(obj)
+    return data + (obj.__code__.co_varnames,)
+
+
+@fingerprint_data.register(type)
+def fingerprint_data_type(obj):
+    data = [fingerprint_data.dispatch(object)(obj)]
+
+    # Members are collected from the class dictionaries, which is much cheaper
+    # than using dir() and getattr()
+    for base in obj.__mro__:
+        if base is object:
+            continue
+        for attr, value in sorted(vars(base).items()):
+            if attr.startswith('_'):
+                continue
+            if isinstance(value, types.FunctionType):
+                data.append((attr, fingerprint_data(value)))
+            else:
+                data.append(attr)
+    return tuple(data)
+
+
 @singledispatch
 def extract_translation(obj):
     """
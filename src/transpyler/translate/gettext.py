@@ -88,3 +88,77 @@ def create_pot_file(translations, path=None):
     if path:
         pot.save(path)
     return pot
+
+
+def translations_from_po(po):
+    """
+    Return a dictionary mapping translation ids to msgids from the comments
+    in a PO or POT file created by :func:`create_pot_file`.
+
+    Obsolete entries are ignored.
+    """
+
+    result = {}
+    for entry in po:
+        if entry.obsolete:
+            continue
+        for key in entry.comment.splitlines():
+            key = key.strip()
+            if key:
+                result[key] = entry.msgid
+    return result
+
+
+def merge_translations(po, old, new, keep_obsolete=True):
+    """
+    Update entries of a PO or POT file with the changes between the old and
+    new dictionaries of translation strings.
+
+    Only entries whose ids changed are touched, hence translations and flags
+    of all other entries are preserved. Entries that are no longer used are
+    marked as obsolete or removed if keep_obsolete is False.
+
+    Return the number of translation ids that changed.
+    """
+
+    changes = 0
+    keys = list(new) + [k for k in old if k not in new]
+    for key in keys:
+        old_msgid, new_msgid = old.get(key), new.get(key)
+        if old_msgid == new_msgid:
+            continue
+        changes += 1
+        if old_msgid is not None:
+            _remove_key(po, old_msgid, key, keep_obsolete)
+        if new_msgid is not None:
+            _add_key(po, new_msgid, key)
+    return changes
+
+
+def _remove_key(po, msgid, key, keep_obsolete):
+    # Remove translation id from the comments of the entry with the given
+    # msgid. Entries without ids become obsolete or are removed.
+    entry = po.find(msgid)
+    if entry is None:
+        return
+    lines = [x for x in entry.comment.splitlines() if x.strip() != key]
+    entry.comment = '\n'.join(lines)
+    if not lines and keep_obsolete:
+        entry.obsolete = True
+    elif not lines:
+        po.remove(entry)
+
+
+def _add_key(po, msgid, key):
+    # Add translation id to the entry with the given msgid, reviving
+    # obsolete entries or creating a new entry if necessary
+    entry = po.find(msgid)
+    if entry is None:
+        entry = po.find(msgid, include_obsolete_entries=True)
+    if entry is None:
+        po.append(polib.POEntry(msgid=msgid, comment=key))
+        return
+    entry.obsolete = False
+    lines = entry.comment.splitlines()
+    if key not in lines:
+        entry.comment = '\n'.join(lines + [key])
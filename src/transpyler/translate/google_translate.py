@@ -1,24 +1,65 @@
+import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import polib
-from textblob import TextBlob as Blob
-from textblob.exceptions import NotTranslated
 
 from .gettext import L10N_PATH, PO_HEADER
 from ..utils.string import split_docstring
 
+CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'transpyler', 'translations.jsonl'
+)
 
-def google_translate(lang, verbose=True, prompt=True):
+
+def google_translate(lang, verbose=True, prompt=True, backend=None,
+                     workers=4, batch_size=50, cache_path=CACHE_PATH):
     """
     Fill translations for the given PO file using google translate.
+
+    Untranslated entries are translated in batches by a pool of ``workers``
+    threads and the PO file is saved after each batch. Results are memoized
+    in a persistent cache at cache_path (use None to disable it) as soon as
+    they arrive, hence an interrupted run can be resumed cheaply.
+
+    The backend is a function backend(text, source_lang, target_lang) that
+    translates a single string. The default uses google translate.
     """
 
     # Utility functions
     echo = print if verbose or prompt else lambda *args, **kwargs: None
-    ask = _ask(verbose, prompt)
     showline = _showline(verbose, prompt)
 
-    # Prepare
+    def show_entry(entry):
+        echo('\n'.join('#. ' + line for line in entry.comment.splitlines()))
+        echo(entry.msgid)
+
+    def on_batch(batch):
+        for entry in batch:
+            if not prompt:
+                show_entry(entry)
+            showline()
+            echo('\nTRANSLATION\n')
+            echo(entry.msgstr)
+            showline()
+
+    pofile = load_po_file(lang, echo)
+    entries = untranslated_entries(pofile)
+    if prompt:
+        entries = select_entries(entries, show_entry, _ask(verbose, prompt))
+    translator = GoogleTranslator(lang, backend=backend,
+                                  cache=TranslationCache(cache_path))
+    translate_entries(pofile, entries, translator, workers=workers,
+                      batch_size=batch_size, callback=on_batch)
+
+
+def load_po_file(lang, echo=print):
+    """
+    Load the PO file for the given language, creating it from the potfile if
+    necessary.
+    """
+
     popath = os.path.join(L10N_PATH, lang + '.po')
     if os.path.exists(popath):
         echo('Loading file: %r' % popath, '\n\n')
@@ -26,31 +67,70 @@ def google_translate(lang, verbose=True, prompt=True):
         echo('Creating file: %r' % popath, '\n\n')
         potpath = os.path.join(L10N_PATH, 'transpyler.pot')
         save_po_file(potpath, popath, lang)
-    pofile = polib.pofile(popath)
+    return polib.pofile(popath)
 
-    translator = GoogleTranslator(lang)
 
-    # Mainloop: handle all missing translations and pass them to google
-    # translate
-    for entry in pofile:
-        if entry.msgstr:
-            continue
+def select_entries(entries, show, ask):
+    """
+    Show each entry and return the list of entries that the user chose to
+    translate.
+    """
 
-        echo('\n'.join('#. ' + line for line in entry.comment.splitlines()))
-        echo(entry.msgid)
+    selected = []
+    for entry in entries:
+        show(entry)
         if ask():
-            id = entry.comment.rpartition('.')[-1]
-            entry.msgstr = translator(entry.msgid, id)
-            entry.flags.append('fuzzy')
+            selected.append(entry)
+    return selected
 
-            # Show message
-            showline()
-            echo('\nTRANSLATION\n')
-            echo(entry.msgstr)
-            showline()
 
-            # Save
-            pofile.save()
+def untranslated_entries(pofile):
+    """
+    Return a list of entries without translations in the given PO file.
+    """
+
+    return [entry for entry in pofile if not entry.msgstr]
+
+
+def translate_entries(pofile, entries, translator, workers=4, batch_size=50,
+                      callback=None):
+    """
+    Translate entries of pofile in batches.
+
+    Each batch is translated concurrently by at most ``workers`` threads.
+    Translations are marked as fuzzy and the PO file is saved once after each
+    batch, even if the batch fails partway. If given, callback(batch) is
+    called after saving each batch. The translator's cache, if any, is
+    compacted at the end.
+    """
+
+    cache = getattr(translator, 'cache', None)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for idx in range(0, len(entries), batch_size):
+                batch = entries[idx:idx + batch_size]
+                try:
+                    translate_batch(batch, translator, executor)
+                finally:
+                    pofile.save()
+                if callback is not None:
+                    callback(batch)
+    finally:
+        if cache is not None:
+            cache.save()
+
+
+def translate_batch(batch, translator, executor):
+    """
+    Translate a list of entries concurrently using the given executor.
+    """
+
+    jobs = [(entry.msgid, entry.comment.rpartition('.')[-1])
+            for entry in batch]
+    results = executor.map(lambda job: translator(*job), jobs)
+    for entry, result in zip(batch, results):
+        entry.msgstr = result
+        entry.flags.append('fuzzy')
 
 
 def save_po_file(potpath, popath, lang):
@@ -82,15 +162,124 @@ def _ask(verbose, prompt):
     )
 
 
+class TranslationCache:
+    """
+    A persistent cache of translations keyed by (text, lang).
+
+    The cache is stored at the given path as a JSON lines file in which each
+    line is a [lang, text, translation] list. Translations are appended to
+    the file as soon as they are set, so they survive a run that fails or is
+    interrupted. :meth:`save` rewrites the file without duplicate or broken
+    lines. A path of None creates an in-memory cache.
+
+    Methods are thread safe.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._data = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            self._load(path)
+
+    def __len__(self):
+        return sum(len(x) for x in self._data.values())
+
+    def get(self, text, lang):
+        """
+        Return the cached translation of text or None.
+        """
+
+        return self._data.get(lang, {}).get(text)
+
+    def set(self, text, lang, translation):
+        """
+        Save translation of text to the given language.
+        """
+
+        with self._lock:
+            self._data.setdefault(lang, {})[text] = translation
+            if self.path is not None:
+                self._makedirs()
+                with open(self.path, 'a', encoding='utf8') as F:
+                    F.write(_dump_line(lang, text, translation))
+
+    def save(self):
+        """
+        Rewrite the cache file without duplicate entries.
+        """
+
+        if self.path is None:
+            return
+        with self._lock:
+            self._makedirs()
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf8') as F:
+                for lang, data in self._data.items():
+                    for text, translation in data.items():
+                        F.write(_dump_line(lang, text, translation))
+            os.replace(tmp_path, self.path)
+
+    def _load(self, path):
+        try:
+            with open(path, encoding='utf8') as F:
+                lines = F.readlines()
+        except OSError:
+            return
+
+        # Invalid lines, e.g., a line truncated by an interrupted write, are
+        # ignored
+        for line in lines:
+            try:
+                lang, text, translation = _load_line(line)
+            except ValueError:
+                continue
+            self._data.setdefault(lang, {})[text] = translation
+
+    def _makedirs(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+
+def _dump_line(lang, text, translation):
+    return json.dumps([lang, text, translation], ensure_ascii=False) + '\n'
+
+
+def _load_line(line):
+    data = json.loads(line)
+    if not isinstance(data, list) or len(data) != 3:
+        raise ValueError('invalid cache line: %r' % line)
+    return data
+
+
+def google_backend(text, source_lang, target_lang):
+    """
+    Translate text using google translate through the textblob package.
+    """
+
+    from textblob import TextBlob as Blob
+    from textblob.exceptions import NotTranslated
+
+    try:
+        return '%s' % Blob(text).translate(source_lang, target_lang)
+    except NotTranslated:
+        return text
+
+
 class GoogleTranslator:
     """
     A namespace with utility functions used to implement translations with
     google translate.
+
+    The backend and cache arguments are described in
+    :func:`google_translate`. Calls are thread safe as long as the backend
+    is.
     """
 
-    def __init__(self, lang):
+    def __init__(self, lang, backend=None, cache=None):
         self.lang = lang
         self.google_lang = lang.replace('_', '-')
+        self.backend = backend or google_backend
+        self.cache = cache if cache is not None else TranslationCache()
 
     def __call__(self, text, id):
         map = {
@@ -103,10 +292,10 @@ class GoogleTranslator:
     def google_translate(self, x):
         if not x:
             return ''
-        try:
-            result = '%s' % Blob(x).translate('en', self.google_lang)
-        except NotTranslated:
-            result = x
+        result = self.cache.get(x, self.lang)
+        if result is None:
+            result = self.backend(x, 'en', self.google_lang)
+            self.cache.set(x, self.lang, result)
 
         if x[0].isupper():
             return result
@@ -129,4 +318,5 @@ class GoogleTranslator:
         return translated.replace(' ', '_').replace('-', '_')
 
     def translate_args(self, text):
-        return ', '.join(map(self.translate_name, text.split(',')))
+        args = (arg.strip() for arg in text.split(','))
+        return ', '.join(map(self.translate_name, args))
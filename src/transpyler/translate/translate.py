@@ -7,34 +7,51 @@ import types
 from collections import defaultdict
 from functools import singledispatch
 
-from .extract import extract_translations
+from .bundle import bundle_for, bundle_gettext, translation_record
+from .extract import extract_translations, extract_object_translations, \
+    fingerprint
 from .gettext import gettext_for
 from ..utils.decorators import synonyms as _synonyms
 from ..utils.namespaces import collect_synonyms
 
 
-def translate_namespace(ns, lang, synonyms=True, add_unaccented=True):
+def translate_namespace(ns, lang, synonyms=True, add_unaccented=True,
+                        bundle=None):
     """
     Return a dict with the given namespace translated according to the
     requested ``lang``.
+
+    If a precompiled translation bundle exists for the language (see
+    :mod:`transpyler.translate.bundle`), it is used instead of extracting and
+    translating every string with gettext. A bundle can also be passed
+    explicitly. Both methods produce the same result.
     """
 
-    _ = gettext_for(lang).gettext
-    translation_data = defaultdict(dict)
-    translation_strings = extract_translations(ns)
-    for name, value in translation_strings.items():
-        # Translate methods in a class
-        if ':' in name:
-            classname, method = name.split(':')
-            name, sep, post = method.partition('.')
-            class_dict = translation_data[classname]
-            method_dict = class_dict.setdefault(name, {})
-            method_dict[post] = _(value)
+    if bundle is None:
+        bundle = bundle_for(lang)
+    if bundle is None:
+        namespace = translate_namespace_gettext(ns, lang)
+    else:
+        namespace = translate_namespace_bundle(ns, lang, bundle)
 
-        # Translate a function or regular object
-        else:
-            name, sep, post = name.partition('.')
-            translation_data[name][post] = _(value)
+    # Add synonyms and unaccented versions
+    if synonyms:
+        extra = collect_synonyms(namespace, add_unaccented=add_unaccented)
+        namespace.update(extra)
+    return namespace
+
+
+def translate_namespace_gettext(ns, lang, gettext=None):
+    """
+    Translate namespace extracting all translation strings and translating
+    them with gettext.
+
+    The gettext argument can replace the gettext function of the given
+    language.
+    """
+
+    _ = gettext or gettext_for(lang).gettext
+    translation_data = translation_table(extract_translations(ns), _)
 
     # Create namespace
     namespace = dict(ns)
@@ -42,20 +59,106 @@ def translate_namespace(ns, lang, synonyms=True, add_unaccented=True):
         if name not in ns:
             continue
         obj = ns[name]
-        translated_name = _(name).partition('\n')[0].strip()
-        namespace[translated_name] = apply_translations(obj, data)
+        namespace[translated_name(name, _)] = apply_translations(obj, data)
+    return namespace
 
-    # Add synonyms and unaccented versions
-    if synonyms:
-        extra = collect_synonyms(namespace, add_unaccented=add_unaccented)
-        namespace.update(extra)
+
+def translate_namespace_bundle(ns, lang, bundle):
+    """
+    Translate namespace using the records precomputed in a translation
+    bundle.
+
+    Objects without a record, objects that changed since the bundle was
+    created and objects with entries in the namespace TRANSLATIONS are
+    translated as in :func:`translate_namespace_gettext`.
+    """
+
+    objects = bundle['objects']
+    extra = translation_table(ns.get('TRANSLATIONS', {}), str)
+    _ = None
+
+    namespace = dict(ns)
+    for name, obj in ns.items():
+        if name.startswith('_') or name == 'TRANSLATIONS':
+            continue
+        record = objects.get(name)
+        if record is None or name in extra or record[0] != fingerprint(obj):
+            _ = _ or bundle_gettext(bundle, lang)
+            data = object_translation_data(name, obj, _, ns)
+            namespace[translated_name(name, _)] = apply_translations(obj, data)
+        else:
+            trans_name, *record = record[1:]
+            namespace[trans_name] = apply_translations(obj, tuple(record))
     return namespace
 
 
+def object_translation_data(name, obj, gettext, ns=None):
+    """
+    Return the dictionary of translated strings for the object with the given
+    name.
+
+    It considers the entries in the TRANSLATIONS dictionary of namespace, if
+    given.
+    """
+
+    strings = extract_object_translations(name, obj)
+    extra = {} if ns is None else ns.get('TRANSLATIONS', {})
+    strings.update((k, v) for k, v in extra.items()
+                   if translation_key_name(k) == name)
+    return translation_table(strings, gettext).get(name, {})
+
+
+def translation_table(strings, gettext):
+    """
+    Group translation strings extracted by :func:`extract_translations` by
+    the name of the object and translate them with the given gettext
+    function.
+
+    Class members are stored in sub-dictionaries keyed by the member name.
+    """
+
+    translation_data = defaultdict(dict)
+    for key, value in strings.items():
+        # Translate methods in a class
+        if ':' in key:
+            classname, method = key.split(':')
+            name, sep, post = method.partition('.')
+            class_dict = translation_data[classname]
+            method_dict = class_dict.setdefault(name, {})
+            method_dict[post] = gettext(value)
+
+        # Translate a function or regular object
+        else:
+            name, sep, post = key.partition('.')
+            translation_data[name][post] = gettext(value)
+    return translation_data
+
+
+def translation_key_name(key):
+    """
+    Return the name of the object that a translation key refers to.
+    """
+
+    if ':' in key:
+        return key.split(':')[0]
+    return key.partition('.')[0]
+
+
+def translated_name(name, gettext):
+    """
+    Return the translated name of an object in the namespace.
+    """
+
+    return gettext(name).partition('\n')[0].strip()
+
+
 @singledispatch
 def apply_translations(obj, data):
     """
     Translate object by applying translation data to object.
+
+    Data is either a dictionary of raw translation strings or a (name, args,
+    doc, synonyms) record as stored in translation bundles.
     """
     return obj
 
@@ -66,13 +169,21 @@ def apply_translations_function(func, data: dict):
     Return a translated version of func.
     """
 
-    names = data['name'].strip().splitlines()
-    name, *synonyms = names
-    varnames = tuple(map(str.strip, data.get('args', '').split(',')))
-    varnames = tuple(x for x in varnames if x)
-    assert len(varnames) == len(func.__code__.co_varnames), \
+    code = func.__code__
+    if isinstance(data, dict):
+        name, varnames, doc, synonyms = translation_record(data)
+    else:
+        # Records from translation bundles may be outdated with respect to
+        # the function signature. We keep the original names in this case
+        name, varnames, doc, synonyms = data
+        if varnames is not None and len(varnames) != len(code.co_varnames):
+            varnames = None
+    name = name or func.__name__
+    varnames = code.co_varnames if varnames is None else varnames
+    doc = func.__doc__ if doc is None else doc
+    assert len(varnames) == len(code.co_varnames), \
         '%s: size of argument names list changed during translation (from %s ' \
-        'to %s)' % (name, func.__code__.co_varnames, varnames)
+        'to %s)' % (name, code.co_varnames, varnames)
 
     #
     # Copy the code object and change the varnames parameter
@@ -82,7 +193,6 @@ def apply_translations_function(func, data: dict):
     #  constants, names, varnames, filename, name, firstlineno,
     #  lnotab[, freevars[, cellvars]])
     #
-    code = func.__code__
     new_code = types.CodeType(
         code.co_argcount, code.co_kwonlyargcount, code.co_nlocals,
         code.co_stacksize, code.co_flags, code.co_code, code.co_consts,
@@ -100,7 +210,7 @@ def apply_translations_function(func, data: dict):
         closure=func.__closure__
     )
     translated.__dict__.update(func.__dict__)
-    translated.__doc__ = data.get('doc', '')
+    translated.__doc__ = doc or ''
     translated.__kwdefaults__ = func.__kwdefaults__
     return _synonyms(*synonyms)(translated)
 
@@ -1,8 +1,12 @@
 import builtins as _builtins
 import codeop
+import traceback
+from ast import PyCF_ONLY_AST
+from collections import OrderedDict
 
 from lazyutils import lazy
 
+from .errors import BadSyntaxError, Diagnostic
 from .info import Info
 from .introspection import Introspection
 from .lexer import Lexer
@@ -86,6 +90,7 @@ class Transpyler(metaclass=SingletonMeta):
     lang = 'en'
     has_turtle_functions = False
     turtle_backend = None
+    turtle_group = None
     standard_lib = None
     translations = None
     invalid_tokens = None
@@ -93,12 +98,17 @@ class Transpyler(metaclass=SingletonMeta):
     version = '0.1.0'
     codemirror_mode = 'python'
     file_extension = 'py'
+    source_map_limit = 256
 
     # Language info and introspection
     introspection = lazy(lambda self: self.introspection_factory(self))
     info = lazy(lambda self: self.info_factory(self))
     mimetypes = lazy(lambda self: [self.mimetype])
     mimetype = lazy(lambda self: 'text/x-%s' % self.name)
+    file_extensions = lazy(lambda self: ['*.' + self.file_extension])
+    pygments_class_name = lazy(
+        lambda self: self.display_name.replace(' ', '') + 'Lexer'
+    )
     link_docs = lazy(
         lambda self:
         "http://%s.readthedocs.io/%s/latest/" % (self.name, self.lang)
@@ -122,6 +132,9 @@ class Transpyler(metaclass=SingletonMeta):
     # Lexer
     lexer = lazy(lambda self: self.lexer_factory(self))
 
+    # Maps filenames to the source maps of the last transpiled code
+    source_maps = lazy(lambda self: OrderedDict())
+
     @lazy
     def name(self):
         cls_name = self.__class__.__name__.lower()
@@ -161,7 +174,9 @@ class Transpyler(metaclass=SingletonMeta):
         """
 
         self.apply_curses()
-        self.namespace.update(ns or {})
+        if ns:
+            self.namespace.update(ns)
+            self._invalidate_introspection()
 
     def apply_curses(self):
         """
@@ -195,8 +210,13 @@ class Transpyler(metaclass=SingletonMeta):
         """
 
         compile_function = compile_function or _compile
-        source = self.transpile(source)
-        return compile_function(source, filename, mode, flags, dont_inherit)
+        source = self.transpile(source, filename)
+        try:
+            return compile_function(source, filename, mode, flags,
+                                    dont_inherit)
+        except SyntaxError as ex:
+            self.remap_syntax_error(ex)
+            raise
 
     def exec(self, source, globals=None, locals=None, exec_function=None):
         """
@@ -245,12 +265,104 @@ class Transpyler(metaclass=SingletonMeta):
         args = (globals,) if locals is None else (globals, locals)
         return eval_function(code, *args)
 
-    def transpile(self, src):
+    def transpile(self, src, filename='<string>'):
         """
         Convert source to Python.
+
+        The source map of the resulting code is saved in the
+        :attr:`source_maps` dictionary under the given filename. Only the
+        last :attr:`source_map_limit` files are kept.
+        """
+
+        result, source_map = self.lexer.transpile_with_map(src)
+        source_maps = self.source_maps
+        source_maps.pop(filename, None)
+        source_maps[filename] = source_map
+        while len(source_maps) > self.source_map_limit:
+            source_maps.popitem(last=False)
+        return result
+
+    def diagnose(self, src, filename='<string>'):
+        """
+        Return a list of :class:`transpyler.errors.Diagnostic` objects with
+        the problems found in the given source code.
+
+        All tokenization errors and invalid token sequences are reported in a
+        single pass. If none is found, the transpiled code is parsed and the
+        first Python syntax error, if any, is also reported with positions in
+        the original source.
+        """
+
+        errors = self.lexer.diagnose(src)
+        if errors:
+            return errors
+        try:
+            source = self.transpile(src, filename)
+            _compile(source, filename, 'exec', PyCF_ONLY_AST, True)
+        except SyntaxError as ex:
+            ex = self.remap_syntax_error(ex)
+            errors.append(Diagnostic.from_syntax_error(ex))
+        return errors
+
+    def remap_syntax_error(self, ex):
+        """
+        Fix the position of a SyntaxError raised by transpiled code to point
+        to the original source.
+
+        The exception is modified inplace and returned. Errors from unknown
+        files and BadSyntaxError instances, which already refer to the
+        original source, are left unchanged.
+        """
+
+        source_map = self.source_maps.get(ex.filename)
+        if source_map is None or isinstance(ex, BadSyntaxError) or \
+                ex.lineno is None:
+            return ex
+
+        col = (ex.offset or 1) - 1
+        lineno, col = source_map.source_position(ex.lineno, col)
+        if getattr(ex, 'end_lineno', None) is not None:
+            end_col = (ex.end_offset or 1) - 1
+            end_lineno, end_col = \
+                source_map.source_position(ex.end_lineno, end_col)
+            ex.end_lineno, ex.end_offset = end_lineno, end_col + 1
+        text = source_map.source_line(ex.lineno)
+        ex.lineno, ex.offset = lineno, col + 1
+        if text is not None:
+            ex.text = text + '\n'
+        return ex
+
+    def extract_traceback(self, tb):
+        """
+        Like :func:`traceback.extract_tb`, but fix the line numbers and
+        source lines of frames that execute transpiled code.
+        """
+
+        frames = []
+        for frame in traceback.extract_tb(tb):
+            source_map = self.source_maps.get(frame.filename)
+            if source_map is not None:
+                frame = traceback.FrameSummary(
+                    frame.filename,
+                    source_map.source_lineno(frame.lineno),
+                    frame.name,
+                    line=source_map.source_line(frame.lineno) or '',
+                )
+            frames.append(frame)
+        return traceback.StackSummary.from_list(frames)
+
+    def format_exception(self, etype, value, tb):
+        """
+        Like :func:`traceback.format_exception`, but show the line numbers and
+        source lines of transpiled code as they appear in the original source.
         """
 
-        return self.lexer.transpile(src)
+        lines = []
+        if tb is not None:
+            lines.append('Traceback (most recent call last):\n')
+            lines.extend(self.extract_traceback(tb).format())
+        lines.extend(traceback.format_exception_only(etype, value))
+        return lines
 
     def is_incomplete_source(self, src, filename="<input>", symbol="single"):
         """
@@ -317,8 +429,10 @@ class Transpyler(metaclass=SingletonMeta):
             """
             Return a dictionary with all public functions.
 
-            If turtle is given and it is either 'qt' or 'tk', it includes the
-            corresponding turtle functions into the namespace.
+            If turtle is given and it is either 'qt', 'tk' or 'headless', it
+            includes the corresponding turtle functions into the namespace.
+            Headless turtles draw in the group stored in the turtle_group
+            attribute of the transpyler.
             """
             transpyler = cls()
             transpyler.has_turtle_functions = turtle is not None
@@ -360,8 +474,14 @@ class Transpyler(metaclass=SingletonMeta):
         """
         ns = self.namespace_factory(self)
         self.namespace = dict(ns)
+        self._invalidate_introspection()
         return self.namespace
 
+    def _invalidate_introspection(self):
+        # Only invalidates if introspection was already created
+        if 'introspection' in self.__dict__:
+            self.introspection.invalidate()
+
     #
     # External execution
     #
@@ -421,6 +541,17 @@ class Transpyler(metaclass=SingletonMeta):
         from qturtle.mainwindow import start_application
         start_application(self)
 
+    def start_forkserver(self, address, ns=None):
+        """
+        Starts a fork-server listening at the given unix socket address.
+
+        The runtime is initialized once and each submitted job runs in a
+        forked child process. See :mod:`transpyler.forkserver`.
+        """
+
+        from .forkserver import start_forkserver
+        start_forkserver(self, address, ns)
+
     def start_main(self):
         """
         Starts the default main application.
@@ -32,7 +32,8 @@ We have a few use cases:
 """
 
 from .turtle import Turtle
-from .turtlegroup import TurtleGroup
+from .turtlegroup import TurtleGroup, VectorTurtleGroup
 from .namespace import TurtleNamespace
-from .state import TurtleState, MailboxState, MirrorState, RemoteState, PropertyState
+from .state import TurtleState, MailboxState, MirrorState, RemoteState, \
+    PropertyState, MailboxMirrorState
 from .stategroup import StateGroup, IpcStateGroup
@@ -0,0 +1,261 @@
+"""
+Canonical fingerprints of turtle drawings.
+
+A fingerprint describes the set of points covered by a drawing, independently
+of the order and direction in which segments were drawn and of how lines
+were split in segments. Two programs that draw the same figure produce equal
+fingerprints, so drawings can be compared without rendering them.
+
+Segments are grouped by the line that contains them, which is identified by
+its quantized direction and distance to the origin. Segments in the same line
+are merged into disjoint intervals. The whole process takes O(n log n) time
+for n segments.
+"""
+
+import hashlib
+import math
+
+from lazyutils import lazy
+
+from .path import PathStore
+
+
+class Fingerprint:
+    """
+    Fingerprint of a drawing.
+
+    Args:
+        segments:
+            A PathStore, a sequence of PathStore objects or an iterable of
+            (x0, y0, x1, y1, color, width) records.
+        precision:
+            Number of decimal places kept for coordinates. Angles are kept
+            with 3 additional decimal places.
+        pen:
+            If True, segments with different colors or widths are considered
+            to be different.
+    """
+
+    def __init__(self, segments, precision=3, pen=False):
+        self.precision = precision
+        self.pen = pen
+        self.lines = _merge(_records(segments), precision, pen)
+
+    def __eq__(self, other):
+        if isinstance(other, Fingerprint):
+            return self.digest == other.digest
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        return '<Fingerprint %s: %s lines>' % (self.digest[:12],
+                                               len(self.lines))
+
+    @lazy
+    def digest(self):
+        """
+        Hexadecimal SHA1 digest of the canonical form of the drawing.
+        """
+        data = repr(self.canonical()).encode('ascii')
+        return hashlib.sha1(data).hexdigest()
+
+    def canonical(self):
+        """
+        Return the canonical form of the drawing: a sorted tuple of
+        (angle, offset, start, end) tuples for each merged segment, prefixed
+        by (color, width) if pen=True.
+        """
+
+        return tuple(sorted(
+            key + interval
+            for key, intervals in self.lines.items()
+            for interval in intervals
+        ))
+
+    def segments(self):
+        """
+        Iterate over the merged segments as ((x0, y0), (x1, y1)) pairs.
+        """
+
+        ndigits = self.precision
+        for key, intervals in self.lines.items():
+            angle, offset = key[-2:]
+            ux, uy = math.cos(angle), math.sin(angle)
+            for start, end in intervals:
+                yield ((round(ux * start - uy * offset, ndigits),
+                        round(uy * start + ux * offset, ndigits)),
+                       (round(ux * end - uy * offset, ndigits),
+                        round(uy * end + ux * offset, ndigits)))
+
+    def length(self):
+        """
+        Total length of the drawing.
+        """
+        return sum(end - start
+                   for intervals in self.lines.values()
+                   for start, end in intervals)
+
+    def difference(self, other):
+        """
+        Length of the parts of the drawing that are not shared with other.
+
+        Lines are also compared with the lines of the neighbouring angle and
+        offset buckets, so drawings that differ by less than the precision
+        are not split by a rounding boundary.
+
+        Both fingerprints must use the same precision and pen settings.
+        """
+
+        precision = self.precision
+        missing = _uncovered(self.lines, other.lines, precision)
+        extra = _uncovered(other.lines, self.lines, precision)
+        return missing + extra
+
+    def matches(self, other, tolerance=0.01):
+        """
+        Return True if the length of the non-shared parts of both drawings is
+        at most the given fraction of the length of the longest drawing.
+        """
+
+        if self == other:
+            return True
+        size = max(self.length(), other.length())
+        return self.difference(other) <= tolerance * size
+
+
+def fingerprint(segments, precision=3, pen=False):
+    """
+    Return the :class:`Fingerprint` of the given drawing.
+
+    Turtle states with a path store are also accepted.
+    """
+    return Fingerprint(segments, precision, pen)
+
+
+def _records(segments):
+    path = getattr(segments, 'path', None)
+    if isinstance(path, PathStore):
+        return path
+    if isinstance(segments, PathStore):
+        return segments
+    segments = list(segments)
+    if segments and all(isinstance(x, PathStore) for x in segments):
+        return [record for path in segments for record in path]
+    return segments
+
+
+def _merge(records, precision, pen):
+    # Group segments by line and merge overlapping intervals in each line
+    eps = 10 ** -precision
+    groups = {}
+    for x0, y0, x1, y1, *style in records:
+        line = _line(x0, y0, x1, y1, precision)
+        if line is None:
+            continue
+        key, interval = line
+        if pen:
+            key = tuple(style[:2]) + key
+        groups.setdefault(key, []).append(interval)
+
+    return {key: [(round(a, precision) + 0.0, round(b, precision) + 0.0)
+                  for a, b in _union(intervals, eps)]
+            for key, intervals in groups.items()}
+
+
+def _line(x0, y0, x1, y1, precision):
+    # Return the (angle, offset) key of the line that contains the segment
+    # and the segment's (start, end) interval on that line. Return None for
+    # segments shorter than the precision.
+    # Endpoints are put in a canonical order, so the result does not depend
+    # on the direction the segment was drawn
+    if (x1, y1) < (x0, y0):
+        x0, y0, x1, y1 = x1, y1, x0, y0
+    dx, dy = x1 - x0, y1 - y0
+    if math.hypot(dx, dy) < 10 ** -precision:
+        return None
+
+    # Normalize angle to [0, pi) and point segments in this direction
+    angle_ndigits = precision + 3
+    angle = round(math.atan2(dy, dx) % math.pi, angle_ndigits)
+    if angle >= round(math.pi, angle_ndigits):
+        angle = 0.0
+    ux, uy = math.cos(angle), math.sin(angle)
+    offset = round(ux * y0 - uy * x0, precision) + 0.0
+    start = ux * x0 + uy * y0
+    end = ux * x1 + uy * y1
+    return (angle, offset), (min(start, end), max(start, end))
+
+
+def _union(intervals, eps=0.0):
+    # Merge intervals that overlap or are less than eps apart. Return a
+    # sorted list of disjoint intervals.
+    intervals = sorted(intervals)
+    if not intervals:
+        return []
+    merged = []
+    cur_start, cur_end = intervals[0]
+    for start, end in intervals[1:]:
+        if start <= cur_end + eps:
+            cur_end = max(cur_end, end)
+        else:
+            merged.append((cur_start, cur_end))
+            cur_start, cur_end = start, end
+    merged.append((cur_start, cur_end))
+    return merged
+
+
+def _neighbours(key, precision):
+    # Yield (key, flip) pairs for the line buckets around key, including key
+    # itself. Angles wrap around at pi: flip is True for buckets on the
+    # other side, whose lines point in the opposite direction and hence have
+    # offsets and intervals with the opposite sign.
+    *pen, angle, offset = key
+    pen = tuple(pen)
+    ndigits = precision + 3
+    half_turn = round(math.pi, ndigits)
+    for i in (-1, 0, 1):
+        a = angle + i * 10 ** -ndigits
+        flip = a < 0 or round(a, ndigits) >= half_turn
+        if a < 0:
+            a += math.pi
+        elif flip:
+            a -= half_turn
+        a = round(a, ndigits) + 0.0
+        center = -offset if flip else offset
+        for j in (-1, 0, 1):
+            b = round(center + j * 10 ** -precision, precision) + 0.0
+            yield pen + (a, b), flip
+
+
+def _uncovered(lines, other, precision):
+    # Length of the intervals in lines that are not covered by the intervals
+    # of other in the same or in neighbouring buckets
+    total = 0.0
+    for key, intervals in lines.items():
+        cover = []
+        for neighbour, flip in _neighbours(key, precision):
+            found = other.get(neighbour, ())
+            if flip:
+                found = [(-end, -start) for start, end in found]
+            cover.extend(found)
+        total += sum(end - start for start, end in intervals)
+        total -= _overlap(intervals, _union(cover))
+    return total
+
+
+def _overlap(a, b):
+    # Length of the intersection of two sorted lists of disjoint intervals
+    total = 0.0
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if end > start:
+            total += end - start
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
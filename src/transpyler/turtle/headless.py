@@ -0,0 +1,102 @@
+"""
+A turtle backend that does not require a display.
+
+Turtles only record their drawings in :class:`transpyler.turtle.path.PathStore`
+objects, which can be rendered to SVG or PNG with the functions in
+:mod:`transpyler.turtle.render`. This is useful for batch processing, e.g.,
+to grade turtle-based programs in a server.
+
+Example::
+
+    group = HeadlessStateGroup()
+    ns = make_turtle_namespace(group)
+    ns['forward'](100)
+    svg = group.to_svg()
+"""
+
+from . import render
+from .fingerprint import Fingerprint
+from .namespace import TurtleNamespace
+from .state import TurtleState
+from .stategroup import StateGroup
+from .turtle import Turtle as BaseTurtle
+
+
+class HeadlessTurtleState(TurtleState):
+    """
+    A turtle state that records all segments in its .path attribute.
+
+    The spatial index used by queries is only built from the path on the
+    first query.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('path', True)
+        super().__init__(**kwargs)
+
+
+class HeadlessStateGroup(StateGroup):
+    """
+    A group of headless turtle states.
+
+    The drawings of all turtles in the group can be rendered together.
+    """
+
+    state_class = HeadlessTurtleState
+
+    def paths(self):
+        """
+        Return a list with the path stores of all turtles.
+        """
+        return [turtle.path for turtle in self]
+
+    def to_svg(self, **kwargs):
+        """
+        Render the drawing as SVG. See :func:`transpyler.turtle.render.to_svg`.
+        """
+        return render.to_svg(self.paths(), **kwargs)
+
+    def fingerprint(self, **kwargs):
+        """
+        Return the :class:`transpyler.turtle.fingerprint.Fingerprint` of the
+        drawing.
+        """
+        return Fingerprint(self.paths(), **kwargs)
+
+    def to_png(self, **kwargs):
+        """
+        Render the drawing as PNG. See :func:`transpyler.turtle.render.to_png`.
+        """
+        return render.to_png(self.paths(), **kwargs)
+
+
+class Turtle(BaseTurtle):
+    """
+    A turtle that draws on the default headless group.
+
+    The undo history is disabled by default, since batch programs rarely
+    undo their operations and recording them slows down every command.
+    """
+
+    _state_factory = HeadlessTurtleState
+    history_size = None
+
+
+def make_turtle_namespace(group=None, history_size=None):
+    """
+    Returns a dictionary with the namespace of turtle functions.
+
+    All turtles created in the namespace are registered in the given group.
+    Pass a history_size to enable the undo() and redo() functions.
+    """
+
+    if group is None:
+        group = HeadlessStateGroup()
+
+    class GroupTurtle(Turtle):
+        _state_factory = staticmethod(group.new_turtle)
+
+    GroupTurtle.history_size = history_size
+
+    GroupTurtle.__name__ = GroupTurtle.__qualname__ = 'Turtle'
+    return dict(TurtleNamespace(GroupTurtle))
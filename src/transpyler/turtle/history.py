@@ -0,0 +1,152 @@
+"""
+Undo/redo support for turtle operations.
+
+Each operation is stored as a delta: the old and new values of the state
+attributes it changed and the number of lines it drew. Undoing an operation
+erases its lines and restores the old values, so the cost is proportional
+to the number of undone operations instead of redrawing the whole scene.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+
+class History:
+    """
+    Bounded undo/redo history for a turtle state.
+
+    Only the last maxlen operations are kept. Each entry stores just the
+    attributes changed by the operation, hence memory use is bounded by
+    maxlen times the number of tracked attributes.
+    """
+
+    #: State attributes tracked by the history
+    attrs = ('pos', 'heading', 'drawing', 'color', 'fillcolor', 'width',
+             'hidden', 'avatar')
+
+    def __init__(self, state, maxlen=1000):
+        self.state = state
+        self.maxlen = maxlen
+        self._undo = deque(maxlen=maxlen)
+        self._redo = deque(maxlen=maxlen)
+        self._depth = 0
+
+    def __len__(self):
+        return len(self._undo)
+
+    @property
+    def redo_size(self):
+        """
+        Number of operations that can be redone.
+        """
+        return len(self._redo)
+
+    @contextmanager
+    def record(self):
+        """
+        Record the changes made to the state inside a with block as a single
+        operation.
+
+        Nested blocks are merged in the outermost operation.
+        """
+
+        if self._depth:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+
+        before = self._values()
+        segments = self._segments()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            after = self._values()
+            old = {}
+            new = {}
+            for attr, value in after.items():
+                if before[attr] != value:
+                    old[attr] = before[attr]
+                    new[attr] = value
+            lines = self._segments() - segments
+            if old or lines:
+                self._undo.append((old, new, lines))
+                self._redo.clear()
+
+    def undo(self, n=1):
+        """
+        Undo the last n operations.
+
+        Return the number of operations that were actually undone.
+        """
+
+        state = self.state
+        count = 0
+        while count < n and self._undo:
+            entry = old, new, lines = self._undo[-1]
+            if lines:
+                state.erase(lines)
+            self._undo.pop()
+            for attr, value in old.items():
+                setattr(state, attr, value)
+            self._redo.append(entry)
+            count += 1
+        return count
+
+    def redo(self, n=1):
+        """
+        Redo the last n undone operations.
+
+        Return the number of operations that were actually redone.
+        """
+
+        state = self.state
+        count = 0
+        while count < n and self._redo:
+            entry = old, new, lines = self._redo.pop()
+            new = dict(new)
+            if lines:
+                # Operations draw a single line from the old to the new
+                # position using the old pen
+                state.move(new.pop('pos', state.pos))
+            for attr, value in new.items():
+                setattr(state, attr, value)
+            self._undo.append(entry)
+            count += 1
+        return count
+
+    def clear(self):
+        """
+        Forget all operations.
+        """
+        self._undo.clear()
+        self._redo.clear()
+
+    def _values(self):
+        state = self.state
+        return {attr: getattr(state, attr) for attr in self.attrs}
+
+    def _segments(self):
+        return getattr(self.state, 'segments', 0)
+
+
+def undoable(method):
+    """
+    Decorates a Turtle method so each call is recorded as a single operation
+    in the turtle history.
+    """
+
+    @wraps(method)
+    def decorated(self, *args, **kwargs):
+        history = self._history
+        if history is None:
+            return method(self, *args, **kwargs)
+        with history.record():
+            return method(self, *args, **kwargs)
+
+    return decorated
@@ -0,0 +1,320 @@
+"""
+An append-only journal of turtle commands.
+
+The journal records every command that changes the state of a
+:class:`transpyler.turtle.IpcStateGroup` together with periodic snapshots of
+the whole group. A new view can catch up with a drawing by restoring the
+latest snapshot and replaying only the commands recorded after it.
+
+The journal is a sequence of frames. Each frame has a kind byte, the size of
+the payload (uint32) and the payload. Commands are encoded with
+:func:`transpyler.turtle.wire.encode_command` and snapshots with
+:func:`encode_snapshot`, which stores the drawings as
+:meth:`transpyler.turtle.path.PathStore.tobytes` buffers. The journal starts
+with a header with a magic string and the wire format version.
+
+Only the latest snapshot is kept in memory, so memory grows with the number
+of commands rather than with the number of snapshots. Streams still receive
+all frames.
+
+Example::
+
+    group = IpcStateGroup()
+    group.journal = Journal()
+    ...
+    view = IpcStateGroup()
+    group.journal.restore(view)
+"""
+
+import struct
+from array import array
+
+from colortools import Color
+
+from . import wire
+
+MAGIC = b'TPJ' + bytes([wire.VERSION])
+FRAME = struct.Struct('<BI')
+FRAME_COMMAND, FRAME_SNAPSHOT = b'CS'
+
+# Snapshot header: last turtle id, number of free ids and number of turtles
+SNAPSHOT = struct.Struct('<III')
+
+# Initial position and heading of a turtle and its flags
+TURTLE = struct.Struct('<dddB')
+FLAG_DRAWING, FLAG_PATH = 1, 2
+
+# Attributes stored as RGBA tuples in snapshots
+COLOR_ATTRS = frozenset(['color', 'fillcolor'])
+
+# Commands that do not change the state of the group
+READ_ONLY = frozenset(['get', 'ping'])
+
+
+class Journal:
+    """
+    A compact binary journal of turtle commands.
+
+    Args:
+        stream:
+            An optional binary file object. All frames are also written to
+            this stream as they are recorded, so the journal survives a
+            restart of the process that owns the scene.
+        snapshot_interval:
+            Number of commands between automatic snapshots. Snapshots are
+            taken by the state group that owns the journal. None disables
+            automatic snapshots.
+    """
+
+    def __init__(self, stream=None, snapshot_interval=1000):
+        self.data = bytearray(MAGIC)
+        self.stream = stream
+        self.snapshot_interval = snapshot_interval
+        self.commands = 0
+        self.last_snapshot = None
+        self.snapshot_data = None
+        self._last_snapshot_commands = 0
+        if stream is not None:
+            stream.write(MAGIC)
+
+    def __len__(self):
+        return self.commands
+
+    def __repr__(self):
+        return '<Journal: %s commands, %s bytes>' % (self.commands,
+                                                     len(self.data))
+
+    @classmethod
+    def frombytes(cls, data, stream=None, **kwargs):
+        """
+        Load journal from data created by :meth:`tobytes` or written to a
+        stream.
+
+        New frames are appended to the given stream, which should already
+        contain the data.
+        """
+
+        journal = cls(**kwargs)
+        journal.stream = stream
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise wire.WireError('invalid journal header')
+        for kind, start, end in _frames(data, len(MAGIC)):
+            payload = data[start:end]
+            if kind == FRAME_COMMAND:
+                journal._add_frame(kind, payload)
+                journal.commands += 1
+            else:
+                journal._set_snapshot(bytes(payload))
+        return journal
+
+    def tobytes(self):
+        """
+        Return the contents of the journal as bytes.
+
+        The result contains the latest snapshot at the position it was
+        taken.
+        """
+
+        data = self.data
+        if self.snapshot_data is None:
+            return bytes(data)
+        pos = self.last_snapshot
+        frame = FRAME.pack(FRAME_SNAPSHOT, len(self.snapshot_data))
+        return b''.join([data[:pos], frame, self.snapshot_data, data[pos:]])
+
+    def record(self, msg):
+        """
+        Append command to the journal.
+
+        Commands that do not change the state, such as 'get', are ignored.
+        Batches are recorded as individual commands.
+        """
+
+        action = msg[0]
+        if action in READ_ONLY:
+            return
+        elif action == 'batch':
+            for cmd in msg[1]:
+                self.record(cmd)
+            return
+        self._append(FRAME_COMMAND, wire.encode_command(msg))
+        self.commands += 1
+
+    def snapshot(self, group):
+        """
+        Take a snapshot of the given state group.
+
+        It replaces the previous snapshot in memory.
+        """
+
+        payload = encode_snapshot(group.snapshot())
+        self._set_snapshot(payload)
+        if self.stream is not None:
+            self.stream.write(FRAME.pack(FRAME_SNAPSHOT, len(payload)))
+            self.stream.write(payload)
+
+    def snapshot_due(self):
+        """
+        Return True if a new snapshot should be taken.
+        """
+
+        interval = self.snapshot_interval
+        if interval is None:
+            return False
+        return self.tail_size() >= interval
+
+    def tail_size(self):
+        """
+        Number of commands recorded after the last snapshot.
+        """
+        return self.commands - self._last_snapshot_commands
+
+    def iter_commands(self, start=None):
+        """
+        Iterate over all commands after the given byte offset.
+        """
+
+        data = self.data
+        for kind, pos, end in _frames(data, len(MAGIC) if start is None
+                                      else start):
+            yield wire.decode_command(data, pos)[0]
+
+    def replay(self, group):
+        """
+        Execute all recorded commands on the given group, ignoring
+        snapshots.
+        """
+
+        handle = group.handle
+        for msg in self.iter_commands():
+            handle(msg)
+
+    def restore(self, group):
+        """
+        Bring the group to the current state by restoring the latest snapshot
+        and executing the commands recorded after it.
+
+        The group should be empty.
+        """
+
+        start = None
+        if self.snapshot_data is not None:
+            group.restore(decode_snapshot(self.snapshot_data))
+            start = self.last_snapshot
+
+        handle = group.handle
+        for msg in self.iter_commands(start):
+            handle(msg)
+
+    def _append(self, kind, payload):
+        frame = self._add_frame(kind, payload)
+        if self.stream is not None:
+            self.stream.write(frame)
+
+    def _add_frame(self, kind, payload):
+        frame = FRAME.pack(kind, len(payload)) + payload
+        self.data.extend(frame)
+        return frame
+
+    def _set_snapshot(self, payload):
+        # Commands recorded after this point are replayed over the snapshot
+        self.snapshot_data = payload
+        self.last_snapshot = len(self.data)
+        self._last_snapshot_commands = self.commands
+
+
+def _frames(data, pos):
+    # Yield (kind, payload_start, payload_end) for all frames after pos
+    size = len(data)
+    while pos < size:
+        kind, length = FRAME.unpack_from(data, pos)
+        pos += FRAME.size
+        end = pos + length
+        if end > size:
+            raise wire.WireError('truncated journal frame')
+        yield kind, pos, end
+        pos = end
+
+
+#
+# Snapshots
+#
+def encode_snapshot(snapshot):
+    """
+    Encode a snapshot created by
+    :meth:`transpyler.turtle.StateGroup.snapshot` to bytes.
+
+    Attribute values are encoded with the wire format and drawings are
+    stored as the raw buffers of their path stores. Values that the wire
+    format can only pickle are rejected, so snapshots can be loaded without
+    unpickling untrusted data.
+    """
+
+    turtles = snapshot['turtles']
+    free_ids = array('I', snapshot['free_ids'])
+    data = [SNAPSHOT.pack(snapshot['index'], len(free_ids), len(turtles)),
+            free_ids.tobytes()]
+    for id, attrs, start, path in turtles:
+        (x, y), heading, drawing = start
+        flags = (FLAG_DRAWING if drawing else 0) | \
+            (FLAG_PATH if path is not None else 0)
+        data.append(_encode_value(id))
+        data.append(TURTLE.pack(x, y, heading, flags))
+        data.append(wire.COUNT.pack(len(attrs)))
+        for attr, value in attrs.items():
+            if attr in COLOR_ATTRS and not isinstance(value, str):
+                value = tuple(Color(value))
+            data.append(wire.encode_str(attr) + _encode_value(value))
+        if path is not None:
+            data.append(wire.COUNT.pack(len(path)) + path)
+    return b''.join(data)
+
+
+def decode_snapshot(data):
+    """
+    Decode snapshot created by :func:`encode_snapshot`.
+    """
+
+    index, num_free, num_turtles = SNAPSHOT.unpack_from(data, 0)
+    free_ids, pos = wire.decode_array('I', data, SNAPSHOT.size, num_free)
+    turtles = []
+    for _ in range(num_turtles):
+        turtle, pos = _decode_turtle(data, pos)
+        turtles.append(turtle)
+    if pos != len(data):
+        raise wire.WireError('trailing data after snapshot')
+    return {'index': index, 'free_ids': free_ids.tolist(),
+            'turtles': turtles}
+
+
+def _decode_turtle(data, pos):
+    id, pos = _decode_value(data, pos)
+    x, y, heading, flags = TURTLE.unpack_from(data, pos)
+    pos += TURTLE.size
+    size, = wire.COUNT.unpack_from(data, pos)
+    pos += wire.COUNT.size
+    attrs = {}
+    for _ in range(size):
+        attr, pos = wire.decode_str(data, pos)
+        attrs[attr], pos = _decode_value(data, pos)
+    path = None
+    if flags & FLAG_PATH:
+        size, = wire.COUNT.unpack_from(data, pos)
+        pos += wire.COUNT.size
+        path = bytes(data[pos:pos + size])
+        pos += size
+    start = ((x, y), heading, bool(flags & FLAG_DRAWING))
+    return (id, attrs, start, path), pos
+
+
+def _encode_value(value):
+    data = wire.encode_value(value)
+    if data[0] == wire.TAG_PICKLE:
+        raise wire.WireError('cannot store %r in a snapshot' % (value,))
+    return data
+
+
+def _decode_value(data, pos):
+    if data[pos] == wire.TAG_PICKLE:
+        raise wire.WireError('snapshots cannot contain pickled values')
+    return wire.decode_value(data, pos)
@@ -0,0 +1,156 @@
+"""
+Time-based animation of turtle movements.
+
+The speed of a turtle follows the convention of Python's turtle module: 1 is
+the slowest speed, 10 is fast and 0 disables animations, i.e., commands are
+applied immediately.
+"""
+
+from collections import deque
+
+from ..math import Vec
+
+
+class MotionScheduler:
+    """
+    Interpolate turtle movements and rotations over time.
+
+    Animated commands are queued and executed in order by calling
+    :meth:`advance` with the elapsed time, usually from a GUI timer. Movements
+    are drawn in small segments as the turtle advances. When the movement
+    ends, these segments are replaced by a single line, so each command draws
+    one segment, as it does without animations. Clients rely on this to
+    erase the lines of a command in :meth:`transpyler.turtle.Turtle.undo`.
+    """
+
+    #: Pixels per second for each unit of speed
+    pixels_per_second = 50.0
+
+    #: Degrees per second for each unit of speed
+    degrees_per_second = 90.0
+
+    #: Commands that can be animated
+    actions = frozenset(['step', 'move', 'rotate', 'set'])
+
+    def __init__(self):
+        self._motions = deque()
+
+    def __len__(self):
+        return len(self._motions)
+
+    @property
+    def busy(self):
+        """
+        True if there are unfinished animations.
+        """
+        return bool(self._motions)
+
+    def schedule(self, turtle, msg):
+        """
+        Schedule the animation of a turtle command.
+
+        Animated commands are step, move, rotate and setting the heading.
+        Return False if the command should be executed immediately, either
+        because it cannot be animated or because the turtle speed is zero.
+        """
+
+        speed = getattr(turtle, 'speed', 0)
+        if not speed:
+            return False
+
+        action, _, *args = msg
+        if action == 'step' or action == 'move':
+            start = Vec(*turtle.pos)
+            if action == 'step':
+                target = start + turtle.heading_direction * args[0]
+            else:
+                target = Vec(*args[0])
+            duration = abs(target - start) / (self.pixels_per_second * speed)
+            kind = 'move'
+        elif action == 'rotate' or (action == 'set' and args[0] == 'heading'):
+            start = turtle.heading
+            target = start + args[0] if action == 'rotate' else args[1]
+            duration = abs(target - start) / (self.degrees_per_second * speed)
+            kind = 'heading'
+        else:
+            return False
+
+        if duration <= 0:
+            return False
+        self._motions.append([turtle, kind, start, target, duration, 0.0,
+                              None])
+        return True
+
+    def advance(self, dt):
+        """
+        Advance animations by dt seconds.
+
+        Animations are executed in the order they were scheduled. Return the
+        number of animations that were completed.
+        """
+
+        motions = self._motions
+        done = 0
+        while motions and dt > 0:
+            motion = motions[0]
+            turtle, kind, start, target, duration, elapsed, _ = motion
+            used = min(dt, duration - elapsed)
+            elapsed = motion[5] = elapsed + used
+            dt -= used
+            if elapsed >= duration:
+                self._complete(motion, target)
+                motions.popleft()
+                done += 1
+            else:
+                if motion[6] is None:
+                    # Number of segments before the first intermediate step
+                    motion[6] = getattr(turtle, 'segments', 0)
+                fraction = elapsed / duration
+                self._apply(turtle, kind, start + (target - start) * fraction)
+        return done
+
+    def finish(self):
+        """
+        Complete all pending animations immediately.
+        """
+
+        motions = self._motions
+        while motions:
+            motion = motions.popleft()
+            self._complete(motion, motion[3])
+
+    def clear(self, turtle=None):
+        """
+        Cancel pending animations of the given turtle or of all turtles.
+
+        Turtles stay in their current intermediate positions and the lines of
+        interrupted movements are kept as a single segment.
+        """
+
+        keep = deque()
+        for motion in self._motions:
+            owner, kind = motion[:2]
+            if turtle is not None and owner is not turtle:
+                keep.append(motion)
+            elif motion[6] is not None:
+                current = owner.pos if kind == 'move' else owner.heading
+                self._complete(motion, current)
+        self._motions = keep
+
+    def _complete(self, motion, value):
+        # Finish motion at the given value, replacing the segments drawn by
+        # the intermediate steps by a single line
+        turtle, kind, start, *_, segments = motion
+        if kind == 'move' and segments is not None:
+            drawn = getattr(turtle, 'segments', 0) - segments
+            if drawn > 0:
+                turtle.erase(drawn)
+                turtle.pos = start
+        self._apply(turtle, kind, value)
+
+    @staticmethod
+    def _apply(turtle, kind, value):
+        if kind == 'move':
+            turtle.move(value)
+        else:
+            turtle.heading = value
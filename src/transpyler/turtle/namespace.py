@@ -85,8 +85,15 @@ class TurtleNamespace(Mapping):
             backward=wrap(cls.backward),
             left=wrap(cls.left),
             right=wrap(cls.right),
-            setspeed=self.setspeed,
-            getspeed=self.getspeed,
+            setspeed=wrap(cls.setspeed),
+            getspeed=wrap(cls.getspeed),
+            undo=wrap(cls.undo),
+            redo=wrap(cls.redo),
+
+            # Queries
+            query_point=wrap(cls.query_point),
+            query_rect=wrap(cls.query_rect),
+            intersects=wrap(cls.intersects),
 
             # Aliases
             fd=wrap(cls.forward),
@@ -97,9 +104,3 @@ class TurtleNamespace(Mapping):
             pu=wrap(cls.penup),
             pd=wrap(cls.pendown),
         )
-
-    def getspeed(self):
-        return 5
-
-    def setspeed(self, value):
-        pass
@@ -0,0 +1,188 @@
+from array import array
+
+from colortools import Color
+
+from ..math import Vec
+
+FIELDS = ('x0', 'y0', 'x1', 'y1', 'color', 'width')
+RECORD_SIZE = len(FIELDS)
+
+
+def pack_color(color):
+    """
+    Pack a color into an 0xRRGGBBAA integer.
+
+    Numbers are assumed to be already packed, e.g., colors read back from a
+    :class:`PathStore`, and are returned as integers.
+    """
+
+    if isinstance(color, (int, float)):
+        return int(color)
+    r, g, b, a = Color(color)
+    return (r << 24) | (g << 16) | (b << 8) | a
+
+
+def unpack_color(value):
+    """
+    Convert an integer created by :func:`pack_color` back to a Color.
+    """
+
+    value = int(value)
+    return Color((value >> 24) & 0xff, (value >> 16) & 0xff,
+                 (value >> 8) & 0xff, value & 0xff)
+
+
+class PathStore:
+    """
+    A compact store for the line segments drawn by a turtle.
+
+    Segments are saved as (x0, y0, x1, y1, color, width) records in a flat
+    array of doubles, using 48 bytes per segment. Colors are packed with
+    :func:`pack_color`. The whole path can be exported or loaded in a single
+    call with :meth:`tobytes`/:meth:`frombytes` or viewed as a NumPy array
+    with :meth:`to_numpy`.
+    """
+
+    def __init__(self, records=()):
+        self.data = array('d')
+        self._colors = {}
+        if records:
+            self.extend(records)
+
+    def __len__(self):
+        return len(self.data) // RECORD_SIZE
+
+    def __iter__(self):
+        data = self.data
+        for i in range(0, len(data), RECORD_SIZE):
+            yield tuple(data[i:i + RECORD_SIZE])
+
+    def __getitem__(self, idx):
+        size = len(self)
+        if idx < 0:
+            idx += size
+        if not 0 <= idx < size:
+            raise IndexError('segment index out of range')
+        i = idx * RECORD_SIZE
+        return tuple(self.data[i:i + RECORD_SIZE])
+
+    def __eq__(self, other):
+        if isinstance(other, PathStore):
+            return self.data == other.data
+        return NotImplemented
+
+    def __repr__(self):
+        return '<PathStore: %s segments>' % len(self)
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the segment buffer.
+        """
+        return len(self.data) * self.data.itemsize
+
+    def pack_color(self, color):
+        """
+        Like :func:`pack_color`, but caches the results for hashable colors.
+        """
+
+        try:
+            return self._colors[color]
+        except KeyError:
+            value = self._colors[color] = pack_color(color)
+            return value
+        except TypeError:
+            return pack_color(color)
+
+    def append(self, v1, v2, color='black', width=1):
+        """
+        Add a segment from v1 to v2.
+        """
+
+        x0, y0 = v1
+        x1, y1 = v2
+        self.data.extend((x0, y0, x1, y1, self.pack_color(color), width))
+
+    def extend(self, records):
+        """
+        Add many segments at once.
+
+        Records can be another PathStore, a flat array of doubles or an
+        iterable of (x0, y0, x1, y1, color, width) tuples.
+        """
+
+        if isinstance(records, PathStore):
+            self.data.extend(records.data)
+        elif isinstance(records, array):
+            if len(records) % RECORD_SIZE:
+                raise ValueError('array size must be a multiple of %s'
+                                 % RECORD_SIZE)
+            self.data.extend(records)
+        else:
+            pack = self.pack_color
+            self.data.extend(
+                x
+                for x0, y0, x1, y1, color, width in records
+                for x in (x0, y0, x1, y1, pack(color), width)
+            )
+
+    def clear(self):
+        """
+        Remove all segments.
+        """
+        del self.data[:]
+
+    def truncate(self, size):
+        """
+        Keep only the first size segments.
+        """
+        del self.data[size * RECORD_SIZE:]
+
+    def lines(self):
+        """
+        Iterate over (v1, v2, color, width) tuples of segments.
+        """
+
+        colors = {}
+        for x0, y0, x1, y1, color, width in self:
+            try:
+                color_obj = colors[color]
+            except KeyError:
+                color_obj = colors[color] = unpack_color(color)
+            yield Vec(x0, y0), Vec(x1, y1), color_obj, width
+
+    def tolist(self):
+        """
+        Return a list of (x0, y0, x1, y1, color, width) tuples.
+        """
+        return list(self)
+
+    def tobytes(self):
+        """
+        Export all segments as a bytes string of native doubles.
+        """
+        return self.data.tobytes()
+
+    @classmethod
+    def frombytes(cls, data):
+        """
+        Create a PathStore from the output of :meth:`tobytes`.
+        """
+
+        store = cls()
+        store.data.frombytes(data)
+        if len(store.data) % RECORD_SIZE:
+            raise ValueError('incomplete segment record')
+        return store
+
+    def to_numpy(self):
+        """
+        Return a (N, 6) NumPy array that shares memory with the store.
+
+        The view is invalidated if new segments are added. Requires NumPy.
+        """
+
+        import numpy
+
+        return numpy.frombuffer(self.data, dtype=float) \
+            .reshape(-1, RECORD_SIZE)
@@ -7,14 +7,20 @@ from .scene import TurtleScene
 from .. import MailboxState
 
 
-def start_qt_scene_app_subprocess():
+def start_qt_scene_app_subprocess(queue_factory=Queue):
     """
     Starts a remote sub-process that initializes a TurtleScene widget and Qt's
     mainloop.
+
+    Args:
+        queue_factory:
+            Callable that creates the inbox/outbox queues. Use
+            :class:`transpyler.turtle.shm.ShmQueue` to communicate through
+            shared memory.
     """
 
-    inbox = MailboxState.inbox = Queue()
-    outbox = MailboxState.outbox = Queue()
+    inbox = MailboxState.inbox = queue_factory()
+    outbox = MailboxState.outbox = queue_factory()
     process = Process(target=start_qt_scene_app,
                       kwargs=dict(outbox=outbox, inbox=inbox, ping=True),
                       name='turtle-server')
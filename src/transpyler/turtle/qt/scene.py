@@ -1,9 +1,11 @@
+import time
 from collections import deque
 from multiprocessing import Queue
 
 from PyQt5 import QtWidgets, QtCore
 
 from .state import QGraphicsSceneGroup
+from ..motion import MotionScheduler
 
 
 class TurtleScene(QtWidgets.QGraphicsScene):
@@ -16,11 +18,19 @@ class TurtleScene(QtWidgets.QGraphicsScene):
     clearScreenSignal = QtCore.pyqtSignal()
     restartScreenSignal = QtCore.pyqtSignal()
 
-    def __init__(self, parent=None, fps=30, inbox=None, outbox=None):
+    # Fraction of each frame spent processing turtle commands. The remaining
+    # time is left for Qt to paint and handle user input.
+    frame_budget = 0.5
+
+    def __init__(self, parent=None, fps=30, inbox=None, outbox=None,
+                 journal=None):
         super().__init__(parent)
         self._fps = fps
         self._interval = 1 / fps
-        self.startTimer(1000 / fps)
+        self._last_frame = None
+        self.metrics = {'frames': 0, 'dropped_frames': 0, 'commands': 0,
+                        'queue_depth': 0}
+        self.startTimer(int(1000 / fps))
 
         # Connect signals to slots
         self.clearScreenSignal.connect(self.cleanScreen)
@@ -32,6 +42,13 @@ class TurtleScene(QtWidgets.QGraphicsScene):
 
         # Init
         self._turtles = QGraphicsSceneGroup(self, inbox=inbox, outbox=outbox)
+        self._turtles.motion = self.motion = MotionScheduler()
+
+        # Redraw the contents of a journal and keep recording on it
+        if journal is not None:
+            journal.restore(self._turtles)
+            self._turtles.journal = journal
+
         self._tasks = deque()
         assert self._turtles.inbox is self._inbox
         assert self._turtles.outbox is self._outbox
@@ -63,13 +80,27 @@ class TurtleScene(QtWidgets.QGraphicsScene):
         """
         Scheduled to be executed at some given framerate.
 
-        It process all queued animation _tasks.
+        It advances turtle animations by the elapsed time and processes
+        queued turtle commands for at most frame_budget of the frame interval.
+        Remaining commands are processed in the next frames.
         """
 
-        inbox = self._inbox
+        now = time.perf_counter()
+        metrics = self.metrics
+        elapsed = self._interval
+        if self._last_frame is not None:
+            elapsed = now - self._last_frame
+            skipped = int(elapsed / self._interval) - 1
+            if skipped > 0:
+                metrics['dropped_frames'] += skipped
+        self._last_frame = now
+        metrics['frames'] += 1
+        self.motion.advance(elapsed)
+
         turtles = self._turtles
-        while not inbox.empty():
-            turtles.recv()
+        budget = self._interval * self.frame_budget
+        metrics['commands'] += turtles.drain(budget)
+        metrics['queue_depth'] = turtles.backlog_size()
 
     #
     # Turtle control
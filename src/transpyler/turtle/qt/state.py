@@ -1,11 +1,13 @@
 import os
 
+from PyQt5 import QtCore
 from PyQt5 import QtGui
 from PyQt5 import QtSvg
+from PyQt5 import QtWidgets
 
 from .utils import qtproperty, from_qvector, to_qvector, from_qcolor, to_qcolor
-from .. import TurtleState, MailboxState, IpcStateGroup, Turtle as BaseTurtle, \
-    TurtleNamespace
+from .. import TurtleState, MailboxMirrorState, IpcStateGroup, \
+    Turtle as BaseTurtle, TurtleNamespace
 
 dir_path = os.path.dirname(os.path.dirname(__file__))
 svg_path = os.path.join(dir_path, 'data', 'turtleart.svg')
@@ -17,9 +19,17 @@ class QGraphicsItemState(TurtleState):
     A server turtle that redirects operations to a QGraphicsSvgItem.
 
     This turtle lives on the server part of the application.
+
+    Consecutive segments drawn with the same pen are merged into a single
+    QGraphicsPathItem with up to max_path_segments segments. This keeps the
+    number of items in the scene index small. Updating a path costs time
+    proportional to its size, so the limit keeps drawing linear in the number
+    of segments. Full path items are cached as pixmaps in device
+    coordinates, so repainting them does not replay each segment.
     """
 
     valid_avatars = ['tuga']
+    max_path_segments = 256
     pos = qtproperty('graphics_item.pos', from_qvector, to_qvector)
     heading = qtproperty('graphics_item.rotation')
     width = qtproperty('pen.width')
@@ -50,13 +60,77 @@ class QGraphicsItemState(TurtleState):
         cursor.setZValue(1.0)
         self.pen = QtGui.QPen(QtGui.QColor(0, 0, 0))
         self.brush = QtGui.QBrush(QtGui.QColor(0, 0, 0))
+        self._path_item = self._path = self._path_pen = None
+        self._path_size = 0
         super().__init__(*args, **kwargs)
 
     def draw_line(self, v1, v2):
         a, b = v1
         c, d = v2
-        line = self.group.scene.addLine(a, b, c, d, self.pen)
-        self.lines.append(line)
+        if self._needs_new_path():
+            self._new_path_item()
+
+        path = self._path
+        if path.isEmpty() or path.currentPosition() != QtCore.QPointF(a, b):
+            path.moveTo(a, b)
+        path.lineTo(c, d)
+        self._path_size += 1
+        self._path_item.setPath(path)
+
+    def _needs_new_path(self):
+        # Segments go to a new item when the pen changes or the current
+        # item is full
+        if self._path_item is None or self._path_pen != self.pen:
+            return True
+        return self._path_size >= self.max_path_segments
+
+    def _new_path_item(self):
+        # Full paths do not change anymore and can be cached
+        if self._path_item is not None:
+            self._path_item.setCacheMode(
+                QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+
+        self._path = QtGui.QPainterPath()
+        self._path_pen = QtGui.QPen(self.pen)
+        self._path_size = 0
+        self._path_item = item = QtWidgets.QGraphicsPathItem()
+        item.setPen(self._path_pen)
+        self.group.scene.addItem(item)
+        self.lines.append(item)
+
+    def erase_lines(self, n):
+        lines = self.lines
+        while n > 0 and lines:
+            item = lines[-1]
+            path = item.path()
+            size = sum(1 for i in range(path.elementCount())
+                       if path.elementAt(i).isLineTo())
+            if size > n:
+                self._truncate_item(item, size - n)
+                return
+            self.group.scene.removeItem(lines.pop())
+            if item is self._path_item:
+                self._path_item = self._path = self._path_pen = None
+            n -= size
+
+    def _truncate_item(self, item, size):
+        # Rebuild the path of item keeping only its first size segments
+        path = item.path()
+        new_path = QtGui.QPainterPath()
+        keep = size
+        for i in range(path.elementCount()):
+            el = path.elementAt(i)
+            if el.isMoveTo():
+                new_path.moveTo(el.x, el.y)
+            elif not keep:
+                break
+            else:
+                new_path.lineTo(el.x, el.y)
+                keep -= 1
+        item.setPath(new_path)
+        if item is self._path_item:
+            self._path = new_path
+            self._path_size = size
 
     def clean(self):
         scene = self.group.scene
@@ -64,11 +138,18 @@ class QGraphicsItemState(TurtleState):
         while lines:
             line = lines.pop()
             scene.removeItem(line)
+        self._path_item = self._path = self._path_pen = None
+        super().clean()
 
     def register(self, group):
         super().register(group)
         group.scene.addItem(self.graphics_item)
 
+    def unregister(self, group):
+        self.clean()
+        group.scene.removeItem(self.graphics_item)
+        super().unregister(group)
+
 
 class QGraphicsSceneGroup(IpcStateGroup):
     """
@@ -91,7 +172,7 @@ class Turtle(BaseTurtle):
     """
     Creates a new Turtle.
     """
-    _state_factory = MailboxState
+    _state_factory = MailboxMirrorState
 
 
 def make_turtle_namespace():
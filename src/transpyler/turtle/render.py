@@ -0,0 +1,244 @@
+"""
+Render turtle drawings stored in :class:`transpyler.turtle.path.PathStore`
+objects to SVG or PNG.
+
+Rendering does not depend on any GUI toolkit. Drawings use the usual turtle
+orientation with the y axis pointing upwards and are scaled to fit the
+output size.
+"""
+
+import math
+import struct
+import zlib
+
+from colortools import Color
+
+from .path import PathStore
+
+
+def bounds(paths):
+    """
+    Return the (xmin, ymin, xmax, ymax) bounding box of all segments or None
+    if there are no segments.
+    """
+
+    xs = []
+    ys = []
+    for path in _stores(paths):
+        data = path.data
+        xs.extend(data[0::6])
+        xs.extend(data[2::6])
+        ys.extend(data[1::6])
+        ys.extend(data[3::6])
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def to_svg(paths, size=None, margin=10, background=None):
+    """
+    Render drawing as an SVG string.
+
+    Args:
+        paths:
+            A PathStore or a sequence of PathStore objects.
+        size:
+            A (width, height) tuple. Defaults to the size of the drawing plus
+            the margins.
+        margin:
+            Space around the drawing, in pixels.
+        background:
+            Background color. Transparent if not given.
+    """
+
+    stores = _stores(paths)
+    box = bounds(stores) or (0, 0, 0, 0)
+    if size is None:
+        size = (int(box[2] - box[0]) + 2 * margin,
+                int(box[3] - box[1]) + 2 * margin)
+    width, height = size
+    scale, dx, dy = _transform(box, size, margin)
+
+    out = ['<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" '
+           'viewBox="0 0 %d %d">' % (width, height, width, height)]
+    if background is not None:
+        out.append('<rect width="100%%" height="100%%" fill="%s"/>'
+                   % _hex(background))
+
+    for color, line_width, points in _polylines(stores):
+        rgba = _rgba(color)
+        coords = ' '.join('%.2f,%.2f' % (x * scale + dx, dy - y * scale)
+                          for x, y in points)
+        opacity = '' if rgba[3] == 255 else \
+            ' stroke-opacity="%.3f"' % (rgba[3] / 255)
+        out.append('<polyline points="%s" fill="none" stroke="%s"%s '
+                   'stroke-width="%g" stroke-linecap="round" '
+                   'stroke-linejoin="round"/>'
+                   % (coords, _hex(rgba), opacity, line_width * scale))
+    out.append('</svg>')
+    return '\n'.join(out)
+
+
+def to_png(paths, size=(400, 400), margin=10, background='white'):
+    """
+    Render drawing as PNG image data.
+
+    Lines are rasterized with square brushes of the pen width, without
+    antialiasing or transparency. Arguments are the same as in
+    :func:`to_svg`.
+    """
+
+    stores = _stores(paths)
+    width, height = size
+    pixels = rasterize(stores, size, margin, background)
+    stride = 3 * width
+    raw = b''.join(b'\x00' + pixels[i:i + stride]
+                   for i in range(0, len(pixels), stride))
+
+    def chunk(kind, data):
+        crc = zlib.crc32(kind + data) & 0xffffffff
+        return struct.pack('>I', len(data)) + kind + data + \
+            struct.pack('>I', crc)
+
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(bytes(raw), 6)),
+        chunk(b'IEND', b''),
+    ])
+
+
+def rasterize(paths, size=(400, 400), margin=10, background='white'):
+    """
+    Rasterize drawing to a bytearray of RGB pixels, row by row from the top.
+    """
+
+    stores = _stores(paths)
+    width, height = size
+    box = bounds(stores) or (0, 0, 0, 0)
+    scale, dx, dy = _transform(box, size, margin)
+    pixels = bytearray(bytes(_rgba(background)[:3]) * (width * height))
+
+    colors = {}
+    for path in stores:
+        for x0, y0, x1, y1, color, line_width in path:
+            try:
+                rgb = colors[color]
+            except KeyError:
+                rgb = colors[color] = bytes(_rgba(color)[:3])
+            pen = max(1, int(round(line_width * scale)))
+            half = pen // 2
+
+            # Pixel coordinates
+            x0, y0 = x0 * scale + dx, dy - y0 * scale
+            x1, y1 = x1 * scale + dx, dy - y1 * scale
+            for run in _line_runs(x0, y0, x1, y1):
+                _fill_run(pixels, size, run, pen, half, rgb)
+    return pixels
+
+
+#
+# Utility functions
+#
+def _stores(paths):
+    if isinstance(paths, PathStore):
+        return [paths]
+    return list(paths)
+
+
+def _line_runs(x0, y0, x1, y1):
+    # Split line in runs of pixels that share the same coordinate on the minor
+    # axis. Each run is a (x0, y0, x1, y1) tuple of integer coordinates.
+    if abs(x1 - x0) < abs(y1 - y0):
+        for a, b, c, d in _line_runs(y0, x0, y1, x1):
+            yield b, a, d, c
+        return
+
+    # |slope| <= 1: one run per row. Pixel (i, j) covers [i, i + 1) x
+    # [j, j + 1), so coordinates are rounded down, also when negative.
+    floor = math.floor
+    first, last = floor(y0), floor(y1)
+    if first == last:
+        yield floor(x0), first, floor(x1), first
+        return
+    inv_slope = (x1 - x0) / (y1 - y0)
+    step = 1 if last > first else -1
+    for row in range(first, last + step, step):
+        # Interval of y values in this row that belong to the segment
+        if step > 0:
+            ya, yb = max(row, y0), min(row + 1, y1)
+        else:
+            ya, yb = min(row + 1, y0), max(row, y1)
+        xa = x0 + (ya - y0) * inv_slope
+        xb = x0 + (yb - y0) * inv_slope
+        yield floor(xa), row, floor(xb), row
+
+
+def _fill_run(pixels, size, run, pen, half, rgb):
+    # Fill rectangle covered by stamping the brush from (x0, y0) to (x1, y1)
+    width, height = size
+    x0, y0, x1, y1 = run
+    left = max(min(x0, x1) - half, 0)
+    right = min(max(x0, x1) - half + pen, width)
+    top = max(min(y0, y1) - half, 0)
+    bottom = min(max(y0, y1) - half + pen, height)
+    if left >= right or top >= bottom:
+        return
+
+    # Tall and narrow runs are filled column by column using extended slices
+    rows, cols = bottom - top, right - left
+    if rows > 3 * cols:
+        stride = 3 * width
+        start = 3 * (top * width + left)
+        stop = start + rows * stride
+        for i in range(3 * cols):
+            pixels[start + i:stop + i:stride] = rgb[i % 3:i % 3 + 1] * rows
+        return
+
+    span = rgb * cols
+    size = len(span)
+    for row in range(top, bottom):
+        start = 3 * (row * width + left)
+        pixels[start:start + size] = span
+
+
+def _transform(box, size, margin):
+    # Return (scale, dx, dy) that maps drawing coordinates to pixels
+    xmin, ymin, xmax, ymax = box
+    width, height = size
+    span_x = max(xmax - xmin, 1e-9)
+    span_y = max(ymax - ymin, 1e-9)
+    scale = min((width - 2 * margin) / span_x, (height - 2 * margin) / span_y)
+    scale = max(min(scale, 1.0), 1e-9)
+    dx = (width - (xmax - xmin) * scale) / 2 - xmin * scale
+    dy = (height + (ymax - ymin) * scale) / 2 + ymin * scale
+    return scale, dx, dy
+
+
+def _polylines(stores):
+    # Merge consecutive connected segments with the same pen
+    color = width = points = None
+    for path in stores:
+        for x0, y0, x1, y1, seg_color, seg_width in path:
+            same_pen = seg_color == color and seg_width == width
+            if points is not None and same_pen and points[-1] == (x0, y0):
+                points.append((x1, y1))
+                continue
+            if points is not None:
+                yield color, width, points
+            color, width, points = seg_color, seg_width, [(x0, y0), (x1, y1)]
+    if points is not None:
+        yield color, width, points
+
+
+def _rgba(color):
+    if isinstance(color, float):
+        color = int(color)
+    if isinstance(color, int):
+        return ((color >> 24) & 0xff, (color >> 16) & 0xff,
+                (color >> 8) & 0xff, color & 0xff)
+    return tuple(Color(color))
+
+
+def _hex(color):
+    return '#%02x%02x%02x' % tuple(_rgba(color)[:3])
@@ -0,0 +1,263 @@
+"""
+A shared memory transport for the turtle client/server protocol.
+
+:class:`ShmQueue` implements the subset of the multiprocessing.Queue
+interface used by :class:`transpyler.turtle.MailboxState` and
+:class:`transpyler.turtle.IpcStateGroup`, so it can be used as their inbox
+or outbox.
+"""
+
+import pickle
+import queue
+import struct
+import threading
+import time
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+HEADER = struct.Struct('<QQ')
+FRAME = struct.Struct('<I')
+
+# Fixed size records for the most common turtle commands
+RECORD = struct.Struct('<BIdd')
+KIND_PICKLE, KIND_RECORD, KIND_BYTES = b'\x00', b'\x01', b'\x02'
+OPCODES = {'step': 1, 'rotate': 2, 'move': 3}
+OPNAMES = {v: k for k, v in OPCODES.items()}
+
+# Names of shared memory blocks created by this process
+_created = set()
+
+
+def encode_record(msg):
+    """
+    Encode a step, rotate or move message as a fixed size record.
+
+    Return None if the message cannot be represented as a record.
+    """
+
+    try:
+        action, id, arg = msg
+        opcode = OPCODES[action]
+        if opcode == 3:
+            x, y = arg
+        else:
+            x, y = arg, 0.0
+        return RECORD.pack(opcode, id, x, y)
+    except (KeyError, TypeError, ValueError, struct.error):
+        return None
+
+
+def decode_record(data, offset=0):
+    """
+    Decode a record created by :func:`encode_record`.
+    """
+
+    opcode, id, x, y = RECORD.unpack_from(data, offset)
+    if opcode == 3:
+        return ['move', id, (x, y)]
+    return [OPNAMES[opcode], id, x]
+
+
+def encode_message(msg):
+    """
+    Encode message as bytes.
+
+    Single commands are encoded as binary records. Other messages, including
+    batches, are pickled since the C pickler handles long lists faster than
+    packing records one by one. Bytes, such as messages encoded with
+    :mod:`transpyler.turtle.wire`, are stored as is.
+    """
+
+    if isinstance(msg, bytes):
+        return KIND_BYTES + msg
+    record = encode_record(msg)
+    if record is not None:
+        return KIND_RECORD + record
+    return KIND_PICKLE + pickle.dumps(msg, pickle.HIGHEST_PROTOCOL)
+
+
+def decode_message(data):
+    """
+    Decode message created by :func:`encode_message`.
+    """
+
+    kind = data[:1]
+    if kind == KIND_RECORD:
+        return decode_record(data, 1)
+    elif kind == KIND_BYTES:
+        return data[1:]
+    return pickle.loads(data[1:])
+
+
+class ShmQueue:
+    """
+    A single producer/single consumer queue backed by a ring buffer in shared
+    memory.
+
+    The buffer starts with two counters: the number of bytes ever read (head)
+    and written (tail). Each message is stored as a 4-byte length followed by
+    its encoded payload. Only the producer updates tail and only the consumer
+    updates head, so no locks are shared between processes. Each side must
+    be used by a single process, but threads of that process can share it:
+    puts and gets are serialized by a lock of the ShmQueue object.
+
+    ShmQueue objects can be passed to child processes, which attach to the
+    same shared memory block. The process that created the queue should call
+    :meth:`unlink` when it is no longer needed.
+    """
+
+    poll_interval = 0.0005
+    spin_count = 100
+
+    def __init__(self, capacity=1 << 20, name=None):
+        if shared_memory is None:
+            raise RuntimeError('shared memory requires Python 3.8+')
+
+        if name is None:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=HEADER.size + capacity)
+            HEADER.pack_into(self._shm.buf, 0, 0, 0)
+            _created.add(self._shm.name)
+        else:
+            self._shm = _attach(name)
+        self.capacity = capacity
+        self._buf = self._shm.buf
+        self._put_lock = threading.Lock()
+        self._get_lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'name': self._shm.name, 'capacity': self.capacity}
+
+    def __setstate__(self, state):
+        self.__init__(state['capacity'], state['name'])
+
+    def __repr__(self):
+        return '<ShmQueue %s: %s bytes>' % (self.name, self.capacity)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def qsize(self):
+        """
+        Number of bytes waiting to be read.
+        """
+        head, tail = HEADER.unpack_from(self._buf, 0)
+        return tail - head
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def put(self, msg, block=True, timeout=None):
+        """
+        Put message in the queue.
+
+        Raise queue.Full if there is no space for the message after the
+        given timeout.
+        """
+
+        data = encode_message(msg)
+        size = FRAME.size + len(data)
+        if size > self.capacity:
+            raise ValueError('message is larger than queue capacity')
+
+        with self._put_lock:
+            buf = self._buf
+            head, tail = HEADER.unpack_from(buf, 0)
+            if tail - head + size > self.capacity:
+                self._wait(lambda: self.capacity - self.qsize() >= size,
+                           block, timeout, queue.Full)
+
+            self._write(tail, FRAME.pack(len(data)) + data)
+            struct.pack_into('<Q', buf, 8, tail + size)
+
+    def put_nowait(self, msg):
+        self.put(msg, False)
+
+    def get(self, block=True, timeout=None):
+        """
+        Remove and return message from queue.
+
+        Raise queue.Empty if no message arrives after the given timeout.
+        """
+
+        with self._get_lock:
+            buf = self._buf
+            head, tail = HEADER.unpack_from(buf, 0)
+            if head == tail:
+                self._wait(lambda: not self.empty(), block, timeout,
+                           queue.Empty)
+
+            size, = FRAME.unpack(self._read(head, FRAME.size))
+            data = self._read(head + FRAME.size, size)
+            struct.pack_into('<Q', buf, 0, head + FRAME.size + size)
+        return decode_message(data)
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def close(self):
+        """
+        Detach from shared memory.
+        """
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self):
+        """
+        Close and destroy the shared memory block.
+        """
+        self.close()
+        self._shm.unlink()
+
+    def _wait(self, ready, block, timeout, exception):
+        if not block:
+            raise exception
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        # Spin for a while before sleeping: the other side is likely in the
+        # middle of a burst of messages.
+        for _ in range(self.spin_count):
+            if ready():
+                return
+        while not ready():
+            if deadline is not None and time.monotonic() > deadline:
+                raise exception
+            time.sleep(self.poll_interval)
+
+    def _write(self, pos, data):
+        buf, capacity = self._buf, self.capacity
+        start = pos % capacity
+        first = min(len(data), capacity - start)
+        offset = HEADER.size + start
+        buf[offset:offset + first] = data[:first]
+        if first < len(data):
+            rest = len(data) - first
+            buf[HEADER.size:HEADER.size + rest] = data[first:]
+
+    def _read(self, pos, size):
+        buf, capacity = self._buf, self.capacity
+        start = pos % capacity
+        first = min(size, capacity - start)
+        offset = HEADER.size + start
+        data = bytes(buf[offset:offset + first])
+        if first < size:
+            data += bytes(buf[HEADER.size:HEADER.size + size - first])
+        return data
+
+
+def _attach(name):
+    # Attached blocks must not be destroyed by the resource tracker of the
+    # child process when it exits.
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # Python < 3.13
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name)
+        if shm.name not in _created:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
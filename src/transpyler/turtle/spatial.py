@@ -0,0 +1,268 @@
+"""
+Spatial index of drawn segments.
+
+The index divides the plane in a uniform grid of square cells and stores
+each segment in all cells it crosses. Queries only visit the cells that
+overlap the query region and test the candidate segments exactly, so their
+cost depends on the number of segments near the region rather than on the
+size of the drawing. Segments that cross too many cells are kept in a
+separate list that every query tests, so very long lines do not fill the
+grid.
+"""
+
+import math
+from array import array
+
+from ..math import Vec
+
+
+class SegmentIndex:
+    """
+    A grid-based index of line segments.
+
+    Args:
+        cell_size:
+            Side of each grid cell, in pixels. Cells should be comparable to
+            the typical segment length and query size.
+        max_cells:
+            Segments that cross more than this number of cells are not
+            stored in the grid, but tested in every query.
+    """
+
+    def __init__(self, cell_size=50.0, max_cells=64):
+        if cell_size <= 0:
+            raise ValueError('cell size must be positive')
+        self.cell_size = float(cell_size)
+        self.max_cells = max_cells
+        self.data = array('d')
+        self._cells = {}
+        self._overflow = []
+
+    def __len__(self):
+        return len(self.data) // 4
+
+    def __repr__(self):
+        size, cells = len(self), len(self._cells)
+        return '<SegmentIndex: %s segments in %s cells>' % (size, cells)
+
+    def add(self, v1, v2):
+        """
+        Add segment from v1 to v2 to the index and return its id.
+        """
+
+        x0, y0 = v1
+        x1, y1 = v2
+        idx = len(self)
+        self.data.extend((x0, y0, x1, y1))
+        if self._is_long(x0, y0, x1, y1):
+            self._overflow.append(idx)
+            return idx
+
+        cells = self._cells
+        for cell in self._segment_cells(x0, y0, x1, y1):
+            try:
+                cells[cell].append(idx)
+            except KeyError:
+                cells[cell] = [idx]
+        return idx
+
+    def clear(self):
+        """
+        Remove all segments.
+        """
+        del self.data[:]
+        self._cells.clear()
+        del self._overflow[:]
+
+    def truncate(self, size):
+        """
+        Keep only the first size segments.
+
+        Segments are removed from the last one, so the cost is proportional
+        to the number of removed segments.
+        """
+
+        cells = self._cells
+        overflow = self._overflow
+        for idx in range(len(self) - 1, size - 1, -1):
+            x0, y0, x1, y1 = self.data[4 * idx:4 * idx + 4]
+            if overflow and overflow[-1] == idx:
+                overflow.pop()
+                del self.data[4 * idx:]
+                continue
+            for cell in self._segment_cells(x0, y0, x1, y1):
+                ids = cells[cell]
+                ids.pop()
+                if not ids:
+                    del cells[cell]
+            del self.data[4 * idx:]
+
+    def segment(self, idx):
+        """
+        Return segment with the given id as a pair of vectors.
+        """
+        x0, y0, x1, y1 = self.data[4 * idx:4 * idx + 4]
+        return Vec(x0, y0), Vec(x1, y1)
+
+    def query_rect(self, v1, v2):
+        """
+        Return all segments that intersect the rectangle with opposite corners
+        v1 and v2.
+
+        Segments are returned as pairs of vectors in the order they were
+        added.
+        """
+
+        (x0, y0), (x1, y1) = v1, v2
+        xmin, xmax = min(x0, x1), max(x0, x1)
+        ymin, ymax = min(y0, y1), max(y0, y1)
+        data = self.data
+        return self._result(
+            idx for idx in self._rect_candidates(xmin, ymin, xmax, ymax)
+            if _clips(data[4 * idx:4 * idx + 4], xmin, ymin, xmax, ymax)
+        )
+
+    def query_point(self, pos, radius=1.0):
+        """
+        Return all segments at a distance of at most radius from pos.
+        """
+
+        x, y = pos
+        data = self.data
+        candidates = self._rect_candidates(x - radius, y - radius,
+                                           x + radius, y + radius)
+        return self._result(
+            idx for idx in candidates
+            if _distance(x, y, *data[4 * idx:4 * idx + 4]) <= radius
+        )
+
+    def intersects(self, v1, v2):
+        """
+        Return all segments that intersect the segment from v1 to v2.
+
+        Segments that only touch the query segment at a single point, e.g.,
+        at its extremities, are also included.
+        """
+
+        (x0, y0), (x1, y1) = v1, v2
+        if self._is_long(x0, y0, x1, y1):
+            candidates = self._rect_candidates(min(x0, x1), min(y0, y1),
+                                               max(x0, x1), max(y0, y1))
+        else:
+            cells = self._cells
+            candidates = set(self._overflow)
+            for cell in self._segment_cells(x0, y0, x1, y1):
+                candidates.update(cells.get(cell, ()))
+        data = self.data
+        return self._result(
+            idx for idx in candidates
+            if _crosses(x0, y0, x1, y1, *data[4 * idx:4 * idx + 4])
+        )
+
+    def _result(self, ids):
+        return [self.segment(idx) for idx in sorted(ids)]
+
+    def _rect_candidates(self, xmin, ymin, xmax, ymax):
+        # Ids of segments stored in cells that overlap the rectangle
+        size = self.cell_size
+        i0, i1 = math.floor(xmin / size), math.floor(xmax / size)
+        j0, j1 = math.floor(ymin / size), math.floor(ymax / size)
+        cells = self._cells
+        candidates = set(self._overflow)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(cells):
+            # Large regions: it is cheaper to scan the occupied cells
+            for (i, j), ids in cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    candidates.update(ids)
+        else:
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    candidates.update(cells.get((i, j), ()))
+        return candidates
+
+    def _is_long(self, x0, y0, x1, y1):
+        # True if the segment crosses more than max_cells cells. A segment
+        # crosses at most one cell per row and column boundary plus one.
+        size = self.cell_size
+        di = abs(math.floor(x1 / size) - math.floor(x0 / size))
+        dj = abs(math.floor(y1 / size) - math.floor(y0 / size))
+        return di + dj + 1 > self.max_cells
+
+    def _segment_cells(self, x0, y0, x1, y1):
+        # Yield all (i, j) cells crossed by the segment, column by column
+        size = self.cell_size
+        if x0 > x1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        i0, i1 = math.floor(x0 / size), math.floor(x1 / size)
+        if i0 == i1:
+            for j in range(math.floor(min(y0, y1) / size),
+                           math.floor(max(y0, y1) / size) + 1):
+                yield i0, j
+            return
+
+        slope = (y1 - y0) / (x1 - x0)
+        for i in range(i0, i1 + 1):
+            xa = max(x0, i * size)
+            xb = min(x1, (i + 1) * size)
+            ya = y0 + (xa - x0) * slope
+            yb = y0 + (xb - x0) * slope
+            for j in range(math.floor(min(ya, yb) / size),
+                           math.floor(max(ya, yb) / size) + 1):
+                yield i, j
+
+
+#
+# Geometric predicates
+#
+def _distance(x, y, x0, y0, x1, y1):
+    # Distance from point to segment
+    dx, dy = x1 - x0, y1 - y0
+    norm = dx * dx + dy * dy
+    t = 0.0 if norm == 0 else ((x - x0) * dx + (y - y0) * dy) / norm
+    t = min(max(t, 0.0), 1.0)
+    return math.hypot(x - x0 - t * dx, y - y0 - t * dy)
+
+
+def _clips(segment, xmin, ymin, xmax, ymax):
+    # Liang-Barsky test of a segment against an axis-aligned rectangle
+    x0, y0, x1, y1 = segment
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - xmin), (dx, xmax - x0),
+                 (-dy, y0 - ymin), (dy, ymax - y0)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+            if t0 > t1:
+                return False
+    return True
+
+
+def _orientation(ax, ay, bx, by, cx, cy):
+    value = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    return (value > 0) - (value < 0)
+
+
+def _crosses(ax, ay, bx, by, cx, cy, dx, dy):
+    # Closed segments AB and CD intersect
+    o1 = _orientation(ax, ay, bx, by, cx, cy)
+    o2 = _orientation(ax, ay, bx, by, dx, dy)
+    o3 = _orientation(cx, cy, dx, dy, ax, ay)
+    o4 = _orientation(cx, cy, dx, dy, bx, by)
+    if o1 != o2 and o3 != o4:
+        return True
+
+    # Collinear cases: check if an endpoint lies within the other segment
+    def within(px, py, qx, qy, rx, ry):
+        inside_x = min(px, qx) <= rx <= max(px, qx)
+        return inside_x and min(py, qy) <= ry <= max(py, qy)
+
+    cases = [(o1, (ax, ay, bx, by, cx, cy)), (o2, (ax, ay, bx, by, dx, dy)),
+             (o3, (cx, cy, dx, dy, ax, ay)), (o4, (cx, cy, dx, dy, bx, by))]
+    return any(o == 0 and within(*args) for o, args in cases)
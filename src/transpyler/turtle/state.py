@@ -1,7 +1,13 @@
+import time
+import weakref
 from multiprocessing import Queue
+from threading import Condition, RLock, Thread
 
 from colortools import Color
 
+from . import wire
+from .path import PathStore
+from .spatial import SegmentIndex
 from .utils import getsetter, ipc_property
 from ..math import vec, cos, sin, tan
 
@@ -12,17 +18,35 @@ class TurtleState:
     instances that manipulates a state object. The state can be local and
     apply changes immediately or it can be remote and echo to a state stored
     in a different process/machine/thread.
+
+    If path is True or a :class:`transpyler.turtle.path.PathStore` instance,
+    all drawn segments are also recorded in the ``.path`` attribute.
+    Similarly, if index is True or a
+    :class:`transpyler.turtle.spatial.SegmentIndex` instance, segments are
+    added to the ``.index`` attribute, which answers spatial queries about
+    the drawing. States that record a path build the index on the first call
+    to :meth:`spatial_index` instead.
+
+    The speed attribute controls animations in GUI backends (see
+    :mod:`transpyler.turtle.motion`). The default speed of 0 draws
+    immediately. It does not affect local states, which always apply changes
+    immediately.
     """
 
     valid_avatars = ['default']
 
+    #: Actions that handle() executes by calling the method of the same name
+    handled_actions = frozenset(['rotate', 'move', 'step', 'clean', 'erase',
+                                 'reset'])
+
     @property
     def heading_direction(self):
         return vec(self._cos(self.heading), self._sin(self.heading))
 
     def __init__(self, pos=None, heading=0.0, drawing=True,
                  color='black', fillcolor='black', width=1, hidden=False,
-                 avatar=None, group=None, id=None):
+                 avatar=None, group=None, id=None, path=None, speed=0,
+                 index=None):
         self.pos = self.startpos = self._vec(pos or (0, 0))
         self.heading = self.startheading = heading
         self.drawing = self.startdrawing = drawing
@@ -31,7 +55,11 @@ class TurtleState:
         self.width = width
         self.hidden = hidden
         self.avatar = self.valid_avatars[0] if avatar is None else avatar
+        self.speed = speed
+        self.segments = 0
         self.lines = []
+        self.path = _optional(path, PathStore)
+        self.index = _optional(index, SegmentIndex)
         self.group = group
         self.id = id
 
@@ -55,19 +83,77 @@ class TurtleState:
         oldpos = self.pos
         self.pos = pos
         if self.drawing:
+            self.record_line(oldpos, pos)
             self.draw_line(oldpos, pos)
 
+    def record_line(self, v1, v2):
+        """
+        Record a segment drawn from v1 to v2 in the path store and in the
+        spatial index.
+        """
+        if self.path is not None:
+            self.path.append(v1, v2, self.color, self.width)
+        if self.index is not None:
+            self.index.add(v1, v2)
+        self.segments += 1
+
+    def spatial_index(self):
+        """
+        Return the :class:`transpyler.turtle.spatial.SegmentIndex` with all
+        segments drawn by the turtle.
+
+        The index is built from the path store on the first call and it is
+        kept up to date afterwards. Raise RuntimeError if the state records
+        neither a path nor an index, since its lines cannot be queried.
+        """
+
+        index = getattr(self, 'index', None)
+        if index is None:
+            path = getattr(self, 'path', None)
+            if path is None:
+                raise RuntimeError('turtle does not record its lines')
+            index = self.index = SegmentIndex()
+            for x0, y0, x1, y1, *_ in path:
+                index.add((x0, y0), (x1, y1))
+        return index
+
     def step(self, step):
         """
         Move forwards (or backwards if step is negative).
         """
-        self.move(self.pos + self.heading_direction * step)
+        x, y = self.pos
+        heading = self.heading
+        self.move(self._vec(x + self._cos(heading) * step,
+                            y + self._sin(heading) * step))
 
     def clean(self):
         """
         Remove all drawn lines.
         """
         self.lines.clear()
+        if self.path is not None:
+            self.path.clear()
+        if self.index is not None:
+            self.index.clear()
+        self.segments = 0
+
+    def erase(self, n=1):
+        """
+        Remove the last n segments drawn by the turtle.
+        """
+
+        n = min(n, self.segments)
+        if n <= 0:
+            return
+
+        # Lines are erased first, so the state is unchanged if the backend
+        # cannot erase them
+        self.erase_lines(n)
+        self.segments -= n
+        if self.path is not None:
+            self.path.truncate(len(self.path) - n)
+        if self.index is not None:
+            self.index.truncate(len(self.index) - n)
 
     def reset(self):
         """
@@ -82,8 +168,22 @@ class TurtleState:
     def draw_line(self, v1, v2):
         """
         Draws line from v1 to v2.
+
+        States that only record lines in a path store do not need to
+        implement this method.
         """
-        raise NotImplementedError
+        if self.path is None:
+            raise NotImplementedError
+
+    def erase_lines(self, n):
+        """
+        Remove the last n lines drawn with :meth:`draw_line`.
+
+        States that only record lines in a path store do not need to
+        implement this method.
+        """
+        if self.path is None:
+            raise NotImplementedError
 
     def register(self, group):
         """
@@ -91,6 +191,14 @@ class TurtleState:
         """
         self.group = group
 
+    def unregister(self, group):
+        """
+        Called when the turtle is removed from the group.
+
+        States that create graphic items should remove them here.
+        """
+        self.group = None
+
     def recv(self):
         """
         Receives messages from a connection.
@@ -111,18 +219,9 @@ class TurtleState:
         elif action == 'set':
             setattr(self, *args)
             return ['set', id, args[0]]
-        elif action == 'rotate':
-            self.rotate(args[0])
-            return ['rotate', id]
-        elif action == 'move':
-            self.move(args[0])
-            return ['move', id]
-        elif action == 'step':
-            self.step(args[0])
-            return ['step', id]
-        elif action == 'clean':
-            self.clean()
-            return ['clean', id]
+        elif action in self.handled_actions:
+            getattr(self, action)(*args)
+            return [action, id]
         else:
             raise ValueError('invalid action: %r' % action)
 
@@ -186,6 +285,11 @@ class PropertyState(TurtleState):
 
     avatar = getsetter('avatar')
 
+    # Speed
+    getspeed = (lambda self: self._speed)
+    setspeed = (lambda self, v: setattr(self, '_speed', v))
+    speed = getsetter('speed')
+
 
 class RemoteState(TurtleState):
     """
@@ -205,21 +309,48 @@ class RemoteState(TurtleState):
         Rotates by the given angle.
     ['move', id, pos]:
         Moves turtle to the given position.
+    ['batch', [msg1, msg2, ...]]:
+        Executes a list of messages that do not expect a reply.
+    ['erase', id, n]:
+        Removes the last n segments drawn by the turtle.
+    ['clean', id]:
+        Removes all lines drawn by the turtle.
+    ['reset', id]:
+        Removes all lines drawn by the turtle and moves it back to its
+        initial state.
+    ['clear'] and ['reset']:
+        Clean or reset all turtles of the group.
+    ['newturtles', n, kwargs]:
+        Creates n turtles at once. The reply contains the list of new ids.
+    ['delturtle', id]:
+        Removes turtle from the server.
 
     The actual state info is stored on another thread or process.
+
+    Messages that do not need a reply (step, rotate, move, set, clean, erase
+    and reset) are sent using the `.post(msg)` method. Subclasses can
+    override it to buffer those messages instead of waiting for a reply for
+    each one.
     """
 
     pos = ipc_property('pos', vec, tuple)
     heading = ipc_property('heading')
     drawing = ipc_property('drawing')
-    color = ipc_property('color', Color, tuple)
-    fillcolor = ipc_property('fillcolor', Color, tuple)
+    color = ipc_property('color', Color, lambda x: tuple(Color(x)))
+    fillcolor = ipc_property('fillcolor', Color, lambda x: tuple(Color(x)))
     width = ipc_property('width')
     hidden = ipc_property('hidden')
     avatar = ipc_property('avatar')
+    speed = ipc_property('speed')
     id = None
 
     def __init__(self, **kwargs):
+        # States created by new_turtles() already exist on the server
+        remote_id = kwargs.pop('remote_id', None)
+        if remote_id is not None:
+            self.id = remote_id
+            return
+
         msg = self.send(['newturtle', kwargs])
         if msg[0] != 'newturtle':
             raise ValueError('invalid reply: %s' % msg)
@@ -227,23 +358,58 @@ class RemoteState(TurtleState):
         if not self.id:
             raise ValueError('invalid remote id: %s' % self.id)
 
+    def new_turtles(self, n, **kwargs):
+        """
+        Create n turtles with the given parameters on the server using a
+        single request.
+
+        Return a list of new states that use the same connection.
+        """
+
+        msg = self.send(['newturtles', n, kwargs])
+        if msg[0] != 'newturtles':
+            raise ValueError('invalid reply: %s' % msg)
+        kwargs.update(self.connection_kwargs())
+        return [type(self)(remote_id=id, **kwargs) for id in msg[1]]
+
+    def delete(self):
+        """
+        Remove turtle from the server.
+
+        The state should not be used afterwards.
+        """
+        self.post(['delturtle', self.id])
+
+    def connection_kwargs(self):
+        """
+        Return the arguments that make a new state use the same connection
+        as this one.
+        """
+        return {}
+
     def rotate(self, angle):
-        self.send(['rotate', self.id, angle])
+        self.post(['rotate', self.id, angle])
 
     def move(self, pos):
-        self.send(['move', self.id, tuple(pos)])
+        self.post(['move', self.id, tuple(pos)])
 
     def step(self, step):
-        self.send(['step', self.id, step])
+        self.post(['step', self.id, step])
 
     def getvalue(self, attr):
         return self.send(['get', self.id, attr])[2]
 
     def setvalue(self, attr, value):
-        return self.send(['set', self.id, attr, value])
+        self.post(['set', self.id, attr, value])
 
     def clean(self):
-        self.send(['clear', self.id])
+        self.post(['clean', self.id])
+
+    def reset(self):
+        self.post(['reset', self.id])
+
+    def erase(self, n=1):
+        self.post(['erase', self.id, n])
 
     def send(self, msg):
         """
@@ -252,6 +418,116 @@ class RemoteState(TurtleState):
         """
         raise NotImplementedError('must implement the .send(msg) method')
 
+    def post(self, msg):
+        """
+        Sends a message that does not require a reply.
+
+        The default implementation simply calls .send(msg) and discards the
+        reply.
+        """
+        self.send(msg)
+
+    def flush(self):
+        """
+        Sends all messages buffered by .post(msg), if any.
+        """
+
+
+class Mailbox:
+    """
+    The buffer of outgoing messages of a connection.
+
+    All :class:`MailboxState` instances that write to the same outbox share
+    a single mailbox. Messages posted by different turtles are kept in a
+    single buffer, in the order they were posted, and a single lock
+    serializes all writes to the outbox. Buffered messages are flushed by a
+    daemon thread that is started with the first timed flush and lives as
+    long as the process.
+    """
+
+    _instances = weakref.WeakKeyDictionary()
+    _instances_lock = RLock()
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+        self.lock = RLock()
+        self.pending = []
+        self.deadline = None
+        self._put = None
+        self._wakeup = Condition(self.lock)
+        self._thread = None
+
+    @classmethod
+    def get(cls, outbox):
+        """
+        Return the mailbox associated with the given outbox.
+        """
+
+        with cls._instances_lock:
+            try:
+                return cls._instances[outbox]
+            except KeyError:
+                mailbox = cls._instances[outbox] = cls(outbox)
+                return mailbox
+
+    def send(self, state, msg):
+        """
+        Flush the buffer, send msg and return the reply.
+        """
+
+        with self.lock:
+            self.flush()
+            state.put_message(msg)
+            return state.get_message()
+
+    def post(self, state, msg):
+        """
+        Buffer a message that does not require a reply.
+
+        The batch_size and flush_interval attributes of the given state
+        control when the buffer is flushed.
+        """
+
+        with self.lock:
+            pending = self.pending
+            if not pending:
+                self._put = state.put_message
+                if state.flush_interval is not None:
+                    self._schedule(state.flush_interval)
+            pending.append(msg)
+            if len(pending) >= state.batch_size:
+                self.flush()
+
+    def flush(self):
+        """
+        Send all buffered messages as a single batch.
+        """
+
+        with self.lock:
+            self.deadline = None
+            if self.pending:
+                self._put(['batch', self.pending])
+                self.pending = []
+
+    def _schedule(self, interval):
+        self.deadline = time.monotonic() + interval
+        if self._thread is None:
+            self._thread = Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._wakeup.notify()
+
+    def _run(self):
+        with self.lock:
+            while True:
+                if self.deadline is None:
+                    self._wakeup.wait()
+                    continue
+                delay = self.deadline - time.monotonic()
+                if delay > 0:
+                    self._wakeup.wait(delay)
+                else:
+                    self.flush()
+
 
 class MailboxState(RemoteState):
     """
@@ -260,6 +536,21 @@ class MailboxState(RemoteState):
 
     The communication uses an inbox/outbox model. The client puts a message in
     the outbox and the server responds with a message in the inbox.
+
+    Messages that do not require a reply are buffered and sent to the server
+    as a single ['batch', [...]] message. All turtles that share an outbox
+    also share the buffer (see :class:`Mailbox`), so the server receives
+    their messages in the order they were posted. The buffer is flushed when
+    it reaches `batch_size` messages, before any synchronous request and
+    `flush_interval` seconds after the first buffered message. If
+    flush_interval is None, buffered messages are only sent on these first
+    two conditions or by an explicit call to .flush().
+
+    Outgoing messages are encoded with :func:`transpyler.turtle.wire.encode`.
+    The binary format is about 25% smaller than pickle, can be read by
+    servers not written in Python and is copied as is by
+    :class:`transpyler.turtle.shm.ShmQueue`. Set wire_format to False to
+    send plain S-expressions instead.
     """
 
     def inbox_factory(self):
@@ -269,32 +560,46 @@ class MailboxState(RemoteState):
         return Queue()
 
     timeout = 1.0
+    batch_size = 256
+    flush_interval = 0.05
+    wire_format = True
 
     def __init__(self, **kwargs):
         # Initialize inbox
         try:
-            self.inbox = kwargs['inbox']
+            self.inbox = kwargs.pop('inbox')
         except KeyError:
             if not hasattr(self, 'inbox'):
                 self.inbox = self.inbox_factory()
 
         # Initialize outbox
         try:
-            self.outbox = kwargs['outbox']
+            self.outbox = kwargs.pop('outbox')
         except KeyError:
             if not hasattr(self, 'outbox'):
                 self.outbox = self.outbox_factory()
 
+        self.mailbox = Mailbox.get(self.outbox)
         super().__init__(**kwargs)
 
+    def connection_kwargs(self):
+        return {'inbox': self.inbox, 'outbox': self.outbox}
+
     def send(self, msg):
-        self.put_message(msg)
-        return self.get_message()
+        return self.mailbox.send(self, msg)
+
+    def post(self, msg):
+        self.mailbox.post(self, msg)
+
+    def flush(self):
+        self.mailbox.flush()
 
     def put_message(self, msg):
         """
         Put outgoing message on the outbox
         """
+        if self.wire_format:
+            msg = wire.encode(msg)
         self.outbox.put(msg)
 
     def get_message(self):
@@ -311,14 +616,28 @@ class MirrorState(RemoteState):
     """
     A remote turtle that stores a copy of state in itself.
 
+    The local copy is authoritative: all getters read from it and each
+    mutation is computed locally and sent to the server as a single message
+    with the resulting value. Steps are sent as ['move', id, pos] with the
+    final position and rotations as ['set', id, 'heading', heading].
+
+    The local copy also records the drawn segments, so queries such as
+    :meth:`transpyler.turtle.Turtle.query_point` do not reach the server.
+    Their spatial index is only built on the first query.
+
     This state is used by the QTurtle application in the kernel process.
     """
 
+    mirrored_attrs = ('pos', 'heading', 'drawing', 'color', 'fillcolor',
+                      'width', 'hidden', 'avatar', 'speed')
+
     def __init__(self, **kwargs):
+        state = {k: kwargs[k] for k in self.mirrored_attrs if k in kwargs}
+        index = kwargs.pop('index', None)
         super().__init__(**kwargs)
-        self.local = TurtleState(**kwargs)
+        self.local = TurtleState(id=self.id, path=True, index=index, **state)
         self.local.draw_line = lambda v1, v2: None
-        self.id = self.local.id
+        self.local.erase_lines = lambda n: None
         self.lines = []
 
     def getvalue(self, attr):
@@ -331,24 +650,57 @@ class MirrorState(RemoteState):
     def rotate(self, angle):
         local = self.local
         local.rotate(angle)
-        super().rotate(angle)
-        self.setvalue('heading', local.heading)
+        self.post(['set', self.id, 'heading', local.heading])
 
     def move(self, pos):
         local = self.local
         local.move(pos)
-        super().move(pos)
-        self.setvalue('pos', local.pos)
+        self.post(['move', self.id, tuple(local.pos)])
 
     def step(self, step):
         local = self.local
         local.step(step)
-        super().step(step)
-        self.setvalue('pos', local.pos)
+        self.post(['move', self.id, tuple(local.pos)])
 
     def clean(self):
         self.local.clean()
         super().clean()
 
+    def erase(self, n=1):
+        self.local.erase(n)
+        super().erase(n)
+
+    @property
+    def segments(self):
+        return self.local.segments
+
+    def spatial_index(self):
+        return self.local.spatial_index()
+
+    def reset(self):
+        self.local.reset()
+        self.post(['reset', self.id])
+
     def draw_line(self, v1, v2):
         pass
+
+
+class MailboxMirrorState(MirrorState, MailboxState):
+    """
+    A mirror state that communicates with the server using the batched
+    inbox/outbox protocol of :class:`MailboxState`.
+
+    Since getters never reach the server, all commands are buffered and
+    the client only waits for the server when creating a new turtle.
+    """
+
+
+def _optional(value, factory):
+    # Flags accept True (create a new object), False or None (disabled) or
+    # an existing object. Empty stores are falsy, so they are not tested
+    # with "or".
+    if value is True:
+        return factory()
+    elif value is False:
+        return None
+    return value
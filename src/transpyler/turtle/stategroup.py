@@ -1,55 +1,153 @@
 import collections
+import heapq
+import time
 from multiprocessing import Queue
 
+from . import wire
+from .path import PathStore, unpack_color
 from .state import TurtleState
+from ..math import vec
 
 
 class StateGroup(collections.MutableSequence):
     """
     Manage and coordinate a group of turtle states.
 
-    It presents itself as a list of turtles.
+    It presents itself as a list of turtles. Turtles are also indexed by id,
+    hence :meth:`getturtle` and :meth:`remove_turtle` take constant time.
+    Appending turtles and removing the last one are also O(1), but inserting,
+    replacing or deleting turtles in other positions takes O(n). Positional
+    access uses a list of the turtles that is rebuilt in O(n) after the group
+    changes, except for the last turtle, which is always found in O(1).
+
+    Ids of removed turtles are not given to new turtles, so stale references
+    to removed turtles are detected. If reuse_ids is True, new turtles receive
+    the smallest free id instead.
     """
 
     state_class = TurtleState
+    reuse_ids = False
+
+    # State attributes saved by snapshot()
+    snapshot_attrs = ('pos', 'heading', 'drawing', 'color', 'fillcolor',
+                      'width', 'hidden', 'avatar', 'speed')
 
     def __init__(self):
         self._index = 0
-        self._turtles = []
+        self._free_ids = []
+        self._turtles = collections.OrderedDict()
+        self._order = None
 
     def __setitem__(self, idx, value):
-        if not isinstance(value, self.state_class):
-            raise TypeError(type(value))
-        value.register(self)
-        self._turtles.__setitem__(idx, value)
+        idx = self._position(idx)
+        old = self[idx]
+        if value is old:
+            return
+        self._validate(value, replacing=old)
+        after = list(self)[idx + 1:]
+        self.remove_turtle(old.id)
+        self._add(value)
+        self._move_to_end(after)
 
     def __len__(self):
         return len(self._turtles)
 
     def __iter__(self):
-        return iter(self._turtles)
+        return iter(self._turtles.values())
 
     def __getitem__(self, idx):
-        return self._turtles[idx]
+        if isinstance(idx, slice):
+            return list(self)[idx]
+        idx = self._position(idx)
+        if idx == len(self) - 1:
+            return self._turtles[next(reversed(self._turtles))]
+        if self._order is None:
+            self._order = list(self._turtles.values())
+        return self._order[idx]
 
     def __delitem__(self, idx):
-        return self._turtles.__delitem__[idx]
+        if isinstance(idx, slice):
+            for turtle in self[idx]:
+                self.remove_turtle(turtle.id)
+        else:
+            self.remove_turtle(self[idx].id)
+
+    def __contains__(self, value):
+        id = getattr(value, 'id', None)
+        return self._turtles.get(id) is value
 
     def getturtle(self, id):
         """
         Gets turtle by id.
         """
-        for turtle in self:
-            if turtle.id == id:
-                return turtle
-        raise ValueError('invalid turtle id: %s' % id)
+        try:
+            return self._turtles[id]
+        except KeyError:
+            raise ValueError('invalid turtle id: %s' % id)
+
+    def remove_turtle(self, id):
+        """
+        Remove turtle with the given id from the group and return it.
+        """
 
-    def insert(self, idx, value):
-        self._turtles.insert(idx, None)
         try:
-            self[idx] = value
-        except Exception:
-            self.remove(None)
+            turtle = self._turtles.pop(id)
+        except KeyError:
+            raise ValueError('invalid turtle id: %s' % id)
+        self._order = None
+        if self.reuse_ids:
+            heapq.heappush(self._free_ids, id)
+        turtle.unregister(self)
+        return turtle
+
+    def insert(self, idx, value):
+        self._validate(value)
+        size = len(self)
+        if idx < 0:
+            idx = max(idx + size, 0)
+        after = list(self)[idx:] if idx < size else ()
+        self._add(value)
+        self._move_to_end(after)
+
+    def _position(self, idx):
+        size = len(self)
+        if idx < 0:
+            idx += size
+        if not 0 <= idx < size:
+            raise IndexError('turtle index out of range')
+        return idx
+
+    def _validate(self, value, replacing=None):
+        if not isinstance(value, self.state_class):
+            raise TypeError(type(value))
+        other = self._turtles.get(value.id)
+        if other is not None and other is not replacing:
+            raise ValueError('duplicate turtle id: %s' % value.id)
+
+    def _add(self, value):
+        # Register turtle at the end of the group, assigning an id if needed
+        if value.id is None:
+            value.id = self._next_id()
+        elif isinstance(value.id, int):
+            self._index = max(self._index, value.id)
+        value.register(self)
+        self._turtles[value.id] = value
+        self._order = None
+
+    def _move_to_end(self, turtles):
+        move = self._turtles.move_to_end
+        for turtle in turtles:
+            move(turtle.id)
+        self._order = None
+
+    def _next_id(self):
+        free = self._free_ids
+        while free:
+            id = heapq.heappop(free)
+            if id not in self._turtles:
+                return id
+        self._index += 1
+        return self._index
 
     def new_turtle(self, **kwargs):
         """
@@ -58,12 +156,73 @@ class StateGroup(collections.MutableSequence):
         Return the turtle state object.
         """
 
-        self._index += 1
         turtle = self.state_class(**kwargs)
-        turtle.id = self._index
+        turtle.id = self._next_id()
         self.append(turtle)
         return turtle
 
+    def new_turtles(self, n, **kwargs):
+        """
+        Creates n new turtle states with the given parameters.
+
+        Return a list of turtle states.
+        """
+        return [self.new_turtle(**kwargs) for _ in range(n)]
+
+    def snapshot(self):
+        """
+        Return a dictionary with the state and the drawings of all turtles.
+
+        Drawings are only saved for turtles that record a path.
+        """
+
+        turtles = []
+        for turtle in self:
+            attrs = {attr: getattr(turtle, attr)
+                     for attr in self.snapshot_attrs}
+            attrs['pos'] = tuple(attrs['pos'])
+            start = (tuple(turtle.startpos), turtle.startheading,
+                     turtle.startdrawing)
+            path = None if turtle.path is None else turtle.path.tobytes()
+            turtles.append((turtle.id, attrs, start, path))
+        return {'index': self._index, 'free_ids': list(self._free_ids),
+                'turtles': turtles}
+
+    def restore(self, snapshot):
+        """
+        Add the turtles saved by :meth:`snapshot` to the group and draw their
+        lines again.
+        """
+
+        for id, attrs, start, path in snapshot['turtles']:
+            pos, heading, drawing = start
+            turtle = self.state_class(pos=pos, heading=heading,
+                                      drawing=drawing, id=id,
+                                      path=path is not None)
+            self.append(turtle)
+
+            # Segments go through move() to update the path, indexes and
+            # graphic items of the state
+            if path:
+                colors = {}
+                turtle.drawing = True
+                for x0, y0, x1, y1, color, width in PathStore.frombytes(path):
+                    try:
+                        rgba = colors[color]
+                    except KeyError:
+                        rgba = colors[color] = tuple(unpack_color(color))
+                    turtle.color = rgba
+                    turtle.width = width
+                    turtle.pos = vec(x0, y0)
+                    turtle.move(vec(x1, y1))
+            for attr, value in attrs.items():
+                setattr(turtle, attr, value)
+
+        self._index = max(self._index, snapshot['index'])
+        self._free_ids = [id for id in snapshot['free_ids']
+                          if id not in self._turtles]
+        heapq.heapify(self._free_ids)
+
     def clean(self):
         """
         Clear all drawings, but maintains turtles in their respective states.
@@ -83,15 +242,48 @@ class IpcStateGroup(StateGroup):
     """
     A state handle that receives messages from a client using a inbox/outbox
     communication model.
+
+    If the journal attribute is set to a
+    :class:`transpyler.turtle.journal.Journal`, all commands that change the
+    state are recorded in it and snapshots are taken periodically. Turtles
+    then record their paths, so snapshots include the drawings.
     """
 
     inbox_factory = outbox_factory = Queue
     timeout = 1.0
     inbox = outbox = None
+    motion = None
+    journal = None
+
+    #: Number of commands in the backlog above which drain() stops reading
+    #: the inbox while animations are running
+    max_backlog = 10000
+
+    #: Actions sent to the turtle whose id is the second element of the
+    #: message. ['reset'] without an id resets the whole group.
+    turtle_actions = frozenset(['get', 'set', 'move', 'step', 'rotate',
+                                'erase', 'clean', 'reset'])
+
+    #: Turtle actions that cancel the pending animations of the turtle
+    cancel_actions = frozenset(['clean', 'reset'])
+
+    #: Group actions and the names of the methods that handle them
+    group_actions = {
+        'batch': '_handle_batch',
+        'newturtle': '_handle_newturtle',
+        'newturtles': '_handle_newturtles',
+        'delturtle': '_handle_delturtle',
+        'clear': '_handle_clear',
+        'reset': '_handle_reset',
+    }
 
     def __init__(self, inbox=None, outbox=None, **kwargs):
         self.inbox = inbox or self.inbox_factory()
         self.outbox = outbox or self.outbox_factory()
+        self._backlog = collections.deque()
+        self._waiting = 0
+        self.processed = 0
+        self.coalesced = 0
         super().__init__(**kwargs)
 
     def ping(self, receive=False):
@@ -117,34 +309,219 @@ class IpcStateGroup(StateGroup):
 
         msg = self.inbox.get(timeout=self.timeout)
         reply = self.handle(msg)
-        self.outbox.put(reply)
+        if reply is not None:
+            self.outbox.put(reply)
         return reply
 
+    def drain(self, budget=None):
+        """
+        Process messages from the inbox until it is empty or until the given
+        time budget (in seconds) is exhausted.
+
+        Batches are split into individual commands, so a large batch can be
+        processed across several calls. Commands that were not processed stay
+        in a backlog for the next call. At least one command is processed
+        per call. Consecutive commands that can be merged are coalesced (see
+        :meth:`coalesce`).
+
+        If the group has a :class:`transpyler.turtle.motion.MotionScheduler`
+        in its .motion attribute, movements are handed to the scheduler and
+        processing stops until their animations finish. Animations are
+        completed immediately when a client is waiting for a reply. While
+        animations run, the inbox is read until the time budget is exhausted
+        or the backlog reaches max_backlog commands.
+
+        Return the number of commands processed.
+        """
+
+        deadline = None if budget is None else time.perf_counter() + budget
+        backlog = self._backlog
+        motion = self.motion
+        count = 0
+        while True:
+            busy = motion is not None and motion.busy
+            if self._can_read(busy, deadline) and self._read_inbox():
+                continue
+            if not backlog or (busy and not self._waiting):
+                break
+            if busy:
+                motion.finish()
+
+            self._execute(*self._next_command())
+            count += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+        self.processed += count
+        return count
+
+    def _can_read(self, busy, deadline):
+        # The inbox is read when the backlog is empty. While animations run,
+        # it is also read to find clients waiting for a reply, but only until
+        # the deadline or until the backlog is full.
+        backlog = self._backlog
+        if not backlog:
+            return True
+        if not busy or len(backlog) >= self.max_backlog:
+            return False
+        return deadline is None or time.perf_counter() < deadline
+
+    def _read_inbox(self):
+        # Move a message from the inbox to the backlog. Return False if the
+        # inbox is empty.
+        inbox = self.inbox
+        if inbox.empty():
+            return False
+        msg = inbox.get(timeout=self.timeout)
+        if isinstance(msg, bytes):
+            msg = wire.decode(msg)
+        if msg[0] == 'batch':
+            self._backlog.extend((cmd, False) for cmd in msg[1])
+        else:
+            self._backlog.append((msg, True))
+            self._waiting += 1
+        return True
+
+    def _next_command(self):
+        # Pop the next command from the backlog, merging it with the commands
+        # that follow it when possible. Return a (msg, reply_required) pair.
+        backlog = self._backlog
+        msg, reply_required = backlog.popleft()
+        if reply_required:
+            self._waiting -= 1
+            return msg, True
+        while backlog and not backlog[0][1]:
+            merged = self.coalesce(msg, backlog[0][0])
+            if merged is None:
+                break
+            backlog.popleft()
+            msg = merged
+            self.coalesced += 1
+        return msg, False
+
+    def _execute(self, msg, reply_required):
+        # Animate or execute command and send the reply, if required
+        if not reply_required and self._animate(msg):
+            if self.journal is not None:
+                self._record(msg)
+            return
+        reply = self.handle(msg)
+        if reply_required and reply is not None:
+            self.outbox.put(reply)
+
+    def _animate(self, msg):
+        # Hand command to the motion scheduler. Animations are skipped while
+        # a client waits for a reply.
+        motion = self.motion
+        if motion is None or self._waiting or msg[0] not in motion.actions:
+            return False
+        return motion.schedule(self.getturtle(msg[1]), msg)
+
+    def backlog_size(self):
+        """
+        Number of commands received but not processed yet.
+
+        It does not count messages still in the inbox.
+        """
+        return len(self._backlog)
+
+    def coalesce(self, msg, next_msg):
+        """
+        Return a single command equivalent to executing msg and next_msg or
+        None if they cannot be merged.
+
+        Consecutive sets of the same attribute of a turtle are merged, as are
+        consecutive moves or steps of a turtle that is not drawing.
+        """
+
+        action, id = msg[:2]
+        if next_msg[0] != action or next_msg[1] != id:
+            return None
+        if action == 'set':
+            return next_msg if msg[2] == next_msg[2] else None
+        elif action == 'move' or action == 'step':
+            if self.getturtle(id).drawing:
+                return None
+            if action == 'move':
+                return next_msg
+            return ['step', id, msg[2] + next_msg[2]]
+        return None
+
     def handle(self, msg):
         """
         Receive message and handle message.
 
-        Dispatch to the corresponding turtle, if required.
+        Dispatch to the corresponding turtle, if required. Batch messages
+        execute all their commands and return None, since the client does not
+        wait for a reply. Messages encoded with
+        :func:`transpyler.turtle.wire.encode` are decoded first.
         """
 
-        action, *args = msg
+        if isinstance(msg, bytes):
+            msg = wire.decode(msg)
+        reply = self._dispatch(msg)
+        if self.journal is not None and msg[0] != 'batch':
+            self._record(msg)
+        return reply
 
-        # Global actions
-        if action == 'newturtle':
-            kwargs = args[0]
-            new = self.new_turtle(**kwargs)
-            return ['newturtle', new.id]
-        elif action == 'clear':
-            self.clean()
-            return ['clear']
-        elif action == 'reset':
-            self.reset()
-            return ['reset']
-
-        # Turtle actions
-        elif action in ('get', 'set', 'move', 'step', 'rotate'):
-            id = args[0]
-            turtle = self.getturtle(id)
-            return turtle.handle([action] + args)
-        else:
+    def new_turtle(self, **kwargs):
+        if self.journal is not None:
+            kwargs.setdefault('path', True)
+        return super().new_turtle(**kwargs)
+
+    def _record(self, msg):
+        # Record command in the journal. Snapshots are postponed while
+        # animations are running, since turtles are in intermediate states.
+        journal = self.journal
+        journal.record(msg)
+        busy = self.motion is not None and self.motion.busy
+        if journal.snapshot_due() and not busy:
+            journal.snapshot(self)
+
+    def _dispatch(self, msg):
+        action, *args = msg
+        if args and action in self.turtle_actions:
+            turtle = self.getturtle(args[0])
+            if action in self.cancel_actions:
+                self._cancel_motions(turtle)
+            return turtle.handle(msg)
+        try:
+            method = getattr(self, self.group_actions[action])
+        except KeyError:
             raise ValueError('invalid action: %r' % action)
+        return method(*args)
+
+    def _handle_batch(self, cmds):
+        handle = self.handle
+        for cmd in cmds:
+            handle(cmd)
+        return None
+
+    def _handle_newturtle(self, kwargs):
+        return ['newturtle', self.new_turtle(**kwargs).id]
+
+    def _handle_newturtles(self, n, kwargs):
+        return ['newturtles', [new.id for new in
+                               self.new_turtles(n, **kwargs)]]
+
+    def _handle_delturtle(self, id):
+        self._cancel_motions(self.getturtle(id))
+        self.remove_turtle(id)
+        return ['delturtle', id]
+
+    def _handle_clear(self, *args):
+        # Old clients send the id of the calling turtle, but clear always
+        # cleans the whole group
+        self._cancel_motions()
+        self.clean()
+        return ['clear']
+
+    def _handle_reset(self):
+        self._cancel_motions()
+        self.reset()
+        return ['reset']
+
+    def _cancel_motions(self, turtle=None):
+        # Drop pending animations of the given turtle or of all turtles
+        if self.motion is not None:
+            self.motion.clear(turtle)
@@ -31,20 +31,49 @@ class TkTurtleState(PropertyState):
     def sethidden(self, value):
         self.turtle.hideturtle() if value else self.turtle.showturtle()
 
+    def getspeed(self):
+        return self.turtle.speed()
+
+    def setspeed(self, value):
+        # Python's turtle treats speeds above 10 as 0 (no animation)
+        self.turtle.speed(min(value, 10))
+
     def __init__(self, *args, **kwargs):
         from turtle import Turtle
 
         self.turtle = Turtle()
+        kwargs.setdefault('speed', self.turtle.speed())
+
+        # Python's turtle draws much slower than the index is updated, so
+        # lines are indexed as they are drawn
+        kwargs.setdefault('index', True)
         super().__init__(*args, **kwargs)
 
     def step(self, step):
+        oldpos = self.pos
         self.turtle.fd(step)
+        if self.drawing:
+            self.record_line(oldpos, self.pos)
 
     def rotate(self, angle):
         self.turtle.lt(angle)
 
     def move(self, pos):
+        oldpos = self.pos
         self.turtle.goto(*pos)
+        if self.drawing:
+            self.record_line(oldpos, self.pos)
+
+    def erase_lines(self, n):
+        # Undo turtle actions until n lines are removed. Other actions undone
+        # on the way, such as rotations, are restored by the undo history.
+        turtle = self.turtle
+        buffer = turtle.undobuffer
+        while n > 0 and turtle.undobufferentries():
+            action = buffer.buffer[buffer.ptr]
+            if action[0] == 'go' and action[3][0]:
+                n -= 1
+            turtle.undo()
 
 
 # The tk turtle class
@@ -1,6 +1,7 @@
 from colortools import Color
 from lazyutils import lazy
 
+from .history import History, undoable
 from .utils import vecargsmethod
 from ..math import Vec
 
@@ -12,6 +13,10 @@ class Turtle:
 
     _state_factory = None
 
+    #: Maximum number of operations that can be undone. None disables the
+    #: undo history.
+    history_size = 1000
+
     @lazy
     def _state(self):
         if self._state_factory is None:
@@ -19,6 +24,12 @@ class Turtle:
                                'attribute')
         return self._state_factory(**self._args)
 
+    @lazy
+    def _history(self):
+        if not self.history_size:
+            return None
+        return History(self._state, maxlen=self.history_size)
+
     def __init__(self, pos=None, heading=0.0, *, drawing=True,
                  color='black', fillcolor='black', width=2, hidden=False):
         self._args = dict(
@@ -35,6 +46,7 @@ class Turtle:
         """
         return self._state.pos
 
+    @undoable
     @vecargsmethod
     def setpos(self, value):
         """
@@ -51,6 +63,7 @@ class Turtle:
         """
         return self._state.heading
 
+    @undoable
     def setheading(self, value):
         """
         Sets turtle's heading (in degrees).
@@ -63,6 +76,7 @@ class Turtle:
         """
         return self._state.width
 
+    @undoable
     def setwidth(self, value):
         """
         Modifies the pen width (in pixels)
@@ -75,6 +89,7 @@ class Turtle:
         """
         return Color(self._state.color)
 
+    @undoable
     def setcolor(self, value):
         """
         Modifies the pen color.
@@ -90,6 +105,7 @@ class Turtle:
         """
         return Color(self._state.fillcolor)
 
+    @undoable
     def setfillcolor(self, value):
         """
         Modifies the fill color.
@@ -105,12 +121,31 @@ class Turtle:
         """
         return self._state.avatar
 
+    @undoable
     def setavatar(self, value):
         """
         Modifies the turtle avatar.
         """
         self._state.avatar = value
 
+    def getspeed(self):
+        """
+        Return the animation speed of the turtle.
+        """
+        return self._state.speed
+
+    def setspeed(self, value):
+        """
+        Modifies the animation speed.
+
+        Speed goes from 1 (slowest) to 10 (fast). Larger values are also
+        accepted. A speed of 0 disables animations and draws immediately.
+        """
+        if value < 0:
+            raise ValueError('speed must be non-negative, got %r' % value)
+        self._state.speed = value
+
+    @undoable
     def penup(self):
         """
         Raises the turtle pen so it stops drawing.
@@ -119,6 +154,7 @@ class Turtle:
         """
         self._state.drawing = False
 
+    @undoable
     def pendown(self):
         """
         Lower the turtle pen so it can draw in the screen.
@@ -145,12 +181,14 @@ class Turtle:
         """
         return self._state.hidden
 
+    @undoable
     def hide(self):
         """
         Hide turtle.
         """
         self._state.hidden = True
 
+    @undoable
     def show(self):
         """
         Shows a hidden turtle.
@@ -160,15 +198,22 @@ class Turtle:
     def clean(self):
         """
         Clear all drawings made by turtle.
+
+        Operations before cleaning cannot be undone.
         """
         self._state.clean()
+        if self._history is not None:
+            self._history.clear()
 
     def reset(self):
         """
         Clear all drawings and reset turtle to initial position.
         """
         self._state.reset()
+        if self._history is not None:
+            self._history.clear()
 
+    @undoable
     @vecargsmethod
     def goto(self, pos):
         """
@@ -176,8 +221,9 @@ class Turtle:
 
         If the pen is down, it draws a line.
         """
-        self._state.goto(pos)
+        self._state.move(pos)
 
+    @undoable
     @vecargsmethod
     def jump(self, pos):
         """
@@ -186,6 +232,7 @@ class Turtle:
         """
         self._state.pos = pos + self._state.pos
 
+    @undoable
     def forward(self, step):
         """
         Move the turtle forward by the given step size (in pixels).
@@ -194,6 +241,7 @@ class Turtle:
         """
         self._state.step(step)
 
+    @undoable
     def backward(self, step):
         """
         Move the turtle backward by the given step size (in pixels).
@@ -202,6 +250,7 @@ class Turtle:
         """
         self.forward(-step)
 
+    @undoable
     def left(self, angle):
         """
         Rotate the turtle counter-clockwise by the given angle.
@@ -212,6 +261,7 @@ class Turtle:
         """
         self._state.rotate(angle)
 
+    @undoable
     def right(self, angle):
         """
         Rotate the turtle clockwise by the given angle.
@@ -223,6 +273,53 @@ class Turtle:
         """
         self.left(-angle)
 
+    def undo(self, n=1):
+        """
+        Undo the last n operations, erasing the lines they drew.
+
+        Return the number of operations that were undone.
+        """
+        return self._undo_history().undo(n)
+
+    def redo(self, n=1):
+        """
+        Redo the last n undone operations.
+
+        Return the number of operations that were redone.
+        """
+        return self._undo_history().redo(n)
+
+    def _undo_history(self):
+        if self._history is None:
+            raise RuntimeError('undo history is disabled for this turtle')
+        return self._history
+
+    def query_point(self, pos, radius=1.0):
+        """
+        Return a list with all lines drawn by the turtle that pass at a
+        distance of at most radius from the given position.
+
+        Each line is returned as a pair of (x, y) vectors.
+        """
+        return self._spatial_index().query_point(pos, radius)
+
+    def query_rect(self, pos1, pos2):
+        """
+        Return a list with all lines drawn by the turtle that cross the
+        rectangle with opposite corners at pos1 and pos2.
+        """
+        return self._spatial_index().query_rect(pos1, pos2)
+
+    def intersects(self, pos1, pos2):
+        """
+        Return True if the segment from pos1 to pos2 touches any line drawn by
+        the turtle.
+        """
+        return bool(self._spatial_index().intersects(pos1, pos2))
+
+    def _spatial_index(self):
+        return self._state.spatial_index()
+
     # Aliases
     fd = forward
     bk = back = backward
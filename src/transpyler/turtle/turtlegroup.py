@@ -1,7 +1,12 @@
 import collections
+from array import array
+from itertools import compress, repeat
+from numbers import Number
+from operator import add, mul, sub
 
+from .path import PathStore, RECORD_SIZE
 from .utils import vecargsmethod
-from ..math import Vec
+from ..math import Vec, cos, sin
 
 
 class TurtleGroup(collections.MutableSequence):
@@ -36,7 +41,7 @@ class TurtleGroup(collections.MutableSequence):
         return self._data.__setitem__(i, v)
 
     def insert(self, i, v):
-        return self.insert(i, v)
+        return self._data.insert(i, v)
 
     @vecargsmethod
     def setpos(self, value):
@@ -195,3 +200,255 @@ class TurtleGroup(collections.MutableSequence):
     rt = right
     pu = penup
     pd = pendown
+
+
+class VectorTurtleGroup:
+    """
+    A synchronized group of turtles stored as parallel arrays.
+
+    Instead of a list of turtle objects, the group keeps columns with the
+    positions, headings, pen state, colors and widths of all members.
+    Commands are applied to all turtles with a few operations over whole
+    columns and the resulting segments are appended to the .path
+    :class:`transpyler.turtle.path.PathStore` in a single call. This makes
+    simulations with thousands of turtles fast enough to run in real time.
+
+    Arguments of forward, left, goto, etc can be a single value, which is
+    applied to all turtles, or a sequence with one value per turtle.
+
+    Example::
+
+        group = VectorTurtleGroup(100)
+        group.left(list(range(0, 360, 36)) * 10)
+        group.forward(50)
+    """
+
+    def __init__(self, size=0, pos=(0, 0), heading=0.0, drawing=True,
+                 color='black', width=1, path=None):
+        self.path = PathStore() if path is None else path
+        self.x = array('d')
+        self.y = array('d')
+        self.heading = array('d')
+        self.drawing = bytearray()
+        self.color = array('d')
+        self.width = array('d')
+        self._directions = None
+        self._rotation = 0.0
+        if size:
+            self.add(size, pos, heading, drawing, color, width)
+
+    def __repr__(self):
+        return '<VectorTurtleGroup: %s turtles>' % len(self)
+
+    def __len__(self):
+        return len(self.x)
+
+    def add(self, size=1, pos=(0, 0), heading=0.0, drawing=True,
+            color='black', width=1):
+        """
+        Add new turtles to the group.
+
+        Return a range with the indexes of the new turtles.
+        """
+
+        start = len(self)
+        x, y = pos
+        self.x.extend(repeat(x, size))
+        self.y.extend(repeat(y, size))
+        self.heading.extend(repeat(heading, size))
+        self.drawing.extend(repeat(bool(drawing), size))
+        self.color.extend(repeat(self.path.pack_color(color), size))
+        self.width.extend(repeat(width, size))
+        self._directions = None
+        return range(start, start + size)
+
+    def positions(self):
+        """
+        Return a list with the positions of all turtles.
+        """
+        return list(map(Vec, self.x, self.y))
+
+    def headings(self):
+        """
+        Return a list with the headings of all turtles.
+        """
+        return list(self.heading)
+
+    def setheading(self, value):
+        """
+        Set the heading of all turtles (in degrees).
+        """
+        self.heading = self._column(value)
+        self._directions = None
+
+    def setcolor(self, value):
+        """
+        Modifies the pen color of all turtles.
+        """
+        self.color = array('d', repeat(self.path.pack_color(value), len(self)))
+
+    def setwidth(self, value):
+        """
+        Modifies the pen width of all turtles.
+        """
+        self.width = self._column(value)
+
+    def penup(self):
+        """
+        Raises the pen of all turtles.
+        """
+        self.drawing = bytearray(len(self))
+
+    def pendown(self):
+        """
+        Lower the pen of all turtles.
+        """
+        self.drawing = bytearray(b'\x01' * len(self))
+
+    def isdown(self):
+        """
+        Return True if all turtles are drawing.
+        """
+        return self.drawing.count(0) == 0
+
+    def forward(self, step):
+        """
+        Move all turtles forward by the given step size (in pixels).
+        """
+
+        cos_h, sin_h = self._get_directions()
+        if isinstance(step, Number):
+            step = repeat(step)
+        else:
+            step = self._column(step)
+        x = array('d', map(add, self.x, map(mul, cos_h, step)))
+        y = array('d', map(add, self.y, map(mul, sin_h, step)))
+        self._move(x, y)
+
+    def backward(self, step):
+        """
+        Move all turtles backward by the given step size (in pixels).
+        """
+
+        if isinstance(step, Number):
+            self.forward(-step)
+        else:
+            self.forward([-x for x in step])
+
+    def left(self, angle):
+        """
+        Rotate all turtles counter-clockwise by the given angle.
+        """
+
+        if isinstance(angle, Number):
+            # Cached directions are rotated when they are needed again
+            self.heading = array('d', map(add, self.heading, repeat(angle)))
+            self._rotation += angle
+        else:
+            angle = self._column(angle)
+            self.heading = array('d', map(add, self.heading, angle))
+            self._directions = None
+
+    def right(self, angle):
+        """
+        Rotate all turtles clockwise by the given angle.
+        """
+
+        if isinstance(angle, Number):
+            self.left(-angle)
+        else:
+            self.left([-x for x in angle])
+
+    def goto(self, pos):
+        """
+        Move turtles to the given position, drawing lines if the pen is down.
+
+        Pos can be a single (x, y) pair or a sequence of positions, one for
+        each turtle.
+        """
+        self._move(*self._positions(pos))
+
+    def jump(self, pos):
+        """
+        Move turtles by the given displacement without drawing.
+        """
+
+        dx, dy = self._positions(pos)
+        self.x = array('d', map(add, self.x, dx))
+        self.y = array('d', map(add, self.y, dy))
+
+    def clean(self):
+        """
+        Clear all drawings.
+        """
+        self.path.clear()
+
+    # Aliases
+    fd = forward
+    bk = back = backward
+    lt = left
+    rt = right
+    pu = penup
+    pd = pendown
+
+    #
+    # Auxiliary methods
+    #
+    def _column(self, values):
+        # Return an array with one double for each turtle
+        size = len(self)
+        if isinstance(values, Number):
+            return array('d', repeat(values, size))
+        values = array('d', values)
+        if len(values) != size:
+            raise ValueError('expected %s values, got %s'
+                             % (size, len(values)))
+        return values
+
+    def _positions(self, pos):
+        # Return (xs, ys) arrays from a single position or a list of positions
+        size = len(self)
+        if len(pos) == 2 and isinstance(pos[0], Number):
+            x, y = pos
+            return array('d', repeat(x, size)), array('d', repeat(y, size))
+        if len(pos) != size:
+            raise ValueError('expected %s positions, got %s'
+                             % (size, len(pos)))
+        return (array('d', [p[0] for p in pos]),
+                array('d', [p[1] for p in pos]))
+
+    def _get_directions(self):
+        # Cosines and sines of headings are cached. When all turtles rotated
+        # by the same angle, the cached vectors are rotated instead of
+        # computing all cosines again.
+        if self._directions is None:
+            self._directions = (array('d', map(cos, self.heading)),
+                                array('d', map(sin, self.heading)))
+        elif self._rotation % 360:
+            c, s = cos(self._rotation), sin(self._rotation)
+            cos_h, sin_h = self._directions
+            self._directions = (
+                array('d', map(sub, map(mul, cos_h, repeat(c)),
+                               map(mul, sin_h, repeat(s)))),
+                array('d', map(add, map(mul, cos_h, repeat(s)),
+                               map(mul, sin_h, repeat(c)))),
+            )
+        self._rotation = 0.0
+        return self._directions
+
+    def _move(self, x, y):
+        # Move all turtles to new positions and record segments of turtles
+        # that are drawing
+        drawing = self.drawing
+        count = len(drawing) - drawing.count(0)
+        if count:
+            columns = [self.x, self.y, x, y, self.color, self.width]
+            if count != len(drawing):
+                columns = [array('d', compress(col, drawing))
+                           for col in columns]
+            records = array('d', bytes(8 * RECORD_SIZE * count))
+            for i, col in enumerate(columns):
+                records[i::RECORD_SIZE] = col
+            self.path.extend(records)
+        self.x = x
+        self.y = y
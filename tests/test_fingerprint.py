@@ -0,0 +1,97 @@
+import math
+
+import pytest
+
+from transpyler.turtle.fingerprint import Fingerprint, fingerprint
+from transpyler.turtle.headless import HeadlessStateGroup, \
+    make_turtle_namespace
+from transpyler.turtle.path import PathStore
+
+
+def square(x=0, y=0, size=100):
+    return [(x, y, x + size, y, 0, 1),
+            (x + size, y, x + size, y + size, 0, 1),
+            (x + size, y + size, x, y + size, 0, 1),
+            (x, y + size, x, y, 0, 1)]
+
+
+def test_order_and_direction_do_not_matter():
+    segments = square()
+    reversed_segments = [(x1, y1, x0, y0, c, w)
+                         for x0, y0, x1, y1, c, w in reversed(segments)]
+    assert fingerprint(segments) == fingerprint(reversed_segments)
+    assert fingerprint(segments) != fingerprint(square(size=101))
+
+
+@pytest.mark.parametrize('sides, size, start, rotation', [
+    (6, 100, (0, 0), 0.0),
+    (10, 200, (0, 0), 0.1),
+    (10, 200, (12.5, -7.25), 0.3),
+])
+def test_direction_does_not_matter_in_polygons(sides, size, start, rotation):
+    segments = []
+    x, y = start
+    for i in range(sides):
+        angle = 2 * math.pi * i / sides + rotation
+        x1, y1 = x + size * math.cos(angle), y + size * math.sin(angle)
+        segments.append((x, y, x1, y1, 0, 1))
+        x, y = x1, y1
+    swapped = [(x1, y1, x0, y0, c, w) for x0, y0, x1, y1, c, w in segments]
+    assert fingerprint(segments) == fingerprint(swapped)
+
+
+def test_collinear_segments_are_merged():
+    split = [(0, 0, 60, 0, 0, 1), (40, 0, 100, 0, 0, 1), (100, 0, 50, 0, 0, 1)]
+    fp = fingerprint(split)
+    assert list(fp.segments()) == [((0, 0), (100, 0))]
+    assert fp == fingerprint([(100, 0, 0, 0, 0, 1)])
+    assert fp.length() == 100
+
+
+def test_floating_point_noise_is_ignored():
+    group = HeadlessStateGroup()
+    ns = make_turtle_namespace(group)
+    for _ in range(4):
+        ns['forward'](100)
+        ns['left'](90)
+    fp = group.fingerprint()
+    assert fp == fingerprint(square())
+    assert fp == Fingerprint(PathStore(square()))
+
+
+def test_tolerance():
+    ref = fingerprint(square())
+    almost = fingerprint(square()[:3] + [(0, 100, 0, 2, 0, 1)])
+    assert ref != almost
+    assert ref.difference(almost) == 2
+    assert ref.matches(almost, tolerance=0.01)
+    assert not ref.matches(almost, tolerance=0.001)
+
+
+def test_pen_option():
+    red = [(0, 0, 10, 0, 0xff0000ff, 1)]
+    blue = [(0, 0, 10, 0, 0x0000ffff, 1)]
+    assert fingerprint(red) == fingerprint(blue)
+    assert fingerprint(red, pen=True) != fingerprint(blue, pen=True)
+
+
+def test_shifts_across_rounding_boundaries_match():
+    ref = fingerprint(square())
+    shifted = fingerprint(square(0.0006, 0.0006))
+    assert ref != shifted
+    assert ref.difference(shifted) < 0.01
+    assert ref.matches(shifted, tolerance=0.05)
+
+    below = fingerprint([(0, 0.0004999999, 20, 0.0004999999, 0, 1)])
+    above = fingerprint([(0, 0.0005000001, 20, 0.0005000001, 0, 1)])
+    assert below != above
+    assert below.difference(above) == 0
+    assert below.matches(above, tolerance=0.001)
+
+
+def test_angles_match_across_half_turn():
+    down = fingerprint([(0, 0, 100, -0.00005, 0, 1)])
+    up = fingerprint([(0, 0, 100, 0.00005, 0, 1)])
+    assert down != up
+    assert down.difference(up) == up.difference(down) == 0
+    assert down.matches(up)
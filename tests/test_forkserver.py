@@ -0,0 +1,63 @@
+import io
+import os
+import tempfile
+import threading
+
+import pytest
+
+from transpyler import Transpyler
+from transpyler.forkserver import ForkServer, ForkServerError, submit
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires os.fork()')
+class TestForkServer:
+    @pytest.yield_fixture(scope='class')
+    def server(self):
+        class PyBr(Transpyler):
+            translations = {
+                'para': 'for',
+                'em': 'in',
+                ('para', 'cada'): 'for',
+            }
+            lang = 'pt_BR'
+
+        if hasattr(Transpyler, '_instance'):
+            del Transpyler._instance
+
+        address = os.path.join(tempfile.mkdtemp(), 'transpyler.sock')
+        server = ForkServer(address, PyBr())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+        del Transpyler._instance
+
+    @pytest.fixture
+    def address(self, server):
+        return server.server_address
+
+    def test_warmup_builds_the_namespace(self, server):
+        transpyler = server.transpyler
+        assert 'namespace' in transpyler.__dict__
+        assert 'completion_index' in transpyler.introspection.__dict__
+
+    def test_exec_streams_stdout(self, address):
+        out = io.StringIO()
+        src = 'para cada i em [1, 2]:\n    mostre(i)'
+        assert submit(address, src, stdout=out, timeout=5) is None
+        assert out.getvalue() == '1\n2\n'
+
+    def test_eval_returns_repr(self, address):
+        assert submit(address, '1 + 1', mode='eval', timeout=5) == '2'
+        assert submit(address, 'raiz(4)', mode='eval', timeout=5) == '2.0'
+
+    def test_jobs_do_not_leak_state(self, address):
+        submit(address, 'import transpyler; transpyler.leak = 42', timeout=5)
+        src = 'hasattr(__import__("transpyler"), "leak")'
+        assert submit(address, src, mode='eval', timeout=5) == 'False'
+
+    def test_errors_are_reported(self, address):
+        with pytest.raises(ForkServerError) as exc:
+            submit(address, 'undefined_name', mode='eval', timeout=5)
+        assert exc.value.type == 'NameError'
@@ -1,6 +1,8 @@
 import pytest
 
 from transpyler import Transpyler
+from transpyler.completion import CompletionIndex
+from transpyler.console import TranspylerConsole
 
 
 class TestInstrospections:
@@ -30,3 +32,67 @@ class TestInstrospections:
         assert 'alert' in intro.all_builtins
         assert not intro.all_submodules
         assert {'para', 'cada', 'em'}.issubset(intro.all_keywords)
+
+    def test_category_lookups(self, transpyler):
+        intro = transpyler.introspection
+
+        assert intro.category('para') == 'keyword'
+        assert intro.category('cos') == 'function'
+        assert intro.category('int') == 'type'
+        assert intro.category('ValueError') == 'exception'
+        assert intro.category('True') == 'constant'
+        assert intro.category('not_a_name') is None
+        assert 'cos' in intro
+        assert 'not_a_name' not in intro
+
+    def test_invalidate_on_recreate_namespace(self, transpyler):
+        intro = transpyler.introspection
+        assert 'my_function' not in intro.functions
+
+        transpyler.init({'my_function': lambda: None})
+        assert 'my_function' in intro.functions
+        assert intro.category('my_function') == 'function'
+
+        transpyler.recreate_namespace()
+        assert 'my_function' not in intro.all_functions
+        assert intro.category('my_function') is None
+
+    def test_complete(self, transpyler):
+        intro = transpyler.introspection
+
+        assert intro.complete('par') == ['para']
+        assert 'raiz' in intro.complete('rai')
+        assert 'mostre' in intro.complete('most')
+        assert 'isinstance' in intro.complete('isins')
+        assert intro.complete('xyzzy') == []
+
+    def test_console_completes_user_names_only(self, transpyler):
+        console = TranspylerConsole(transpyler=transpyler,
+                                    locals={'leitura': 1})
+        matches = []
+        while console.complete('lei', len(matches)) is not None:
+            matches.append(console.complete('lei', len(matches)))
+        assert 'leia_número' in matches
+        assert 'leitura' in matches
+        assert 'leia_numero' not in matches
+
+
+class TestCompletionIndex:
+    def test_accent_insensitive_prefix_search(self):
+        index = CompletionIndex(['faça', 'faca', 'fatorial', 'para', 'pare'])
+
+        assert index.complete('fa') == ['faça', 'fatorial']
+        assert index.complete('fac') == ['faça']
+        assert index.complete('faç') == ['faça']
+        assert index.complete('par') == ['para', 'pare']
+        assert index.complete('par', limit=1) == ['para']
+        assert index.complete('z') == []
+
+    def test_non_latin_names_are_not_transliterated(self):
+        index = CompletionIndex(['각도', 'game', 'gather', '가다'])
+        assert index.complete('가') == ['가다', '각도']
+        assert index.complete('ga') == ['game', 'gather']
+
+    def test_unaccented_names_are_kept_if_alone(self):
+        index = CompletionIndex(['faca'])
+        assert index.complete('fa') == ['faca']
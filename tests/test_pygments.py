@@ -0,0 +1,79 @@
+import pytest
+
+from transpyler import Transpyler
+
+pygments = pytest.importorskip('pygments')
+from pygments.token import Keyword, Name, Punctuation  # noqa: E402
+from transpyler.pygments import LEXER_CACHE, lexer_cache_key, \
+    transpyler_lexer_factory, transpyler_token_lexer_factory, \
+    benchmark  # noqa: E402
+
+
+class TestPygmentsLexer:
+    @pytest.yield_fixture(scope='class')
+    def transpyler(self):
+        class PyBr(Transpyler):
+            translations = {
+                'para': 'for',
+                'em': 'in',
+                ('para', 'cada'): 'for',
+            }
+            lang = 'pt_BR'
+
+        if hasattr(Transpyler, '_instance'):
+            del Transpyler._instance
+        yield PyBr()
+        del Transpyler._instance
+
+    def test_lexer_highlights_keywords_and_builtins(self, transpyler):
+        lexer = transpyler_lexer_factory(transpyler)()
+        tokens = [(tt, v) for (tt, v) in lexer.get_tokens('para x em y: mostre(x)')]
+        assert (Keyword, 'para') in tokens
+        assert (Keyword, 'em') in tokens
+        assert (Name.Builtin, 'mostre') in tokens
+
+    def test_lexer_classes_are_cached(self, transpyler):
+        cls = transpyler_lexer_factory(transpyler)
+        assert transpyler_lexer_factory(transpyler) is cls
+        assert '_tokens' in cls.__dict__
+
+    def test_lexer_patterns_are_persisted(self, transpyler, tmpdir):
+        key = lexer_cache_key(transpyler)
+        LEXER_CACHE.pop(key, None)
+        cls = transpyler_lexer_factory(transpyler, cache_dir=str(tmpdir))
+        files = tmpdir.listdir()
+        assert len(files) == 1
+
+        LEXER_CACHE.pop(key, None)
+        new = transpyler_lexer_factory(transpyler, cache_dir=str(tmpdir))
+        assert new is not cls
+        assert list(new().get_tokens('para')) == list(cls().get_tokens('para'))
+
+    def test_token_lexer_highlights_sequences(self, transpyler):
+        lexer = transpyler_token_lexer_factory(transpyler)()
+        src = 'para cada x em y: mostre(x)\n'
+        tokens = [(tt, v) for (tt, v) in lexer.get_tokens(src)]
+        assert (Keyword, 'para') in tokens
+        assert (Keyword, 'cada') in tokens
+        assert (Keyword, 'em') in tokens
+        assert (Name.Builtin, 'mostre') in tokens
+        assert (Punctuation, ':') in tokens
+        assert (Name, 'x') in tokens
+
+    def test_token_lexer_preserves_source(self, transpyler):
+        lexer = transpyler_token_lexer_factory(transpyler)()
+        src = 'def f(x):\n    return x  # comment\n\n"unfinished\n'
+        assert ''.join(v for _, v in lexer.get_tokens(src)) == src
+
+    def test_token_lexer_only_breaks_lines_at_newlines(self, transpyler):
+        lexer = transpyler_token_lexer_factory(transpyler)()
+        src = '# a\x0cb\nmostre(1)\n'
+        tokens = list(lexer.get_tokens(src))
+        assert ''.join(v for _, v in tokens) == src
+        assert (Name.Builtin, 'mostre') in tokens
+
+    def test_benchmark_compares_both_lexers(self, transpyler):
+        result = benchmark(transpyler, 'para cada x em y: mostre(x)\n' * 10,
+                           repeat=1)
+        assert set(result) == {'regex', 'token'}
+        assert all(t >= 0 for t in result.values())
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+pytest.importorskip('PyQt5')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5 import QtWidgets  # noqa: E402
+
+from transpyler.turtle.qt.state import QGraphicsSceneGroup  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def group(app):
+    return QGraphicsSceneGroup(QtWidgets.QGraphicsScene())
+
+
+def segments(item):
+    path = item.path()
+    return sum(1 for i in range(path.elementCount())
+               if path.elementAt(i).isLineTo())
+
+
+def test_segments_are_merged_in_path_items(group):
+    turtle = group.new_turtle()
+    for _ in range(600):
+        turtle.step(1)
+    assert [segments(item) for item in turtle.lines] == [256, 256, 88]
+
+    turtle.color = (255, 0, 0)
+    turtle.step(1)
+    assert len(turtle.lines) == 4
+    assert segments(turtle.lines[-1]) == 1
+
+
+def test_erase_removes_and_truncates_items(group):
+    turtle = group.new_turtle()
+    for _ in range(300):
+        turtle.step(1)
+    scene_items = len(group.scene.items())
+
+    turtle.erase(50)
+    assert [segments(item) for item in turtle.lines] == [250]
+    assert len(group.scene.items()) == scene_items - 1
+
+    # Truncated items that were full are not extended
+    turtle.step(1)
+    assert [segments(item) for item in turtle.lines] == [250, 1]
+    assert turtle.segments == 251
+
+    turtle.erase(2)
+    assert [segments(item) for item in turtle.lines] == [249]
+
+
+def test_clean_removes_all_items(group):
+    turtle = group.new_turtle()
+    for _ in range(10):
+        turtle.step(1)
+    turtle.clean()
+    assert turtle.lines == []
+    assert group.scene.items() == [turtle.graphics_item]
+
+
+def test_removed_turtles_leave_the_scene(group):
+    turtle = group.new_turtle()
+    other = group.new_turtle()
+    turtle.step(10)
+    other.step(10)
+    group.remove_turtle(turtle.id)
+    assert set(group.scene.items()) == {other.graphics_item} | set(other.lines)
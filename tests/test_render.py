@@ -0,0 +1,81 @@
+import struct
+import zlib
+
+from transpyler import Transpyler
+from transpyler.namespace import turtle_functions
+from transpyler.turtle import render
+from transpyler.turtle.headless import HeadlessStateGroup, \
+    make_turtle_namespace
+from transpyler.turtle.path import PathStore
+
+
+def draw_square(ns, size=100):
+    for _ in range(4):
+        ns['forward'](size)
+        ns['left'](90)
+
+
+def test_headless_namespace_records_drawing():
+    group = HeadlessStateGroup()
+    ns = make_turtle_namespace(group)
+    draw_square(ns)
+    ns['Turtle']().forward(10)
+    assert len(group) == 2
+    assert [len(path) for path in group.paths()] == [4, 1]
+    assert render.bounds(group.paths()) == (0, 0, 100, 100)
+
+
+def test_headless_backend_is_registered():
+    ns = turtle_functions('headless')
+    assert 'forward' in ns
+
+    group = HeadlessStateGroup()
+    ns = turtle_functions('headless', group=group)
+    draw_square(ns)
+    assert [len(path) for path in group.paths()] == [4]
+
+
+def test_transpyler_exposes_the_headless_group():
+    if hasattr(Transpyler, '_instance'):
+        del Transpyler._instance
+    try:
+        transpyler = Transpyler(has_turtle_functions=True,
+                                turtle_backend='headless')
+        draw_square(transpyler.namespace)
+        assert [len(path) for path in transpyler.turtle_group.paths()] == [4]
+    finally:
+        del Transpyler._instance
+
+
+def test_line_runs_round_negative_coordinates_down():
+    assert list(render._line_runs(-0.5, -0.5, 2.5, -0.5)) == [(-1, -1, 2, -1)]
+    assert list(render._line_runs(-1.5, 0.5, -1.5, 2.5)) == [(-2, 0, -2, 2)]
+
+
+def test_svg_merges_connected_segments():
+    group = HeadlessStateGroup()
+    draw_square(make_turtle_namespace(group))
+    svg = group.to_svg(margin=0)
+    assert svg.startswith('<svg')
+    assert svg.count('<polyline') == 1
+    assert 'points="0.00,100.00 100.00,100.00 100.00,0.00 0.00,0.00 ' \
+           '0.00,100.00"' in svg
+
+
+def test_png_output():
+    path = PathStore([(0, 0, 100, 0, 'red', 2)])
+    data = render.to_png(path, size=(50, 20), margin=5)
+    assert data.startswith(b'\x89PNG\r\n\x1a\n')
+    width, height = struct.unpack('>II', data[16:24])
+    assert (width, height) == (50, 20)
+
+    # Horizontal line in the middle of the image
+    pixels = render.rasterize(path, (50, 20), margin=5)
+    assert len(pixels) == 50 * 20 * 3
+    mid = 3 * (10 * 50 + 25)
+    assert pixels[mid:mid + 3] == b'\xff\x00\x00'
+    assert pixels[:3] == b'\xff\xff\xff'
+
+    start = data.index(b'IDAT') + 4
+    raw = zlib.decompress(data[start:])
+    assert len(raw) == 20 * (1 + 50 * 3)
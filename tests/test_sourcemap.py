@@ -0,0 +1,87 @@
+import sys
+
+import pytest
+
+from transpyler import Transpyler
+from transpyler.console import TranspylerConsole
+from transpyler.sourcemap import SourceMap
+
+
+class TestSourceMap:
+    @pytest.yield_fixture(scope='class')
+    def transpyler(self):
+        class PyBr(Transpyler):
+            translations = {
+                'para': 'for',
+                'em': 'in',
+                ('para', 'cada'): 'for',
+                ('faça', ':'): ':',
+            }
+            lang = 'pt_BR'
+
+        if hasattr(Transpyler, '_instance'):
+            del Transpyler._instance
+        yield PyBr()
+        del Transpyler._instance
+
+    @pytest.fixture
+    def src(self):
+        return (
+            'x = 1\n'
+            'para cada i em [1, 2, 3] faça:\n'
+            '    x = x +* i\n'
+        )
+
+    def test_segments_roundtrip(self):
+        segments = [(1, 0, 1, 0), (1, 4, 1, 9), (3, 2, 2, 2), (3, 5, 3, 0)]
+        smap = SourceMap(segments)
+        assert len(smap) == 4
+        assert list(smap) == segments
+
+    def test_map_positions_after_sequence(self, transpyler, src):
+        py_src, smap = transpyler.lexer.transpile_with_map(src)
+        assert py_src.splitlines()[1] == 'for i in [1, 2, 3] :'
+        assert smap.source_position(2, 4) == (2, 10)
+        assert smap.source_position(2, 13) == (2, 19)
+        assert smap.source_position(3, 4) == (3, 4)
+        assert smap.source_line(2) == 'para cada i em [1, 2, 3] faça:'
+
+    def test_source_lines_only_break_at_newlines(self, transpyler):
+        src = 'x = 1  # \f\x1c\nmostre(x)\n'
+        py_src, smap = transpyler.lexer.transpile_with_map(src)
+        assert smap.source_line(2) == 'mostre(x)'
+
+    def test_syntax_errors_point_to_source(self, transpyler):
+        with pytest.raises(SyntaxError) as info:
+            transpyler.compile('para cada i em [1, 2] faça: +*\n',
+                               '<file>', 'exec')
+        ex = info.value
+        assert ex.lineno == 1
+        assert ex.offset == 30
+        assert ex.text.startswith('para cada')
+
+    @pytest.fixture
+    def excepthook(self, monkeypatch):
+        # The console only remaps tracebacks with the default excepthook,
+        # which pytest plugins may replace
+        monkeypatch.setattr(sys, 'excepthook', sys.__excepthook__)
+
+    def test_console_shows_syntax_errors_in_source(self, transpyler, excepthook):
+        console = TranspylerConsole(transpyler=transpyler)
+        output = []
+        console.write = output.append
+        console.runsource('para cada i em [1, 2] faça: +*\n', symbol='exec')
+        lines = ''.join(output).splitlines()
+        assert lines[-3].strip() == 'para cada i em [1, 2] faça: +*'
+        assert lines[-2].index('^') == lines[-3].index('*')
+
+    def test_console_shows_tracebacks_in_source(self, transpyler, excepthook):
+        console = TranspylerConsole(transpyler=transpyler)
+        output = []
+        console.write = output.append
+        console.runsource('x = 0\npara cada i em [1, 2] faça: x = i / x\n',
+                          symbol='exec')
+        text = ''.join(output)
+        assert 'line 2' in text
+        assert 'para cada i em [1, 2] faça: x = i / x' in text
+        assert text.rstrip().endswith('ZeroDivisionError: division by zero')
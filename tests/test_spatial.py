@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from transpyler.turtle.headless import HeadlessStateGroup, \
+    make_turtle_namespace
+from transpyler.turtle.spatial import SegmentIndex
+from transpyler.turtle.state import TurtleState
+
+
+@pytest.fixture
+def index():
+    index = SegmentIndex(cell_size=10)
+    index.add((0, 0), (100, 0))
+    index.add((100, 0), (100, 100))
+    index.add((0, 0), (100, 100))
+    return index
+
+
+def test_query_point(index):
+    assert index.query_point((50, 1), radius=2) == [((0, 0), (100, 0))]
+    assert len(index.query_point((100, 0), radius=0)) == 2
+    assert index.query_point((50, 20), radius=5) == []
+
+
+def test_query_rect(index):
+    assert index.query_rect((90, 40), (110, 60)) == [((100, 0), (100, 100))]
+    assert len(index.query_rect((-1000, -1000), (1000, 1000))) == 3
+    assert index.query_rect((10, 60), (30, 80)) == []
+
+
+def test_intersects(index):
+    assert index.intersects((50, -10), (50, 10)) == [((0, 0), (100, 0))]
+    assert len(index.intersects((0, 0), (0, 10))) == 2
+    assert index.intersects((0, 10), (40, 90)) == []
+
+    # Collinear overlap
+    assert index.intersects((-10, 0), (10, 0)) == [((0, 0), (100, 0)),
+                                                   ((0, 0), (100, 100))]
+
+
+def test_queries_match_brute_force():
+    rng = random.Random(0)
+    index = SegmentIndex(cell_size=25)
+    segments = []
+    for _ in range(200):
+        v1 = (rng.uniform(-200, 200), rng.uniform(-200, 200))
+        v2 = (v1[0] + rng.uniform(-50, 50), v1[1] + rng.uniform(-50, 50))
+        index.add(v1, v2)
+        segments.append((v1, v2))
+
+    brute = SegmentIndex(cell_size=1e6)
+    for v1, v2 in segments:
+        brute.add(v1, v2)
+    for _ in range(50):
+        x, y = rng.uniform(-200, 200), rng.uniform(-200, 200)
+        assert index.query_point((x, y), 15) == brute.query_point((x, y), 15)
+        assert (index.query_rect((x, y), (x + 40, y + 30)) ==
+                brute.query_rect((x, y), (x + 40, y + 30)))
+        assert (index.intersects((x, y), (-y, x)) ==
+                brute.intersects((x, y), (-y, x)))
+
+
+def test_long_segments_do_not_fill_the_grid():
+    index = SegmentIndex(cell_size=10, max_cells=8)
+    index.add((0, 0), (1e9, 0))
+    index.add((50, -5), (50, 5))
+    assert repr(index) == '<SegmentIndex: 2 segments in 2 cells>'
+
+    assert index.query_point((5e8, 0)) == [((0, 0), (1e9, 0))]
+    assert len(index.query_rect((45, -1), (55, 1))) == 2
+    assert index.intersects((1e6, -1), (1e6, 1)) == [((0, 0), (1e9, 0))]
+    assert len(index.intersects((-1e9, 1), (1e9, 1))) == 1
+
+    index.truncate(0)
+    assert len(index) == 0
+    assert index.query_point((5e8, 0)) == []
+
+
+def test_state_builds_index_on_first_query():
+    state = TurtleState(path=True)
+    state.step(10)
+    assert state.index is None
+    assert state.spatial_index().query_point((5, 0)) == [((0, 0), (10, 0))]
+    state.step(10)
+    assert len(state.index) == 2
+
+    # States that do not record their lines cannot be queried
+    with pytest.raises(RuntimeError):
+        TurtleState().spatial_index()
+
+
+def test_turtle_namespace_queries():
+    ns = make_turtle_namespace(HeadlessStateGroup())
+    ns['forward'](100)
+    ns['left'](90)
+    ns['forward'](100)
+    assert ns['query_point']((100, 50)) == [((100, 0), (100, 100))]
+    assert len(ns['query_rect']((0, -10), (200, 10))) == 2
+    assert ns['intersects']((50, -50), (50, 50))
+    assert not ns['intersects']((50, 10), (90, 90))
+    ns['clean']()
+    assert not ns['intersects']((50, -50), (50, 50))
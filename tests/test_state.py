@@ -1,6 +1,18 @@
+from queue import Queue
+
 import pytest
 
-from transpyler.turtle.state import TurtleState
+from colortools import Color
+
+from transpyler.turtle import shm, wire
+from transpyler.turtle.headless import HeadlessTurtleState
+from transpyler.turtle.history import History
+from transpyler.turtle.journal import Journal
+from transpyler.turtle.motion import MotionScheduler
+from transpyler.turtle.path import PathStore, pack_color
+from transpyler.turtle.state import TurtleState, MailboxState, \
+    MailboxMirrorState
+from transpyler.turtle.stategroup import IpcStateGroup, StateGroup
 
 @pytest.fixture
 def turtle_state():
@@ -48,4 +60,499 @@ def test_move(turtle_state):
 
 
 
-        
\ No newline at end of file
+        
+
+def test_path_store_records_lines():
+    state = TurtleState(path=True, color='red', width=2)
+    state.step(10)
+    state.rotate(90)
+    state.step(10)
+    state.drawing = False
+    state.step(10)
+    assert len(state.path) == 2
+    x0, y0, x1, y1, color, width = state.path[1]
+    assert (x0, y0) == (10, 0)
+    assert abs(x1 - 10) < 1e-9 and abs(y1 - 10) < 1e-9
+    assert color == pack_color('red')
+    assert width == 2
+    state.clean()
+    assert len(state.path) == 0
+
+
+def test_path_and_index_can_be_disabled():
+    state = TurtleState(path=False, index=False)
+    state.record_line((0, 0), (10, 0))
+    assert state.path is None and state.index is None
+    assert state.segments == 1
+
+    path = PathStore()
+    assert TurtleState(path=path).path is path
+
+
+def test_path_store_bulk_export():
+    path = PathStore([(0, 0, 1, 1, 'black', 1)] * 3)
+    path.append((1, 1), (2, 2), 'white')
+    assert len(path) == 4
+    assert path.nbytes == 4 * 6 * 8
+
+    other = PathStore.frombytes(path.tobytes())
+    assert other == path
+    other.extend(path)
+    assert len(other) == 8
+
+    v1, v2, color, width = list(path.lines())[-1]
+    assert (v1, v2, color) == ((1, 1), (2, 2), Color('white'))
+    path.clear()
+    assert path.tolist() == []
+
+
+def receive(queue, timeout=None):
+    # Read message sent by a MailboxState, decoding the wire format
+    msg = queue.get(timeout=timeout) if timeout else queue.get_nowait()
+    return wire.decode(msg) if isinstance(msg, bytes) else msg
+
+
+def test_mailbox_state_batches_commands():
+    inbox, outbox = Queue(), Queue()
+    inbox.put(['newturtle', 1])
+    state = MailboxState(inbox=inbox, outbox=outbox)
+    state.flush_interval = None
+    assert receive(outbox)[0] == 'newturtle'
+
+    state.step(10)
+    state.rotate(90)
+    state.width = 3
+    assert outbox.empty()
+
+    state.flush()
+    assert receive(outbox) == ['batch', [
+        ['step', 1, 10], ['rotate', 1, 90], ['set', 1, 'width', 3],
+    ]]
+
+    # Synchronous requests flush the buffer first
+    state.step(10)
+    inbox.put(['get', 1, 2])
+    assert state.width == 2
+    assert receive(outbox) == ['batch', [['step', 1, 10]]]
+    assert receive(outbox) == ['get', 1, 'width']
+
+
+def test_mailbox_states_share_the_buffer_of_an_outbox():
+    inbox, outbox = Queue(), Queue()
+    inbox.put(['newturtle', 1])
+    inbox.put(['newturtle', 2])
+    a = MailboxState(inbox=inbox, outbox=outbox)
+    b = MailboxState(inbox=inbox, outbox=outbox)
+    a.flush_interval = b.flush_interval = None
+    assert a.mailbox is b.mailbox
+    receive(outbox)
+    receive(outbox)
+
+    a.step(10)
+    b.rotate(90)
+    a.step(20)
+    a.flush()
+    assert receive(outbox) == ['batch', [
+        ['step', 1, 10], ['rotate', 2, 90], ['step', 1, 20],
+    ]]
+    assert outbox.empty()
+
+
+def test_mailbox_flushes_after_interval():
+    inbox, outbox = Queue(), Queue()
+    inbox.put(['newturtle', 1])
+    state = MailboxState(inbox=inbox, outbox=outbox)
+    state.flush_interval = 0.01
+    receive(outbox)
+
+    state.step(10)
+    assert receive(outbox, timeout=1) == ['batch', [['step', 1, 10]]]
+    state.step(20)
+    assert receive(outbox, timeout=1) == ['batch', [['step', 1, 20]]]
+
+
+def test_ipc_state_group_handles_batches():
+    group = IpcStateGroup(inbox=Queue(), outbox=Queue())
+    turtle = group.new_turtle(path=True)
+    group.inbox.put(['batch', [
+        ['step', turtle.id, 10],
+        ['rotate', turtle.id, 90],
+        ['set', turtle.id, 'width', 3],
+    ]])
+    assert group.recv() is None
+    assert group.outbox.empty()
+    assert turtle.pos == (10, 0)
+    assert turtle.heading == 90
+    assert turtle.width == 3
+    assert len(turtle.path) == 1
+
+
+def test_mirror_state_sends_one_message_per_mutation():
+    inbox, outbox = Queue(), Queue()
+    inbox.put(['newturtle', 1])
+    state = MailboxMirrorState(inbox=inbox, outbox=outbox, width=2)
+    state.flush_interval = None
+    receive(outbox)
+
+    state.step(10)
+    state.rotate(90)
+    state.color = 'red'
+    assert state.pos == (10, 0)
+    assert state.heading == 90
+    assert state.width == 2
+    assert outbox.empty()
+
+    state.flush()
+    assert receive(outbox) == ['batch', [
+        ['move', 1, (10, 0)],
+        ['set', 1, 'heading', 90],
+        ['set', 1, 'color', (255, 0, 0, 255)],
+    ]]
+
+    # The server reaches the same state
+    group = IpcStateGroup(inbox=Queue(), outbox=Queue())
+    turtle = group.new_turtle(path=True)
+    group.handle(['batch', [['move', 1, (10, 0)], ['set', 1, 'heading', 90]]])
+    assert turtle.pos == state.pos
+    assert turtle.heading == state.heading
+
+
+def test_mirror_reset_and_clean_only_affect_one_turtle():
+    group = IpcStateGroup(inbox=Queue(), outbox=Queue())
+    group.new_turtle(path=True)
+    group.new_turtle(path=True)
+    inbox = Queue()
+    inbox.put(['newturtle', 1])
+    inbox.put(['newturtle', 2])
+    a = MailboxMirrorState(inbox=inbox, outbox=group.inbox)
+    b = MailboxMirrorState(inbox=inbox, outbox=group.inbox)
+    a.flush_interval = None
+    group.inbox.get_nowait()
+    group.inbox.get_nowait()
+
+    a.step(10)
+    b.step(20)
+    a.reset()
+    a.step(5)
+    b.step(5)
+    a.clean()
+    a.flush()
+    group.drain()
+
+    server_a, server_b = group.getturtle(1), group.getturtle(2)
+    assert server_a.pos == a.pos == (5, 0)
+    assert server_b.pos == b.pos == (25, 0)
+    assert len(server_a.path) == a.segments == 0
+    assert len(server_b.path) == b.segments == 2
+
+
+@pytest.yield_fixture
+def shm_queue():
+    if shm.shared_memory is None:
+        pytest.skip('shared memory is not available')
+    queue = shm.ShmQueue(capacity=256)
+    yield queue
+    queue.unlink()
+
+
+def test_shm_queue_roundtrip(shm_queue):
+    messages = [['step', 1, 10.0], ['move', 2, (1.0, 2.0)],
+                ['newturtle', {'color': 'red'}], ['get', 1, 'pos']]
+    for _ in range(20):  # wraps around the ring buffer several times
+        for msg in messages:
+            shm_queue.put(msg)
+        assert [shm_queue.get_nowait() for _ in messages] == messages
+    assert shm_queue.empty()
+
+
+def test_shm_queue_is_shared_by_name(shm_queue):
+    import pickle
+
+    other = pickle.loads(pickle.dumps(shm_queue))
+    other.put(['rotate', 1, 90.0])
+    assert shm_queue.get(timeout=1) == ['rotate', 1, 90.0]
+    other.close()
+
+
+def test_shm_queue_accepts_several_producer_threads(shm_queue):
+    import threading
+
+    def produce(id):
+        for i in range(200):
+            shm_queue.put(['step', id, float(i)])
+
+    threads = [threading.Thread(target=produce, args=(id,))
+               for id in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    received = [shm_queue.get(timeout=1) for _ in range(800)]
+    for thread in threads:
+        thread.join()
+
+    assert shm_queue.empty()
+    for id in range(1, 5):
+        steps = [msg[2] for msg in received if msg[1] == id]
+        assert steps == [float(i) for i in range(200)]
+
+
+def test_ipc_state_group_drains_with_budget():
+    group = IpcStateGroup(inbox=Queue(), outbox=Queue())
+    turtle = group.new_turtle(path=True)
+    id = turtle.id
+    group.inbox.put(['batch', [['step', id, 1]] * 10])
+    group.inbox.put(['get', id, 'heading'])
+
+    # At least one command per call
+    assert group.drain(0) == 1
+    assert group.backlog_size() == 9
+    assert group.drain() == 10
+    assert turtle.pos == (10, 0)
+    assert group.outbox.get_nowait() == ['get', id, 0.0]
+
+
+def test_ipc_state_group_coalesces_commands():
+    group = IpcStateGroup(inbox=Queue(), outbox=Queue())
+    turtle = group.new_turtle(path=True)
+    id = turtle.id
+    group.inbox.put(['batch', [
+        ['set', id, 'heading', 10],
+        ['set', id, 'heading', 20],
+        ['step', id, 1],
+        ['step', id, 2],
+        ['set', id, 'drawing', False],
+        ['step', id, 3],
+        ['step', id, 4],
+    ]])
+    assert group.drain() == 5
+    assert group.coalesced == 2
+    assert turtle.heading == 20
+    assert len(turtle.path) == 2
+
+
+def test_motion_scheduler_interpolates_steps():
+    turtle = TurtleState(path=True, speed=1)
+    motion = MotionScheduler()
+    assert motion.schedule(turtle, ['step', turtle.id, 100])
+    assert turtle.pos == (0, 0)
+
+    motion.advance(1)
+    assert turtle.pos == (50, 0)
+    assert motion.busy
+    motion.advance(1)
+    assert turtle.pos == (100, 0)
+    assert not motion.busy
+
+    # Intermediate segments are merged when the animation ends
+    assert turtle.segments == 1
+    assert list(turtle.path)[0][:4] == (0, 0, 100, 0)
+
+
+def test_motion_scheduler_skips_animation_with_speed_zero():
+    turtle = TurtleState(speed=0)
+    motion = MotionScheduler()
+    assert not motion.schedule(turtle, ['rotate', turtle.id, 90])
+    assert not motion.busy
+
+
+def test_ipc_state_group_waits_for_animations():
+    group = IpcStateGroup(inbox=Queue(), outbox=Queue())
+    group.motion = motion = MotionScheduler()
+    turtle = group.new_turtle(path=True, speed=1)
+    id = turtle.id
+    group.inbox.put(['batch', [['rotate', id, 90], ['step', id, 10]]])
+
+    assert group.drain() == 1
+    assert motion.busy
+    assert group.drain() == 0
+    motion.advance(0.5)
+    assert turtle.heading == 45
+
+    # Pending animations finish when the client waits for a reply
+    group.inbox.put(['get', id, 'pos'])
+    assert group.drain() == 2
+    assert turtle.heading == 90
+    assert turtle.pos == (0, 10)
+    assert group.outbox.get_nowait() == ['get', id, (0, 10)]
+
+
+def test_ipc_state_group_cancels_animations_on_reset():
+    group = IpcStateGroup(inbox=Queue(), outbox=Queue())
+    group.motion = motion = MotionScheduler()
+    a = group.new_turtle(path=True, speed=1)
+    b = group.new_turtle(path=True, speed=1)
+    motion.schedule(a, ['step', a.id, 100])
+    motion.schedule(b, ['step', b.id, 100])
+    motion.advance(0.5)
+
+    group.handle(['reset', b.id])
+    assert len(motion) == 1
+    group.handle(['reset', a.id])
+    assert not motion.busy
+    assert a.pos == (0, 0) and len(a.path) == 0
+
+    motion.schedule(a, ['step', a.id, 100])
+    group.handle(['clear'])
+    assert not motion.busy
+
+
+def test_ipc_state_group_limits_backlog_during_animations():
+    group = IpcStateGroup(inbox=Queue(), outbox=Queue())
+    group.motion = motion = MotionScheduler()
+    group.max_backlog = 10
+    id = group.new_turtle(speed=1).id
+    group.inbox.put(['batch', [['step', id, 10]]])
+    for _ in range(5):
+        group.inbox.put(['batch', [['rotate', id, 1]] * 10])
+
+    assert group.drain() == 1
+    assert motion.busy
+    assert group.backlog_size() == 10
+    assert not group.inbox.empty()
+
+
+def test_undo_erases_animated_moves_on_the_server():
+    group = HeadlessIpcStateGroup(inbox=Queue(), outbox=Queue())
+    group.motion = motion = MotionScheduler()
+    inbox = Queue()
+    inbox.put(['newturtle', 1])
+    state = MailboxMirrorState(inbox=inbox, outbox=group.inbox, speed=1)
+    state.flush_interval = None
+    group.new_turtle(speed=1)
+    group.inbox.get_nowait()
+    history = History(state)
+
+    for step in [100, 50]:
+        with history.record():
+            state.step(step)
+    state.flush()
+    for _ in range(20):
+        group.drain()
+        motion.advance(0.25)
+    server = group.getturtle(1)
+    assert server.pos == (150, 0)
+    assert len(server.path) == state.segments == 2
+
+    history.undo()
+    state.flush()
+    group.drain()
+    assert len(server.path) == state.segments == 1
+    assert list(server.path)[0][:4] == (0, 0, 100, 0)
+
+
+def test_turtles_are_not_animated_by_default():
+    assert TurtleState().speed == 0
+
+
+def test_remote_states_create_and_delete_turtles_in_bulk():
+    group = HeadlessIpcStateGroup(inbox=Queue(), outbox=Queue())
+    inbox = Queue()
+    inbox.put(['newturtle', 1])
+    inbox.put(['newturtles', [2, 3]])
+    state = MailboxMirrorState(inbox=inbox, outbox=group.inbox)
+    state.flush_interval = None
+    a, b = state.new_turtles(2, width=3)
+    assert (a.id, b.id, a.width) == (2, 3, 3)
+    assert a.mailbox is state.mailbox
+    assert inbox.empty()
+
+    a.step(10)
+    a.delete()
+    b.step(20)
+    state.flush()
+    group.drain()
+    assert [turtle.id for turtle in group] == [1, 3]
+    assert group.getturtle(3).pos == (20, 0)
+    assert group.getturtle(3).width == 3
+
+
+def test_state_group_indexes_turtles_by_id():
+    group = StateGroup()
+    a, b, c = group.new_turtles(3)
+    assert [a.id, b.id, c.id] == [1, 2, 3]
+    assert group.getturtle(2) is b
+
+    del group[1]
+    assert list(group) == [a, c]
+    with pytest.raises(ValueError):
+        group.getturtle(2)
+
+    # Ids are not reused by default
+    group.insert(0, TurtleState())
+    assert [t.id for t in group] == [4, 1, 3]
+    assert group.remove_turtle(1) is a
+    assert group.new_turtle().id == 5
+
+
+def test_state_group_reuses_ids():
+    group = StateGroup()
+    group.reuse_ids = True
+    turtles = group.new_turtles(3)
+    group.remove_turtle(2)
+    group.remove_turtle(1)
+    assert group.new_turtle().id == 1
+    assert group.new_turtle().id == 2
+    assert group.new_turtle().id == 4
+    with pytest.raises(ValueError):
+        group.append(turtles[2])
+
+
+class HeadlessIpcStateGroup(IpcStateGroup):
+    state_class = HeadlessTurtleState
+
+
+def test_journal_restores_from_snapshot():
+    group = IpcStateGroup(inbox=Queue(), outbox=Queue())
+    group.journal = journal = Journal(snapshot_interval=5)
+    id = group.handle(['newturtle', {}])[1]
+    group.handle(['batch', [['step', id, 10], ['rotate', id, 90]] * 3])
+    group.handle(['set', id, 'color', 'red'])
+    group.handle(['get', id, 'pos'])
+    assert len(journal) == 8
+    assert journal.tail_size() == 3
+
+    for load in [journal.restore, journal.replay]:
+        view = HeadlessIpcStateGroup(inbox=Queue(), outbox=Queue())
+        load(view)
+        turtle = view.getturtle(id)
+        assert turtle.pos == group.getturtle(id).pos
+        assert turtle.heading == 270
+        assert turtle.color == 'red'
+
+    # Snapshots restore drawings
+    loaded = Journal.frombytes(journal.tobytes())
+    assert loaded.tail_size() == 3
+    view = HeadlessIpcStateGroup(inbox=Queue(), outbox=Queue())
+    loaded.restore(view)
+    assert view.getturtle(id).path == group.getturtle(id).path
+    assert view.new_turtle().id == id + 1
+
+
+def test_journal_keeps_only_the_latest_snapshot():
+    group = HeadlessIpcStateGroup(inbox=Queue(), outbox=Queue())
+    group.journal = journal = Journal(snapshot_interval=10)
+    id = group.handle(['newturtle', {}])[1]
+    group.handle(['set', id, 'color', (255, 0, 0)])
+    for _ in range(200):
+        group.handle(['step', id, 1])
+    assert journal.tail_size() == 2
+
+    # Memory holds the commands and a single snapshot
+    commands = len(journal.data)
+    data = journal.tobytes()
+    assert len(data) == commands + 5 + len(journal.snapshot_data)
+
+    loaded = Journal.frombytes(data)
+    assert loaded.tobytes() == data
+    view = HeadlessIpcStateGroup(inbox=Queue(), outbox=Queue())
+    loaded.restore(view)
+    turtle = view.getturtle(id)
+    assert turtle.path == group.getturtle(id).path
+    assert turtle.color == (255, 0, 0, 255)
+
+
+def test_journal_snapshots_reject_pickled_values():
+    group = HeadlessIpcStateGroup(inbox=Queue(), outbox=Queue())
+    id = group.handle(['newturtle', {}])[1]
+    group.handle(['set', id, 'avatar', object()])
+    with pytest.raises(wire.WireError):
+        Journal().snapshot(group)
@@ -1,9 +1,22 @@
+import os
+import shutil
+import types
+
+import polib
 import pytest
 
 from transpyler import lib
 from tests import mod
 from transpyler.translate import extract_translations, extract_translation, \
-    translate_namespace
+    translate_namespace, make_bundle, load_bundle, L10N_PATH, \
+    create_pot_file, merge_translations, translations_from_po, \
+    compile_bundle, bundle_for
+from transpyler.translate.extract import extract_translations_incremental
+from transpyler.translate.bundle import save_bundle
+from transpyler.translate.translate import translate_namespace_gettext
+from transpyler.utils import extract_namespace
+from transpyler.translate.google_translate import GoogleTranslator, \
+    TranslationCache, translate_entries, untranslated_entries
 
 
 class TestExtractTranslations:
@@ -84,3 +97,225 @@ class TestTranslate:
 
         msg = 'Muestra el objeto o texto proporcionado en la pantalla.'
         assert ns['imprimir'].__doc__.startswith(msg)
+
+
+class TestBundle:
+    @pytest.fixture(scope='class')
+    def namespace(self):
+        ns = extract_namespace(lib)
+        ns.update(extract_namespace(mod))
+
+        def redo(n=1):
+            "A function that is not in the PO files."
+
+        ns['redo'] = redo
+        return ns
+
+    @pytest.fixture(scope='class')
+    def bundle(self, namespace):
+        return make_bundle(os.path.join(L10N_PATH, 'pt_BR.po'), namespace)
+
+    def test_bundle_contains_final_translations(self, bundle):
+        assert bundle['language'] == 'pt_BR'
+        assert bundle['messages']['range'] == 'intervalo'
+        _, translated_name, name, args, doc, synonyms = \
+            bundle['objects']['print']
+        assert translated_name == name == 'mostrar'
+        assert synonyms == ('mostre',)
+        assert doc.startswith('Mostra o objeto ou texto fornecido na tela.')
+        assert bundle['objects']['sqrt'][1:4] == ('raiz', 'raiz', ('x',))
+
+    def test_save_and_load_bundle(self, bundle, tmpdir):
+        path = str(tmpdir.join('pt_BR.bundle'))
+        save_bundle(bundle, path)
+        assert load_bundle(path) == bundle
+        assert load_bundle(str(tmpdir.join('missing.bundle'))) is None
+
+    def test_translate_with_bundle(self, bundle):
+        ns = translate_namespace(vars(mod), 'pt_BR', bundle=bundle)
+        assert set(x for x in ns if not x.startswith('_')) == {
+            'cos', 'coseno', 'mostrar', 'mostre', 'print',
+        }
+
+        msg = 'Mostra o objeto ou texto fornecido na tela.'
+        assert ns['mostre'].__doc__.startswith(msg)
+
+    @pytest.mark.parametrize('lang', ['pt_BR', 'es_BR', 'ko_KR'])
+    def test_bundle_and_gettext_translations_are_equal(self, namespace, lang):
+        bundle = make_bundle(os.path.join(L10N_PATH, lang + '.po'), namespace)
+
+        # A changed object must not use its outdated record
+        def sqrt(x):
+            "Changed docstring."
+
+        namespace = dict(namespace, sqrt=sqrt)
+        expected = translate_namespace_gettext(namespace, lang)
+        result = translate_namespace(namespace, lang, synonyms=False,
+                                     bundle=bundle)
+        assert set(result) == set(expected)
+        for name, obj in expected.items():
+            if isinstance(obj, types.FunctionType):
+                other = result[name]
+                assert other.__name__ == obj.__name__, name
+                assert other.__doc__ == obj.__doc__, name
+                assert other.__code__.co_varnames == \
+                    obj.__code__.co_varnames, name
+            else:
+                assert result[name] is obj, name
+
+    def test_bundle_is_invalidated_when_po_file_changes(self, tmpdir):
+        po_path = str(tmpdir.join('pt_BR.po'))
+        shutil.copy(os.path.join(L10N_PATH, 'pt_BR.po'), po_path)
+        compile_bundle('pt_BR', str(tmpdir))
+        assert bundle_for('pt_BR', str(tmpdir)) is not None
+
+        # Changes are detected even if the modification time is older
+        stat = os.stat(po_path)
+        with open(po_path, 'a', encoding='utf8') as F:
+            F.write('\nmsgid "new"\nmsgstr "novo"\n')
+        os.utime(po_path, (stat.st_atime, stat.st_mtime - 60))
+        assert bundle_for('pt_BR', str(tmpdir)) is None
+
+
+class TestAutoTranslate:
+    @pytest.fixture
+    def pofile(self, tmpdir):
+        po = polib.POFile()
+        po.metadata = {'Language': 'pt_BR'}
+        for name in ['circle', 'square', 'triangle']:
+            po.append(polib.POEntry(msgid=name, comment=name + '.name'))
+        po.append(polib.POEntry(msgid='side, size', comment='square.args'))
+        po.append(polib.POEntry(msgid='done', msgstr='feito', comment='done'))
+        po.save(str(tmpdir.join('pt_BR.po')))
+        return polib.pofile(str(tmpdir.join('pt_BR.po')))
+
+    @pytest.fixture
+    def backend(self):
+        calls = []
+
+        def backend(text, source, target):
+            calls.append(text)
+            return '%s %s' % (target.partition('-')[0], text)
+
+        backend.calls = calls
+        return backend
+
+    def test_translate_entries_in_batches(self, pofile, backend, tmpdir):
+        saves = []
+        pofile.save = lambda *args: saves.append(args)
+        cache = TranslationCache(str(tmpdir.join('cache.json')))
+        translator = GoogleTranslator('pt_BR', backend=backend, cache=cache)
+        entries = untranslated_entries(pofile)
+        assert len(entries) == 4
+
+        translate_entries(pofile, entries, translator, workers=2,
+                          batch_size=3)
+        assert len(saves) == 2
+        assert pofile.find('circle').msgstr == 'pt_circle'
+        assert pofile.find('side, size').msgstr == 'pt_side, pt_size'
+        assert pofile.find('done').msgstr == 'feito'
+        assert all('fuzzy' in e.flags for e in entries)
+        assert len(backend.calls) == 5
+
+    def test_cache_is_compacted_after_translating(self, pofile, backend,
+                                                  tmpdir):
+        path = tmpdir.join('cache.jsonl')
+        path.write('["pt_BR", "done", "feito"]\n' * 3 + '["pt_BR", "ci')
+        pofile.save = lambda *args: None
+        translator = GoogleTranslator('pt_BR', backend=backend,
+                                      cache=TranslationCache(str(path)))
+        translate_entries(pofile, untranslated_entries(pofile), translator)
+        lines = path.read().splitlines()
+        assert len(lines) == len(set(lines)) == len(translator.cache)
+
+    def test_results_are_kept_when_a_batch_fails(self, pofile, backend,
+                                                 tmpdir):
+        def failing_backend(text, source, target):
+            if text == 'triangle':
+                raise RuntimeError('service unavailable')
+            return backend(text, source, target)
+
+        saves = []
+        pofile.save = lambda *args: saves.append(args)
+        path = str(tmpdir.join('cache.jsonl'))
+        translator = GoogleTranslator('pt_BR', backend=failing_backend,
+                                      cache=TranslationCache(path))
+        entries = untranslated_entries(pofile)
+        with pytest.raises(RuntimeError):
+            translate_entries(pofile, entries, translator, workers=1,
+                              batch_size=10)
+        assert len(saves) == 1
+        assert pofile.find('circle').msgstr == 'pt_circle'
+
+        # Results that arrived before the failure were persisted
+        cache = TranslationCache(path)
+        assert cache.get('circle', 'pt_BR') == 'pt circle'
+        assert cache.get('square', 'pt_BR') == 'pt square'
+        assert cache.get('triangle', 'pt_BR') is None
+
+    def test_translations_are_cached(self, pofile, backend, tmpdir):
+        path = str(tmpdir.join('cache.jsonl'))
+        translator = GoogleTranslator('pt_BR', backend=backend,
+                                      cache=TranslationCache(path))
+        assert translator('circle', 'name') == 'pt_circle'
+        translator.cache.save()
+
+        cache = TranslationCache(path)
+        assert cache.get('circle', 'pt_BR') == 'pt circle'
+        translator = GoogleTranslator('pt_BR', backend=backend, cache=cache)
+        assert translator('circle', 'name') == 'pt_circle'
+        assert backend.calls == ['circle']
+
+
+class TestIncrementalExtraction:
+    @pytest.fixture
+    def ns(self):
+        def f(x, y=0):
+            "Test function."
+            return x + y
+
+        class Foo:
+            "docstring"
+
+            def method(self, x):
+                "method docstring"
+                return x
+
+        return {'f': f, 'Foo': Foo, 'TRANSLATIONS': {'foobar': 'barfoo'}}
+
+    def test_incremental_extraction_reuses_cache(self, ns):
+        cache = {}
+        trans, changed = extract_translations_incremental(ns, cache)
+        assert trans == extract_translations(ns)
+        assert changed == {'f', 'Foo'}
+
+        trans_again, changed = extract_translations_incremental(ns, cache)
+        assert trans_again == trans
+        assert changed == set()
+
+    def test_incremental_extraction_detects_changes(self, ns):
+        cache = {}
+        extract_translations_incremental(ns, cache)
+        ns['Foo'].method.__doc__ = 'new docstring'
+        del ns['f']
+        trans, changed = extract_translations_incremental(ns, cache)
+        assert changed == {'Foo', 'f'}
+        assert trans['Foo:method.doc'] == 'new docstring'
+        assert 'f.name' not in trans
+        assert set(cache) == {'Foo'}
+
+    def test_merge_translations_keeps_other_entries(self):
+        old = {'f.name': 'f', 'f.doc': 'Test function.', 'g.name': 'g'}
+        po = create_pot_file(old)
+        po.find('f').msgstr = 'função'
+        new = dict(old, **{'f.doc': 'New doc.'})
+        del new['g.name']
+
+        assert merge_translations(po, translations_from_po(po), new) == 2
+        assert po.find('f').msgstr == 'função'
+        assert po.find('New doc.').comment == 'f.doc'
+        assert po.find('Test function.') is None
+        assert po.find('g') is None
+        assert {e.msgid for e in po.obsolete_entries()} == \
+            {'Test function.', 'g'}
+        assert translations_from_po(po) == new
@@ -3,7 +3,7 @@
 #
 import pytest
 
-from transpyler import Transpyler
+from transpyler import BadSyntaxError, Transpyler
 from transpyler.translate import translator_factory
 
 
@@ -156,3 +156,65 @@ class TestPyBrLanguage(PyBrFixtures, TranspyledLanguage):
 
     def test_translate(self, transpyler):
         assert transpyler.translate('file') == 'arquivo'
+
+
+# ------------------------------------------------------------------------------
+# Diagnostics
+# ------------------------------------------------------------------------------
+class TestDiagnostics:
+    @pytest.yield_fixture(scope='class')
+    def transpyler(self):
+        class PyBr(Transpyler):
+            translations = {
+                'para': 'for',
+                'em': 'in',
+                ('para', 'cada'): 'for',
+            }
+            invalid_tokens = {
+                ('para', 'todo'): 'use "para cada"',
+                'goto': 'goto is not supported',
+            }
+            lang = 'pt_BR'
+
+        if hasattr(Transpyler, '_instance'):
+            del Transpyler._instance
+        yield PyBr()
+        del Transpyler._instance
+
+    def test_collect_all_invalid_sequences(self, transpyler):
+        src = (
+            'para todo x em y:\n'
+            '    goto\n'
+            'para todo z em w: pass\n'
+        )
+        errors = transpyler.diagnose(src)
+        assert [(e.lineno, e.col) for e in errors] == [(1, 0), (2, 4), (3, 0)]
+        assert errors[0].msg == 'use "para cada"'
+        assert errors[0].end_col == 9
+        assert {e.kind for e in errors} == {'invalid-sequence'}
+
+    def test_transpile_raises_on_invalid_sequence(self, transpyler):
+        with pytest.raises(BadSyntaxError) as info:
+            transpyler.transpile('x = 1\ngoto')
+        assert info.value.msg == 'goto is not supported'
+        assert (info.value.lineno, info.value.pos) == (2, 0)
+
+    def test_collect_tokenization_errors(self, transpyler):
+        errors = transpyler.diagnose('x = $\ny = (1,\n')
+        assert [e.kind for e in errors] == ['tokenize', 'tokenize']
+        assert (errors[0].lineno, errors[0].col) == (1, 4)
+
+    def test_python_syntax_errors_are_reported(self, transpyler):
+        errors = transpyler.diagnose('para cada i em x:\n    y = +* 2\n')
+        assert len(errors) == 1
+        assert errors[0].kind == 'syntax'
+        assert errors[0].lineno == 2
+
+    def test_valid_code_has_no_diagnostics(self, transpyler):
+        assert transpyler.diagnose('para cada i em x:\n    pass\n') == []
+
+    def test_diagnostics_are_hashable(self, transpyler):
+        src = 'goto\ngoto\n'
+        errors = transpyler.diagnose(src)
+        assert len(set(errors)) == 2
+        assert len(set(errors + transpyler.diagnose(src))) == 2
@@ -1,4 +1,10 @@
+import pytest
+from colortools import Color
+
+from transpyler.turtle.headless import HeadlessStateGroup, \
+    make_turtle_namespace
 from transpyler.turtle.namespace import TurtleNamespace
+from transpyler.turtle.path import pack_color
 
 
 class TestTurtleNamespace:
@@ -13,5 +19,47 @@ class TestTurtleNamespace:
             'jump', 'left', 'lt', 'mainturtle', 'pd', 'pendown', 'penup', 'pu',
             'reset', 'right', 'rt', 'setavatar', 'setcolor', 'setfillcolor',
             'setheading', 'setpos', 'setwidth', 'show', 'setspeed', 'getspeed',
-            'clean',
+            'clean', 'query_point', 'query_rect', 'intersects', 'undo', 'redo',
         }
+
+
+class TestUndo:
+    @pytest.fixture
+    def ns(self):
+        return make_turtle_namespace(HeadlessStateGroup(), history_size=1000)
+
+    def test_history_is_disabled_by_default(self):
+        ns = make_turtle_namespace(HeadlessStateGroup())
+        ns['forward'](10)
+        with pytest.raises(RuntimeError):
+            ns['undo']()
+
+    def test_undo_and_redo_moves(self, ns):
+        ns['forward'](10)
+        ns['left'](90)
+        ns['setcolor']('red')
+        ns['forward'](10)
+        state = ns['mainturtle']()._state
+        assert len(state.path) == 2
+
+        assert ns['undo'](2) == 2
+        assert ns['getpos']() == (10, 0)
+        assert ns['getcolor']() == Color('black')
+        assert ns['getheading']() == 90
+        assert len(state.path) == 1
+        assert ns['query_point']((10, 5)) == []
+
+        assert ns['redo'](5) == 2
+        assert ns['getpos']() == (10, 10)
+        assert len(state.path) == 2
+        assert state.path[1][4] == pack_color('red')
+
+    def test_history_is_bounded(self, ns):
+        turtle = ns['mainturtle']()
+        turtle.history_size = 3
+        for _ in range(5):
+            ns['forward'](10)
+        assert ns['undo'](10) == 3
+        assert ns['getpos']() == (20, 0)
+        ns['forward'](1)
+        assert ns['redo']() == 0
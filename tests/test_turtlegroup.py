@@ -0,0 +1,59 @@
+import pytest
+
+from transpyler.turtle.path import PathStore
+from transpyler.turtle.state import TurtleState
+from transpyler.turtle.turtlegroup import TurtleGroup, VectorTurtleGroup
+
+
+@pytest.fixture
+def group():
+    return VectorTurtleGroup(4)
+
+
+def test_turtle_group_insert():
+    group = TurtleGroup()
+    group.append(1)
+    group.insert(0, 2)
+    assert list(group) == [2, 1]
+
+
+def test_vector_group_matches_individual_turtles(group):
+    states = [TurtleState(path=True) for _ in range(4)]
+    angles = [0, 90, 180, 270]
+    group.left(angles)
+    for state, angle in zip(states, angles):
+        state.rotate(angle)
+
+    for _ in range(3):
+        group.forward(10)
+        group.left(30)
+        for state in states:
+            state.step(10)
+            state.rotate(30)
+
+    assert group.headings() == [s.heading for s in states]
+    for pos, state in zip(group.positions(), states):
+        assert pos == pytest.approx(state.pos)
+    expected = PathStore()
+    for records in zip(*[s.path for s in states]):
+        expected.extend(records)
+    assert list(group.path.data) == pytest.approx(list(expected.data))
+
+
+def test_vector_group_per_turtle_arguments(group):
+    group.forward([1, 2, 3, 4])
+    assert group.positions() == [(1, 0), (2, 0), (3, 0), (4, 0)]
+    group.goto([(0, 1), (0, 2), (0, 3), (0, 4)])
+    assert [y for _, y in group.positions()] == [1, 2, 3, 4]
+    with pytest.raises(ValueError):
+        group.forward([1, 2])
+
+
+def test_vector_group_only_records_drawing_turtles(group):
+    group.penup()
+    group.drawing[1] = True
+    group.goto((10, 10))
+    assert group.path.tolist() == [(0, 0, 10, 10, 0x000000ff, 1)]
+    group.jump((1, 1))
+    assert group.positions() == [(11, 11)] * 4
+    assert len(group.path) == 1
@@ -0,0 +1,66 @@
+import pytest
+from colortools import Color
+
+from transpyler.turtle import wire
+from transpyler.turtle.stategroup import IpcStateGroup
+
+MESSAGES = [
+    ['step', 1, 10.0],
+    ['rotate', 2, -90.0],
+    ['move', 1, (1.5, -2.0)],
+    ['get', 1, 'pos'],
+    ['get', 1, 'custom'],
+    ['set', 1, 'color', (255, 0, 0, 255)],
+    ['set', 1, 'pos', (1.0, 2.0)],
+    ['set', 1, 'drawing', False],
+    ['set', 1, 'width', 2],
+    ['set', 1, 'avatar', 'tuga'],
+    ['set', 1, 'heading', None],
+    ['clear', 3],
+    ['clear'],
+    ['reset'],
+    ['reset', 2],
+    ['clean', 2],
+    ['newturtle', {'color': 'red'}],
+]
+
+
+@pytest.mark.parametrize('msg', MESSAGES)
+def test_roundtrip(msg):
+    assert wire.decode(wire.encode(msg)) == msg
+
+
+def test_batch_roundtrip():
+    msg = ['batch', MESSAGES[:4] + MESSAGES[5:] + MESSAGES[:3]]
+    data = wire.encode(msg)
+    assert wire.decode(data) == msg
+
+
+def test_commands_are_compact():
+    assert len(wire.encode(['step', 1, 10.0])) == 14
+    assert len(wire.encode(['set', 1, 'color', (0, 0, 0, 255)])) == 12
+
+    # Color objects are packed as RGBA tuples
+    data = wire.encode(['set', 1, 'color', Color('red')])
+    assert len(data) == 12
+    assert wire.decode(data) == ['set', 1, 'color', (255, 0, 0, 255)]
+
+
+def test_batches_with_out_of_range_ids_are_pickled():
+    msg = ['batch', [['step', 2 ** 40, 1.0]]]
+    assert wire.decode(wire.encode(msg)) == msg
+
+
+def test_invalid_version():
+    data = wire.encode(['step', 1, 10.0])
+    with pytest.raises(wire.WireError):
+        wire.decode(b'\x00' + data[1:])
+
+
+def test_state_group_decodes_messages():
+    group = IpcStateGroup()
+    turtle = group.new_turtle(path=True)
+    msg = ['batch', [['step', turtle.id, 10], ['rotate', turtle.id, 90]]]
+    assert group.handle(wire.encode(msg)) is None
+    assert turtle.pos == (10, 0)
+    assert turtle.heading == 90